@@ -0,0 +1,2 @@
+# Microbenchmarks, run from server/backend:
+#   python -m app.benchmarks.<name>
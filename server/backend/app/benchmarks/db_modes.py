@@ -0,0 +1,166 @@
+# Database modes: throughput and latency of the item, category and warehouse read routes with
+# settings.database_mode "sync" (routes in the thread pool, blocking driver) and "async"
+# (routes on the event loop, AsyncSession), at each number of concurrent clients.
+#   python -m app.benchmarks.db_modes [--clients 50 100 250 500] [--seconds 5] [--items 2000]
+#       [--database-url URL]
+# Each mode runs the app in its own process (the mode is read at import), in-process behind
+# httpx's ASGI transport, on the same seeded database: a temporary SQLite file by default, or
+# an empty database given by --database-url (MySQL needs aiomysql for the async mode). Pool and
+# thread pool sizes come from the usual settings (DB_POOL_SIZE, THREADPOOL_WORKERS, ...).
+# On SQLite both modes are bound by the CPU of the one process; the async mode's gain shows
+# with a database over the network, where sync requests hold a thread while they wait.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+MODES = ("sync", "async")
+CATEGORIES = 20
+PAGE_SIZE = 50
+USERNAME, PASSWORD = "bench", "bench"
+
+def _percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+def _seed(items: int):
+    from ..database import SessionLocal
+    from ..migrations import upgrade_database
+    # Every model, so the mappers' relationships resolve
+    from ..models import user, warehouse, user_warehouse, item, item_media, category, media_job, media_rendition, media_blob, change_log, warehouse_stat
+    from ..models.category import Category
+    from ..models.item import Item
+    from ..models.user import User
+    from ..models.user_warehouse import UserWarehouse, UserRole
+    from ..models.warehouse import Warehouse
+    from ..services import search as search_service
+    from ..services import stats as stats_service
+    from ..utils.security import get_password_hash
+
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        owner = User(username=USERNAME, password_hash=get_password_hash(PASSWORD), is_admin=True)
+        db.add(owner)
+        db.flush()
+        db_warehouse = Warehouse(name="bench", created_by_user_id=owner.user_id)
+        db.add(db_warehouse)
+        db.flush()
+        db.add(UserWarehouse(user_id=owner.user_id, warehouse_id=db_warehouse.warehouse_id, role=UserRole.owner))
+        categories = [Category(name=f"分类 {n}", warehouse_id=db_warehouse.warehouse_id) for n in range(CATEGORIES)]
+        db.add_all(categories)
+        db.flush()
+        db_items = [
+            Item(name=f"物品 {n}", location=f"柜子 {n % 30}", quantity=n % 9 + 1, warehouse_id=db_warehouse.warehouse_id,
+                 category_id=categories[n % CATEGORIES].category_id)
+            for n in range(items)
+        ]
+        db.add_all(db_items)
+        db.flush()
+        search_service.index_items(db, db_items, {c.category_id: c.name for c in categories})
+        db.commit()
+        stats_service.rebuild_stats(db)
+        return db_warehouse.warehouse_id, [db_item.item_id for db_item in db_items]
+    finally:
+        db.close()
+
+async def _client(client: httpx.AsyncClient, paths: List[str], offset: int, deadline: float,
+                  latencies: List[float], errors: List[int]):
+    n = offset
+    while time.perf_counter() < deadline:
+        path = paths[n % len(paths)]
+        n += 1
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+async def _measure(app, args, paths: List[str]):
+    # Errors (e.g. pool checkout timeouts) are counted as 500s instead of ending the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            response = await client.post("/auth/token", data={"username": USERNAME, "password": PASSWORD})
+            client.headers["Authorization"] = f"Bearer {response.json()['data']['access_token']}"
+            # Warm-up: connections, statement caches, the principal cache
+            await asyncio.gather(*(client.get(path) for path in paths))
+            for clients in args.clients:
+                latencies, errors = [], []
+                start = time.perf_counter()
+                deadline = start + args.seconds
+                await asyncio.gather(*(
+                    _client(client, paths, n, deadline, latencies, errors) for n in range(clients)
+                ))
+                elapsed = time.perf_counter() - start
+                print(json.dumps({
+                    "clients": clients,
+                    "rps": len(latencies) / elapsed,
+                    "p50": statistics.median(latencies),
+                    "p99": _percentile(latencies, 99),
+                    "errors": len(errors),
+                }), flush=True)
+
+def _worker(args):
+    # Runs in the child process, with DATABASE_MODE set
+    from ..main import app
+    warehouse_id, item_ids = args.warehouse_id, args.item_ids
+    paths = [
+        f"/items/warehouse/{warehouse_id}?limit={PAGE_SIZE}",
+        f"/items/{item_ids[0]}",
+        f"/items/{item_ids[-1]}",
+        f"/categories/warehouse/{warehouse_id}",
+        "/warehouses/",
+    ]
+    asyncio.run(_measure(app, args, paths))
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.db_modes")
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of each run")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--database-url", help="An empty database to seed (default: a temporary SQLite file)")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--warehouse-id", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--item-ids", type=int, nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        _worker(args)
+        return
+
+    directory = tempfile.TemporaryDirectory()
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(directory.name, "modes.db")
+    env["UPLOAD_DIR"] = os.path.join(directory.name, "uploads")
+    os.environ.update(env)
+    try:
+        warehouse_id, item_ids = _seed(args.items)
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, "-m", "app.benchmarks.db_modes", "--worker", mode,
+                 "--warehouse-id", str(warehouse_id), "--item-ids", str(item_ids[0]), str(item_ids[-1]),
+                 "--seconds", str(args.seconds), "--clients", *map(str, args.clients)],
+                env=dict(env, DATABASE_MODE=mode), stdout=subprocess.PIPE, check=True, text=True,
+            ).stdout
+            results[mode] = {row["clients"]: row for row in map(json.loads, output.splitlines())}
+
+        print(f"{'clients':>7} {'mode':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for clients in args.clients:
+            for mode in MODES:
+                row = results[mode][clients]
+                print(f"{clients:>7} {mode:>6} {row['rps']:>8.0f} {row['p50'] * 1000:>8.1f} {row['p99'] * 1000:>8.1f} "
+                      f"{row['errors']:>7}")
+    finally:
+        directory.cleanup()
+
+if __name__ == "__main__":
+    main()
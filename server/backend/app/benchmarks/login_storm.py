@@ -0,0 +1,101 @@
+# Login storm: --logins concurrent clients log in as fast as they can while --probes clients
+# list their warehouses (a route that needs no password hashing). Reports login throughput,
+# how many logins were shed with 503, and the latency of the unrelated route, first without
+# and then during the storm.
+#   python -m app.benchmarks.login_storm [--logins 100] [--probes 10] [--seconds 10]
+#       [--hash-workers N] [--queue-limit N]
+# The app runs in-process on a temporary SQLite database; --hash-workers and --queue-limit
+# override PASSWORD_HASH_WORKERS and PASSWORD_HASH_QUEUE_LIMIT.
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+async def _register(client: httpx.AsyncClient, username: str):
+    while True:
+        response = await client.post("/auth/register", json={"username": username, "password": "secret"})
+        if response.status_code != 503:
+            response.raise_for_status()
+            return
+        await asyncio.sleep(0.1)
+
+async def _login_client(client: httpx.AsyncClient, username: str, deadline: float, counts: dict):
+    while time.perf_counter() < deadline:
+        response = await client.post("/auth/token", data={"username": username, "password": "secret"})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            # What a well-behaved client does with Retry-After, scaled down to keep the storm going
+            await asyncio.sleep(float(response.headers["Retry-After"]) / 10)
+
+async def _probe_client(client: httpx.AsyncClient, headers: dict, deadline: float, latencies: List[float]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/warehouses/", headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+async def _phase(client: httpx.AsyncClient, headers: dict, logins: int, probes: int, seconds: float):
+    counts, latencies = {}, []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(
+        *(_login_client(client, f"storm{n}", deadline, counts) for n in range(logins)),
+        *(_probe_client(client, headers, deadline, latencies) for _ in range(probes)),
+    )
+    return counts, latencies
+
+async def _run(app, args):
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await asyncio.gather(*(_register(client, f"storm{n}") for n in range(max(args.logins, 1))))
+            response = await client.post("/auth/token", data={"username": "storm0", "password": "secret"})
+            headers = {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
+            await client.post("/warehouses/", json={"name": "bench"}, headers=headers)
+
+            print(f"{'phase':<7} {'logins/s':>9} {'shed 503':>9} {'probe req':>10} {'p50 ms':>8} {'p99 ms':>8}")
+            for phase, logins in (("idle", 0), ("storm", args.logins)):
+                counts, latencies = await _phase(client, headers, logins, args.probes, args.seconds)
+                print(f"{phase:<7} {counts.get(200, 0) / args.seconds:>9.1f} {counts.get(503, 0):>9} "
+                      f"{len(latencies):>10} {statistics.median(latencies) * 1000:>8.1f} "
+                      f"{_percentile(latencies, 99) * 1000:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.login_storm")
+    parser.add_argument("--logins", type=int, default=100, help="Concurrent clients logging in")
+    parser.add_argument("--probes", type=int, default=10, help="Concurrent clients of the unrelated route")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each phase")
+    parser.add_argument("--hash-workers", type=int)
+    parser.add_argument("--queue-limit", type=int)
+    args = parser.parse_args()
+
+    # The app reads its settings and creates its engine at import
+    directory = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(directory.name, "storm.db")
+    os.environ["UPLOAD_DIR"] = os.path.join(directory.name, "uploads")
+    if args.hash_workers is not None:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.hash_workers)
+    if args.queue_limit is not None:
+        os.environ["PASSWORD_HASH_QUEUE_LIMIT"] = str(args.queue_limit)
+    try:
+        from ..migrations import upgrade_database
+        upgrade_database()
+        from ..main import app
+        from ..utils.settings import settings
+        print(f"password hashing: {settings.password_hash_workers} workers, queue limit {settings.password_hash_queue_limit}")
+        asyncio.run(_run(app, args))
+    finally:
+        directory.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Item search: the LIKE query over item JOIN category against the full-text index
+# (services/search.py), on a scratch database seeded with --items items.
+#   python -m app.benchmarks.search [--items 100000] [--repeat 5] [--database-url URL]
+# Without --database-url the database is a temporary SQLite file (FTS5 trigram index); pass
+# the URL of an empty MySQL database to measure the ngram FULLTEXT index. Both backends must
+# return the same items, the FTS one ranked.
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from alembic import command
+
+from ..migrations import alembic_config
+# Every model, so the mappers' relationships resolve
+from ..models import user, warehouse, user_warehouse, item, item_media, category, media_job, media_rendition, media_blob, change_log, warehouse_stat
+from ..models.category import Category
+from ..models.item import Item
+from ..models.user import User
+from ..models.user_warehouse import UserWarehouse, UserRole
+from ..models.warehouse import Warehouse
+from ..services import item as item_service
+from ..services import search as search_service
+
+WAREHOUSES = 10
+CATEGORIES_PER_WAREHOUSE = 20
+BATCH_SIZE = 5000
+PAGE_SIZE = 50
+
+NOUNS = ["螺丝刀", "电池", "充电器", "数据线", "毛巾", "剪刀", "胶带", "灯泡", "雨伞", "水杯",
+         "screwdriver", "battery", "charger", "cable", "towel", "scissors", "tape", "bulb", "umbrella", "mug"]
+ADJECTIVES = ["红色", "蓝色", "大号", "小号", "备用", "旧", "新", "black", "white", "spare", "large", "small"]
+PLACES = ["厨房", "卧室", "客厅", "阳台", "书房", "garage", "attic", "basement"]
+CATEGORIES = ["工具", "电子", "日用", "厨具", "文具", "tools", "electronics", "household", "kitchen", "stationery"]
+
+# (label, query): a common word, a rarer phrase, a location, a category name, an item number, no match
+QUERIES = [
+    ("common", "battery"),
+    ("rare", "红色螺丝刀"),
+    ("location", "阳台"),
+    ("category", "electronics"),
+    ("number", "4242"),
+    ("no match", "zzz-nothing"),
+]
+
+def _seed(session_factory, count: int) -> int:
+    """Seeds `count` items over WAREHOUSES warehouses of one user, indexes them, returns the user id."""
+    rng = random.Random(42)
+    db = session_factory()
+    try:
+        owner = User(username="bench", email=None, password_hash="-")
+        db.add(owner)
+        db.flush()
+        warehouses = [Warehouse(name=f"仓库 {n}", created_by_user_id=owner.user_id) for n in range(WAREHOUSES)]
+        db.add_all(warehouses)
+        db.flush()
+        db.add_all([UserWarehouse(user_id=owner.user_id, warehouse_id=w.warehouse_id, role=UserRole.owner)
+                    for w in warehouses])
+        categories = [Category(name=f"{rng.choice(CATEGORIES)} {n}", warehouse_id=w.warehouse_id)
+                      for w in warehouses for n in range(CATEGORIES_PER_WAREHOUSE)]
+        db.add_all(categories)
+        db.flush()
+        category_names = {c.category_id: c.name for c in categories}
+        by_warehouse = {}
+        for c in categories:
+            by_warehouse.setdefault(c.warehouse_id, []).append(c.category_id)
+
+        backend = search_service.get_search_backend()
+        for start in range(1, count + 1, BATCH_SIZE):
+            rows = []
+            for n in range(start, min(start + BATCH_SIZE, count + 1)):
+                warehouse_id = warehouses[n % WAREHOUSES].warehouse_id
+                rows.append({
+                    "item_id": n,
+                    "name": f"{rng.choice(ADJECTIVES)}{rng.choice(NOUNS)} {n}",
+                    "location": f"{rng.choice(PLACES)} {n % 30}号柜" if n % 5 else None,
+                    "quantity": n % 9 + 1,
+                    "warehouse_id": warehouse_id,
+                    "category_id": rng.choice(by_warehouse[warehouse_id]) if n % 4 else None,
+                })
+            db.execute(insert(Item), rows)
+            backend.index_items(db, [
+                (row["item_id"], search_service._search_content(row["name"], row["location"],
+                                                                 category_names.get(row["category_id"])))
+                for row in rows
+            ])
+            db.commit()
+        return owner.user_id
+    finally:
+        db.close()
+
+def _time(function: Callable[[], list], repeat: int) -> Tuple[float, list]:
+    timings, result = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+def _search(session_factory, backend, user_id: int, query: str, limit) -> List[int]:
+    # get_search_backend() is what the services call; swap it for the run
+    search_service._backend = backend
+    db = session_factory()
+    try:
+        return [item.item_id for item in item_service._search_query(db, user_id, query, limit, None).all()]
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.search")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case; the median is reported")
+    parser.add_argument("--database-url", help="An empty database to seed (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    directory = None
+    url = args.database_url
+    if url is None:
+        directory = tempfile.TemporaryDirectory()
+        url = "sqlite:///" + os.path.join(directory.name, "search.db")
+    bench_engine = create_engine(url)
+    session_factory = sessionmaker(bind=bench_engine, autoflush=False)
+    try:
+        config = alembic_config()
+        with bench_engine.begin() as connection:
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+        fts = search_service._create_backend(bench_engine)
+        if fts.name == search_service.SearchBackend.name:
+            raise SystemExit(f"No full-text index for {bench_engine.dialect.name}")
+        search_service._backend = fts
+
+        start = time.perf_counter()
+        user_id = _seed(session_factory, args.items)
+        print(f"seeded and indexed {args.items} items in {time.perf_counter() - start:.1f} s ({fts.name})")
+
+        like = search_service.SearchBackend()
+        print(f"{'query':<10} {'matches':>8} {'page':>5} {'like ms':>9} {'fts ms':>8} {'speedup':>8}")
+        for label, query in QUERIES:
+            query = query.lower()
+            like_ids = _search(session_factory, like, user_id, query, None)
+            fts_ids = _search(session_factory, fts, user_id, query, None)
+            if sorted(like_ids) != sorted(fts_ids):
+                raise SystemExit(f"{label}: the backends return different items ({len(like_ids)} vs {len(fts_ids)})")
+            for limit, page in ((PAGE_SIZE, "first"), (None, "all")):
+                like_time, _ = _time(lambda: _search(session_factory, like, user_id, query, limit), args.repeat)
+                fts_time, _ = _time(lambda: _search(session_factory, fts, user_id, query, limit), args.repeat)
+                print(f"{label:<10} {len(like_ids):>8} {page:>5} {like_time * 1000:>9.2f} {fts_time * 1000:>8.2f} "
+                      f"{like_time / fts_time:>7.1f}x")
+    finally:
+        bench_engine.dispose()
+        if directory is not None:
+            directory.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# Listing serialization: the default path (ORM objects validated into the response schema by
+# FastAPI, encoded with the stdlib json) against settings.fast_listings (column tuples built
+# into dicts, encoded with orjson), for ItemResponse and WarehouseResponse listings.
+#   python -m app.benchmarks.serialization [--rows 100 1000 10000] [--repeat 5]
+# Database time is not included: both paths issue the same queries.
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+# Every model, so the mappers' relationships resolve
+from ..models import user, warehouse, user_warehouse, item, item_media, category, media_job, media_rendition, media_blob, change_log, warehouse_stat
+from ..models.category import Category
+from ..models.item import Item
+from ..models.item_media import ItemMedia, FileType, MediaStatus
+from ..models.media_rendition import MediaRendition
+from ..models.user import User
+from ..models.warehouse import Warehouse
+from ..schemas.item import ItemResponse
+from ..schemas.response import ResponseModel
+from ..schemas.warehouse import WarehouseResponse
+from ..services import response_rows
+from ..utils.json_response import envelope_response
+
+MEDIA_PER_ITEM = 2
+RENDITION_SIZES = (128, 256, 512, 1024)
+
+def _item_data(count: int) -> Tuple[list, tuple]:
+    """`count` items as ORM objects and as the column tuples of the same data."""
+    categories = [(category_id, f"分类 {category_id}", 1) for category_id in range(1, 21)]
+    items, media, renditions = [], [], []
+    for item_id in range(1, count + 1):
+        category_id = categories[item_id % len(categories)][0] if item_id % 4 else None
+        items.append((item_id, f"物品 {item_id}", f"柜子 {item_id % 50}", item_id % 7 + 1, category_id, 1,
+                      datetime(2024, 1, 1, 12, 0, 0) if item_id % 10 == 0 else None))
+        for n in range(MEDIA_PER_ITEM):
+            media_id = item_id * MEDIA_PER_ITEM + n
+            media.append((media_id, item_id, f"/uploads/original/ab/cd/{media_id:064x}.jpg", FileType.image,
+                          f"/uploads/thumbnails/ab/cd/{media_id:064x}.jpg", 1234567, MediaStatus.ready))
+            for size in RENDITION_SIZES:
+                renditions.append((media_id, size, "webp", size, size * 3 // 4,
+                                   f"/uploads/renditions/ab/cd/{media_id:064x}-{size}.webp", size * 40))
+
+    category_objects = {
+        category_id: Category(category_id=category_id, name=name, warehouse_id=warehouse_id)
+        for category_id, name, warehouse_id in categories
+    }
+    renditions_by_media = {}
+    for media_id, size, format, width, height, file_url, file_size in renditions:
+        renditions_by_media.setdefault(media_id, []).append(MediaRendition(
+            media_id=media_id, size=size, format=format, width=width, height=height, file_url=file_url, file_size=file_size
+        ))
+    media_by_item = {}
+    for media_id, item_id, file_url, file_type, thumbnail_url, file_size, status in media:
+        media_by_item.setdefault(item_id, []).append(ItemMedia(
+            id=media_id, item_id=item_id, file_url=file_url, file_type=file_type, thumbnail_url=thumbnail_url,
+            file_size=file_size, status=status, renditions=renditions_by_media[media_id]
+        ))
+    objects = [
+        Item(item_id=item_id, name=name, location=location, quantity=quantity, category_id=category_id,
+             warehouse_id=warehouse_id, deleted_at=deleted_at, category=category_objects.get(category_id),
+             media=media_by_item[item_id])
+        for item_id, name, location, quantity, category_id, warehouse_id, deleted_at in items
+    ]
+    return objects, (items, categories, media, renditions)
+
+def _warehouse_data(count: int) -> Tuple[list, tuple]:
+    creator = User(user_id=1, username="admin", email="admin@example.com", is_admin=True)
+    rows = [
+        (warehouse_id, f"仓库 {warehouse_id}", "描述" * 20, 1, 1, "admin", "admin@example.com", True)
+        for warehouse_id in range(1, count + 1)
+    ]
+    objects = [
+        Warehouse(warehouse_id=warehouse_id, name=name, description=description, created_by_user_id=created_by,
+                  creator=creator)
+        for warehouse_id, name, description, created_by, *_ in rows
+    ]
+    return objects, (rows,)
+
+def _default_path(schema) -> Callable[[list], bytes]:
+    # What a route with response_model=ResponseModel[List[schema]] does with ResponseModel(data=objects)
+    field = create_model_field(name=f"Response_{schema.__name__}", type_=ResponseModel[List[schema]], mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def run(objects: list) -> bytes:
+        content = loop.run_until_complete(serialize_response(
+            field=field, response_content=ResponseModel(data=objects, message="ok"), is_coroutine=False
+        ))
+        return JSONResponse(content).body
+    return run
+
+def _time(function: Callable[[], bytes], repeat: int) -> Tuple[float, int]:
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(function())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), size
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.serialization")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case; the median is reported")
+    args = parser.parse_args()
+
+    cases = [
+        ("ItemResponse", ItemResponse, _item_data, response_rows.build_items),
+        ("WarehouseResponse", WarehouseResponse, _warehouse_data, response_rows.build_warehouses),
+    ]
+    print(f"{'schema':<18} {'rows':>6} {'default ms':>11} {'fast ms':>9} {'speedup':>8} {'bytes':>10}")
+    for name, schema, make_data, build in cases:
+        default_path = _default_path(schema)
+        for count in args.rows:
+            objects, rows = make_data(count)
+            if json.loads(default_path(objects)) != json.loads(envelope_response(build(*rows), "ok").body):
+                raise SystemExit(f"{name}: the fast path's JSON differs from the schema's")
+            default_time, _ = _time(lambda: default_path(objects), args.repeat)
+            fast_time, fast_size = _time(lambda: envelope_response(build(*rows), "ok").body, args.repeat)
+            print(f"{name:<18} {count:>6} {default_time * 1000:>11.2f} {fast_time * 1000:>9.2f} "
+                  f"{default_time / fast_time:>7.1f}x {fast_size:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# Maintenance commands, run from server/backend:
+#   python -m app.cli <command>
+import argparse
+import logging
+
+from .database import SessionLocal, engine, Base
+from .models import user, warehouse, user_warehouse, item, item_media, category, media_job, media_rendition, media_blob, change_log, warehouse_stat
+from .migrations import upgrade_database, current_revision
+from .services import search as search_service
+from .services import item as item_service
+from .services import category as category_service
+from .services import warehouse as warehouse_service
+from .services import media as media_service
+from .services import media_jobs
+from .services import user as user_service
+from .services import renditions as rendition_service
+from .services import media_store
+from .services import sync as sync_service
+from .services import stats as stats_service
+from .services import storage as storage_service
+from .services.storage import get_storage, key_from_url
+from .services.response_rows import SUMMARY_FIELDS, ItemProjection
+from .models.item_media import ItemMedia, FileType, MediaStatus
+from .models.media_rendition import MediaRendition
+from .models.user_warehouse import UserWarehouse
+from .models.item import Item
+from .utils.query_plans import capture_statements, full_scans
+
+logger = logging.getLogger(__name__)
+
+def migrate(args):
+    previous = upgrade_database(args.revision)
+    print(f"Database schema at revision {current_revision()} (was {previous or 'empty'})")
+
+def _request_queries(db, membership, db_item, db_media):
+    """The lookups behind the API's read paths, for the sampled rows (0: a missing row)."""
+    user_id = membership.user_id if membership else 0
+    warehouse_id = membership.warehouse_id if membership else 0
+    user_service.get_user_by_username(db, membership.user.username if membership else "")
+    warehouse_service.get_user_warehouses_with_roles(db, user_id)
+    warehouse_service.get_user_warehouse_roles(db, user_id)
+    warehouse_service.get_user_warehouse_role(db, user_id, warehouse_id)
+    warehouse_service.get_version(db, warehouse_id)
+    item_service.get_items_by_warehouse(db, warehouse_id, limit=50)
+    item_service.get_items_by_warehouse(db, warehouse_id, limit=50, after_id=0)
+    item_service.get_deleted_items_by_warehouse(db, warehouse_id, limit=50)
+    item_service.get_item(db, db_item.item_id if db_item else 0)
+    item_service.search_all_items(db, user_id, "a", limit=50)
+    # settings.fast_listings
+    warehouse_service.get_user_warehouse_rows(db, user_id)
+    item_service.get_item_rows_by_warehouse(db, warehouse_id, limit=50)
+    item_service.search_item_rows(db, user_id, "a", limit=50)
+    summary = ItemProjection(SUMMARY_FIELDS)
+    item_service.get_item_rows_by_warehouse(db, warehouse_id, limit=50, projection=summary)
+    item_service.get_item_rows_by_warehouse(db, warehouse_id, limit=50, projection=ItemProjection(primary_media=True))
+    item_service.search_item_rows(db, user_id, "a", limit=50, projection=summary)
+    category_service.get_categories_by_warehouse(db, warehouse_id)
+    category_service.get_category_by_name_and_warehouse(db, "a", warehouse_id)
+    category_service.category_in_use(db, db_item.category_id or 0 if db_item else 0)
+    if membership is not None:
+        sync_service.changes_since(db, warehouse_id, 0)
+    stats_service.get_stats(db, warehouse_id)
+    media_service.get_media_by_id(db, db_media.id if db_media else 0)
+    if db_media is not None:
+        db_media.jobs # Lazy loaded by delete_media
+        media_jobs._rendition_fields(db, db_media.sha256 or "")
+        media_jobs._media_to_finish(db, db_media.id, db_media.sha256)
+
+def check_query_plans(args):
+    db = SessionLocal()
+    try:
+        # Sample rows, so that eager and lazy loads run too (plans do not depend on the values)
+        membership = db.query(UserWarehouse).first()
+        db_item = db.query(Item).filter(Item.warehouse_id == membership.warehouse_id).first() if membership else None
+        db_media = db.query(ItemMedia).first()
+        with capture_statements(engine) as statements:
+            _request_queries(db, membership, db_item, db_media)
+    finally:
+        db.close()
+    scans = full_scans(engine, statements, set(Base.metadata.tables))
+    for scan in scans:
+        print(f"Full scan of {scan.table}: {scan.detail}\n    {' '.join(scan.statement.split())}\n")
+    print(f"Checked the plans of {len({statement for statement, _ in statements})} queries: {len(scans)} full table scans")
+    if scans:
+        raise SystemExit(1)
+
+def rebuild_search_index(args):
+    search_service.init_search_index(engine, report_empty=False)
+    backend = search_service.get_search_backend()
+    db = SessionLocal()
+    try:
+        indexed = search_service.rebuild_index(db)
+    finally:
+        db.close()
+    print(f"Rebuilt {backend.name} search index: {indexed} items")
+
+def rebuild_stats(args):
+    db = SessionLocal()
+    try:
+        result = stats_service.rebuild_stats(db, args.warehouse_id)
+    finally:
+        db.close()
+    print(f"Rebuilt warehouse statistics: {result['rows']} rows, {result['drifted']} had drifted from the item table")
+
+def generate_renditions(args):
+    db = SessionLocal()
+    generated = 0
+    try:
+        # Processed images that predate renditions (or were processed with renditions disabled)
+        media_ids = [media_id for (media_id,) in
+                     db.query(ItemMedia.id)
+                     .filter(ItemMedia.file_type == FileType.image, ItemMedia.status == MediaStatus.ready,
+                             ~ItemMedia.renditions.any())
+                     .order_by(ItemMedia.id)]
+        for media_id in media_ids:
+            db_media = db.get(ItemMedia, media_id)
+            try:
+                with get_storage().local_copy(key_from_url(db_media.file_url)) as original_filepath:
+                    renditions = rendition_service.generate_renditions(db_media.file_url, original_filepath)
+            except FileNotFoundError:
+                logger.warning("Missing file for media %s: %s", media_id, db_media.file_url)
+                continue
+            db_media.renditions = [MediaRendition(**rendition) for rendition in renditions]
+            sync_service.record_media_changes(db, [db_media])
+            db.commit()
+            generated += bool(renditions)
+    finally:
+        db.close()
+    print(f"Generated renditions for {generated} of {len(media_ids)} images")
+
+def migrate_media_store(args):
+    db = SessionLocal()
+    try:
+        stats = media_store.migrate_legacy_media(db)
+    finally:
+        db.close()
+    print(f"Moved {stats['migrated']} files into the content store, merged {stats['deduplicated']} duplicates "
+          f"({stats['bytes_freed']} bytes freed), {stats['missing']} media files missing on disk")
+
+def migrate_storage(args):
+    if args.source == args.target:
+        raise SystemExit("Source and target backends are the same")
+    source = storage_service.create_storage(args.source)
+    target = storage_service.create_storage(args.target)
+    stats = storage_service.migrate_storage(source, target, workers=args.workers, delete_source=args.delete_source)
+    print(f"Copied {stats['copied']} files ({stats['bytes_copied']} bytes) from {source.name} to {target.name}, "
+          f"{stats['skipped']} already there, {stats['failed']} failed")
+    if stats["failed"]:
+        raise SystemExit(1)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Home Inventory maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_db_parser = subparsers.add_parser("migrate", help="Create or upgrade the database schema (run before starting the server)")
+    migrate_db_parser.add_argument("--revision", default="head", help="Target revision (default: latest)")
+    migrate_db_parser.set_defaults(func=migrate)
+
+    subparsers.add_parser("check-query-plans", help="EXPLAIN the API's read queries and fail on full table scans") \
+        .set_defaults(func=check_query_plans)
+
+    subparsers.add_parser("rebuild-search-index", help="Re-create the item full-text search index from the item table") \
+        .set_defaults(func=rebuild_search_index)
+
+    stats_parser = subparsers.add_parser("rebuild-stats", help="Recompute the per-warehouse item statistics from the item table")
+    stats_parser.add_argument("--warehouse-id", type=int, help="Only this warehouse (default: all)")
+    stats_parser.set_defaults(func=rebuild_stats)
+
+    subparsers.add_parser("generate-renditions", help="Create image renditions for media uploaded before they existed") \
+        .set_defaults(func=generate_renditions)
+
+    subparsers.add_parser("migrate-media-store", help="Move media uploaded under random filenames into the content-addressed store (stop the server first)") \
+        .set_defaults(func=migrate_media_store)
+
+    migrate_parser = subparsers.add_parser("migrate-storage", help="Copy all media files from one storage backend to another (then set STORAGE_BACKEND)")
+    migrate_parser.add_argument("--from", dest="source", choices=["local", "s3"], required=True)
+    migrate_parser.add_argument("--to", dest="target", choices=["local", "s3"], required=True)
+    migrate_parser.add_argument("--workers", type=int, default=8, help="Files copied in parallel")
+    migrate_parser.add_argument("--delete-source", action="store_true", help="Delete each file from the source once copied")
+    migrate_parser.set_defaults(func=migrate_storage)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,39 @@
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from .database import engine, Base
-from .models import user, warehouse, user_warehouse, item, item_media, category
-from .routes import auth, warehouse, item, media, category as category_router, admin
+from .database import engine, async_engine
+from .migrations import check_schema_revision
+from .models import user, warehouse, user_warehouse, item, item_media, category, media_job, media_rendition, media_blob, change_log, warehouse_stat
+from .routes import auth, warehouse, item, media, category as category_router, admin, uploads, sync, metrics as metrics_router
 from .utils.settings import settings # Import settings
 from .schemas.response import ResponseModel
+from .services.search import init_search_index
+from .services import media_jobs
+from .utils.security import PasswordHasherBusy
+from .utils.upload_limit import UploadSizeLimitMiddleware
+from .utils.compression import CompressionMiddleware
+from .utils.metrics import MetricsMiddleware
+from .utils.query_inspection import QueryInspectionMiddleware
 
-# Create all tables in the database
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (python -m app.cli migrate); refuse to run against an outdated one
+check_schema_revision()
+# Use the full-text search index if the migrations could create it, else the LIKE query
+init_search_index(engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Routes that touch the database are sync and run in this thread pool, so it bounds
+    # how many requests can wait on the database at once; size it to the connection pool
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_workers
+    # Pick up media jobs that were queued or interrupted when the server last stopped
+    media_jobs.resume_jobs()
+    yield
+    media_jobs.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Custom exception handler for HTTPException
 @app.exception_handler(HTTPException)
@@ -24,15 +47,71 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         },
     )
 
-# Mount static files directory for serving uploaded content
-app.mount("/uploads", StaticFiles(directory=settings.upload_dir), name="uploads")
+# Password hashing pool is saturated (login/registration storm): shed load instead of queueing
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={
+            "status": "error",
+            "data": None,
+            "message": "Server is busy, please retry shortly"
+        },
+    )
+
+# Reject oversize media uploads before the multipart body is parsed
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.media_max_upload_bytes,
+    path_prefix="/media/upload/"
+)
+
+# Compress JSON listings and exports for clients that accept it (streamed bodies chunk by chunk)
+app.add_middleware(
+    CompressionMiddleware,
+    encodings=settings.compression_encodings,
+    minimum_size=settings.compression_minimum_size,
+    content_types=settings.compression_content_types,
+    levels=settings.compression_levels,
+    route_levels=settings.compression_route_levels,
+    exclude_paths=settings.compression_exclude_paths
+)
+
+# Development and tests: report N+1 statements, slow statements and routes over their query budget
+if settings.query_inspection:
+    app.add_middleware(
+        QueryInspectionMiddleware,
+        repeat_threshold=settings.query_repeat_threshold,
+        budget=settings.query_budget,
+        route_budgets=settings.query_budgets,
+        repeat_exempt=settings.query_repeat_exempt,
+        strict=settings.query_inspection_strict
+    )
+
+# Outermost: latency, status and SQL statements of every request (GET /metrics)
+app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
+
+# Async mode: the routes with an async version (routes/aio) take the place of the sync ones
+if settings.database_mode == "async":
+    from .routes.aio import use_async_routes, item as aio_item, category as aio_category, warehouse as aio_warehouse
+    use_async_routes(item.router, aio_item.router)
+    use_async_routes(category_router.router, aio_category.router)
+    use_async_routes(warehouse.router, aio_warehouse.router)
+elif settings.database_mode != "sync":
+    raise ValueError(f"Unknown DATABASE_MODE {settings.database_mode!r}: use sync or async")
+
+# Uploaded media: cacheable file responses, or redirects to object storage
+app.include_router(uploads.router, prefix="/uploads", tags=["Uploads"])
 
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(warehouse.router, prefix="/warehouses", tags=["Warehouses"])
 app.include_router(item.router, prefix="/items", tags=["Items"])
 app.include_router(media.router, prefix="/media", tags=["Media"])
 app.include_router(category_router.router, prefix="/categories", tags=["Categories"])
+app.include_router(sync.router, prefix="/sync", tags=["Sync"])
 app.include_router(admin.router) # Include admin router
+app.include_router(metrics_router.router, tags=["Metrics"])
 
 @app.get("/", response_model=ResponseModel)
 def read_root():
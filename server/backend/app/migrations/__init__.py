@@ -0,0 +1,64 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from typing import Optional
+
+from ..database import engine
+
+# Versioned schema migrations (Alembic, scripts in versions/).
+# The server no longer creates or inspects tables at startup: run
+#   python -m app.cli migrate
+# after installing or upgrading, before starting the server.
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Databases created by Base.metadata.create_all before migrations existed hold at least
+# this revision's tables; 0002 brings them up to date whatever release created them
+LEGACY_REVISION = "0001"
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """
+    Leaves the search index out of autogenerate: item_search has no model (migration 0004
+    writes its dialect-specific DDL), and on SQLite FTS5 backs it with shadow tables
+    (item_search_content, item_search_data, item_search_idx, item_search_config, item_search_docsize).
+    """
+    return not (type_ == "table" and name.startswith("item_search"))
+
+def alembic_config() -> Config:
+    ini_path = os.path.join(os.path.dirname(os.path.dirname(MIGRATIONS_DIR)), "alembic.ini")
+    # alembic.ini only configures logging here; deployments that ship just the app package work without it
+    config = Config(ini_path if os.path.exists(ini_path) else None)
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    return config
+
+def current_revision() -> Optional[str]:
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+def check_schema_revision():
+    """Raises RuntimeError unless the database is at the latest revision."""
+    current, head = current_revision(), head_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current or '(none)'}, this release needs {head}: "
+            "run `python -m app.cli migrate` first"
+        )
+
+def upgrade_database(revision: str = "head") -> Optional[str]:
+    """Applies the migrations up to `revision`. Returns the revision the database was at."""
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        inspector = inspect(connection)
+        previous = MigrationContext.configure(connection).get_current_revision()
+        if previous is None and inspector.has_table("user"):
+            command.stamp(config, LEGACY_REVISION)
+            previous = f"{LEGACY_REVISION} (created before migrations)"
+        command.upgrade(config, revision)
+    return previous
@@ -0,0 +1,50 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import Base, engine
+from app.migrations import include_object
+# Registers every table on Base.metadata, for autogenerate
+from app.models import user, warehouse, user_warehouse, item, item_media, category, media_job, media_rendition, media_blob, change_log, warehouse_stat
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def _run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite can only add columns in place; other changes recreate the table
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # app.migrations.upgrade_database passes its connection in
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+    with engine.connect() as connection:
+        _run_migrations(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,98 @@
+"""Initial schema: users, warehouses, categories, items and media
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+The tables as the first release created them with Base.metadata.create_all. Databases
+created that way are stamped at this revision by `python -m app.cli migrate`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    ]
+
+
+def upgrade():
+    op.create_table(
+        "user",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(255), nullable=False),
+        sa.Column("email", sa.String(255)),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        *_timestamps(),
+        sa.Column("is_admin", sa.Boolean(), nullable=False),
+    )
+    op.create_index("ix_user_user_id", "user", ["user_id"])
+    op.create_index("ix_user_username", "user", ["username"], unique=True)
+
+    op.create_table(
+        "warehouse",
+        sa.Column("warehouse_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("user.user_id"), nullable=False),
+        *_timestamps(),
+    )
+    op.create_index("ix_warehouse_warehouse_id", "warehouse", ["warehouse_id"])
+
+    op.create_table(
+        "user_warehouse",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.user_id"), nullable=False),
+        sa.Column("warehouse_id", sa.Integer(), sa.ForeignKey("warehouse.warehouse_id"), nullable=False),
+        sa.Column("role", sa.Enum("owner", "member", name="userrole"), nullable=False),
+        *_timestamps(),
+        sa.UniqueConstraint("user_id", "warehouse_id", name="_user_warehouse_uc"),
+    )
+    op.create_index("ix_user_warehouse_id", "user_warehouse", ["id"])
+
+    op.create_table(
+        "category",
+        sa.Column("category_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("warehouse_id", sa.Integer(), sa.ForeignKey("warehouse.warehouse_id"), nullable=False),
+        *_timestamps(),
+    )
+    op.create_index("ix_category_category_id", "category", ["category_id"])
+    op.create_index("ix_category_name", "category", ["name"])
+
+    op.create_table(
+        "item",
+        sa.Column("item_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("location", sa.String(255)),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("warehouse_id", sa.Integer(), sa.ForeignKey("warehouse.warehouse_id"), nullable=False),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("category.category_id")),
+        *_timestamps(),
+        sa.Column("deleted_at", sa.DateTime()),
+    )
+    op.create_index("ix_item_item_id", "item", ["item_id"])
+
+    op.create_table(
+        "item_media",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("item_id", sa.Integer(), sa.ForeignKey("item.item_id"), nullable=False),
+        sa.Column("file_url", sa.String(2048), nullable=False),
+        sa.Column("thumbnail_url", sa.String(2048)),
+        sa.Column("file_type", sa.Enum("image", "video", name="filetype"), nullable=False),
+        *_timestamps(),
+    )
+    op.create_index("ix_item_media_id", "item_media", ["id"])
+
+
+def downgrade():
+    for table in ("item_media", "item", "category", "user_warehouse", "warehouse", "user"):
+        op.drop_table(table)
@@ -0,0 +1,153 @@
+"""Media processing and deduplication, listing index, sync change log, warehouse stats
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Everything added to the schema before migrations existed, which startup used to apply with
+create_all and add_missing_columns. Databases stamped at 0001 may already have any part of
+it, so each step checks first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+MEDIA_STATUS = ("pending", "ready", "failed")
+
+
+def _backfill_warehouse_stat():
+    """Builds warehouse_stat from the item table (what `python -m app.cli rebuild-stats` does)."""
+    item = sa.table(
+        "item", sa.column("warehouse_id"), sa.column("category_id"), sa.column("location"),
+        sa.column("quantity"), sa.column("deleted_at"),
+    )
+    warehouse_stat = sa.table(
+        "warehouse_stat", sa.column("warehouse_id"), sa.column("dimension"), sa.column("group_key"),
+        sa.column("item_count"), sa.column("total_quantity"), sa.column("deleted_count"),
+    )
+    active = item.c.deleted_at.is_(None)
+    counts = (
+        sa.func.sum(sa.case((active, 1), else_=0)),
+        sa.func.sum(sa.case((active, item.c.quantity), else_=0)),
+        sa.func.sum(sa.case((active, 0), else_=1)),
+    )
+    category_key = sa.func.coalesce(sa.cast(item.c.category_id, sa.String(255)), "")
+    location_key = sa.func.coalesce(item.c.location, "") # NULL and "" share a group
+    for dimension, group_key in (("total", sa.literal("")), ("category", category_key), ("location", location_key)):
+        group_by = [item.c.warehouse_id] if dimension == "total" else [item.c.warehouse_id, group_key]
+        op.execute(warehouse_stat.insert().from_select(
+            ["warehouse_id", "dimension", "group_key", "item_count", "total_quantity", "deleted_count"],
+            sa.select(item.c.warehouse_id, sa.literal(dimension), group_key, *counts).group_by(*group_by),
+        ))
+
+
+def upgrade():
+    if op.get_context().as_sql:
+        # Offline (--sql): the script is for a database at 0001, with none of this yet
+        tables, existing = set(), lambda kind, table: set()
+    else:
+        inspector = sa.inspect(op.get_bind())
+        tables = set(inspector.get_table_names())
+        existing = lambda kind, table: {entry["name"] for entry in getattr(inspector, f"get_{kind}")(table)}
+
+    columns = existing("columns", "item_media")
+    if "file_size" not in columns:
+        op.add_column("item_media", sa.Column("file_size", sa.BigInteger()))
+    if "sha256" not in columns:
+        op.add_column("item_media", sa.Column("sha256", sa.String(64)))
+    if "status" not in columns:
+        op.add_column("item_media", sa.Column(
+            "status", sa.Enum(*MEDIA_STATUS, name="mediastatus"), nullable=False, server_default="ready"
+        ))
+    if "ix_item_media_sha256" not in existing("indexes", "item_media"):
+        op.create_index("ix_item_media_sha256", "item_media", ["sha256"])
+
+    if "version" not in existing("columns", "warehouse"):
+        op.add_column("warehouse", sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"))
+
+    if "ix_item_warehouse_deleted_id" not in existing("indexes", "item"):
+        op.create_index("ix_item_warehouse_deleted_id", "item", ["warehouse_id", "deleted_at", "item_id"])
+
+    if "media_job" not in tables:
+        op.create_table(
+            "media_job",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("media_id", sa.Integer(), sa.ForeignKey("item_media.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("status", sa.Enum("pending", "running", "failed", name="jobstatus"), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("last_error", sa.String(1024)),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+        op.create_index("ix_media_job_id", "media_job", ["id"])
+        op.create_index("ix_media_job_status_id", "media_job", ["status", "id"])
+
+    if "media_rendition" not in tables:
+        op.create_table(
+            "media_rendition",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("media_id", sa.Integer(), sa.ForeignKey("item_media.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("format", sa.String(8), nullable=False),
+            sa.Column("width", sa.Integer(), nullable=False),
+            sa.Column("height", sa.Integer(), nullable=False),
+            sa.Column("file_url", sa.String(2048), nullable=False),
+            sa.Column("file_size", sa.BigInteger(), nullable=False),
+            sa.UniqueConstraint("media_id", "size", "format", name="uq_media_rendition"),
+        )
+        op.create_index("ix_media_rendition_id", "media_rendition", ["id"])
+
+    if "media_blob" not in tables:
+        op.create_table(
+            "media_blob",
+            sa.Column("sha256", sa.String(64), primary_key=True),
+            sa.Column("file_url", sa.String(2048), nullable=False),
+            sa.Column("file_size", sa.BigInteger(), nullable=False),
+            sa.Column("ref_count", sa.Integer(), nullable=False),
+            sa.Column("status", sa.Enum(*MEDIA_STATUS, name="mediastatus"), nullable=False),
+            sa.Column("thumbnail_url", sa.String(2048)),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+    if "change_log" not in tables:
+        op.create_table(
+            "change_log",
+            sa.Column("entity", sa.Enum("item", "category", "media", name="changeentity"), primary_key=True),
+            sa.Column("entity_id", sa.Integer(), primary_key=True),
+            sa.Column("warehouse_id", sa.Integer(), sa.ForeignKey("warehouse.warehouse_id", ondelete="CASCADE"),
+                      nullable=False),
+            sa.Column("version", sa.BigInteger(), nullable=False),
+        )
+        op.create_index("ix_change_log_warehouse_version", "change_log", ["warehouse_id", "version"])
+
+    if "warehouse_stat" not in tables:
+        op.create_table(
+            "warehouse_stat",
+            sa.Column("warehouse_id", sa.Integer(), sa.ForeignKey("warehouse.warehouse_id", ondelete="CASCADE"),
+                      primary_key=True),
+            sa.Column("dimension", sa.Enum("total", "category", "location", name="statdimension"), primary_key=True),
+            sa.Column("group_key", sa.String(255), primary_key=True),
+            sa.Column("item_count", sa.Integer(), nullable=False),
+            sa.Column("total_quantity", sa.BigInteger(), nullable=False),
+            sa.Column("deleted_count", sa.Integer(), nullable=False),
+        )
+        _backfill_warehouse_stat()
+
+
+def downgrade():
+    for table in ("warehouse_stat", "change_log", "media_blob", "media_rendition", "media_job"):
+        op.drop_table(table)
+    op.drop_index("ix_item_warehouse_deleted_id", table_name="item")
+    with op.batch_alter_table("warehouse") as batch:
+        batch.drop_column("version")
+    op.drop_index("ix_item_media_sha256", table_name="item_media")
+    with op.batch_alter_table("item_media") as batch:
+        batch.drop_column("status")
+        batch.drop_column("sha256")
+        batch.drop_column("file_size")
@@ -0,0 +1,48 @@
+"""Composite indexes for the item, media, membership, category and job lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Each index backs a query that otherwise scans its table (`python -m app.cli check-query-plans`
+lists them). ix_category_warehouse_name and ix_item_media_sha256_status replace the
+single-column indexes that were their prefix or that the lookup could not use alone.
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Whether a category is still used by active items (category deletion)
+    op.create_index("ix_item_category_deleted", "item", ["category_id", "deleted_at"])
+    # Media of a page of items (selectinload, export, sync)
+    op.create_index("ix_item_media_item_id", "item_media", ["item_id"])
+    # Deduplication: finished / pending uploads of the same content
+    op.create_index("ix_item_media_sha256_status", "item_media", ["sha256", "status"])
+    op.drop_index("ix_item_media_sha256", table_name="item_media")
+    # A user's warehouses and roles, answered from the index alone
+    op.create_index("ix_user_warehouse_user_role", "user_warehouse", ["user_id", "warehouse_id", "role"])
+    # Memberships of a warehouse (warehouse deletion check)
+    op.create_index("ix_user_warehouse_warehouse_user", "user_warehouse", ["warehouse_id", "user_id"])
+    # Categories of a warehouse, and lookup by name within it
+    op.create_index("ix_category_warehouse_name", "category", ["warehouse_id", "name"])
+    op.drop_index("ix_category_name", table_name="category")
+    # Jobs of a media (deletion, reprocessing)
+    op.create_index("ix_media_job_media_id", "media_job", ["media_id"])
+
+
+def downgrade():
+    op.drop_index("ix_media_job_media_id", table_name="media_job")
+    op.create_index("ix_category_name", "category", ["name"])
+    op.drop_index("ix_category_warehouse_name", table_name="category")
+    op.drop_index("ix_user_warehouse_warehouse_user", table_name="user_warehouse")
+    op.drop_index("ix_user_warehouse_user_role", table_name="user_warehouse")
+    op.create_index("ix_item_media_sha256", "item_media", ["sha256"])
+    op.drop_index("ix_item_media_sha256_status", table_name="item_media")
+    op.drop_index("ix_item_media_item_id", table_name="item_media")
+    op.drop_index("ix_item_category_deleted", table_name="item")
@@ -0,0 +1,88 @@
+"""Full-text search index over item name, location and category name
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+The item_search table used to be created (and backfilled) by the server at startup. Its DDL
+depends on the dialect: an FTS5 virtual table with the trigram tokenizer on SQLite, a table
+with an ngram FULLTEXT index on MySQL. Other databases, and builds without FTS5 trigram or
+the ngram parser, get no index and search with the LIKE query. Databases that already have
+the table keep it, and an empty one is backfilled.
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+SQLITE_DDL = "CREATE VIRTUAL TABLE IF NOT EXISTS item_search USING fts5(content, tokenize='trigram')"
+MYSQL_DDL = (
+    "CREATE TABLE IF NOT EXISTS item_search ("
+    " item_id INT PRIMARY KEY,"
+    " content TEXT NOT NULL,"
+    " FULLTEXT INDEX ft_item_search_content (content) WITH PARSER ngram,"
+    " FOREIGN KEY (item_id) REFERENCES item (item_id) ON DELETE CASCADE"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+)
+
+
+def _backfill(bind, key_column: str):
+    """Indexes the active items, as services/search.py does (name, location, category name, lower-cased)."""
+    item = sa.table(
+        "item", sa.column("item_id"), sa.column("name"), sa.column("location"),
+        sa.column("category_id"), sa.column("deleted_at"),
+    )
+    category = sa.table("category", sa.column("category_id"), sa.column("name"))
+    insert = sa.text(f"INSERT INTO item_search ({key_column}, content) VALUES (:item_id, :content)")
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(item.c.item_id, item.c.name, item.c.location, category.c.name)
+            .select_from(item.outerjoin(category, item.c.category_id == category.c.category_id))
+            .where(item.c.deleted_at.is_(None), item.c.item_id > last_id)
+            .order_by(item.c.item_id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(insert, [
+            {"item_id": item_id, "content": "\n".join(part for part in (name, location, category_name) if part).lower()}
+            for item_id, name, location, category_name in rows
+        ])
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    if dialect == "sqlite":
+        ddl, key_column = SQLITE_DDL, "rowid"
+    elif dialect in ("mysql", "mariadb"):
+        ddl, key_column = MYSQL_DDL, "item_id"
+    else:
+        logger.warning("No full-text index for %s: items are searched with LIKE", dialect)
+        return
+    if op.get_context().as_sql:
+        op.execute(ddl)
+        return
+    try:
+        op.execute(ddl)
+    except sa.exc.DBAPIError as e:
+        logger.warning("Full-text index not supported by this database, items are searched with LIKE: %s", e.orig)
+        return
+    if bind.execute(sa.text("SELECT COUNT(*) FROM item_search")).scalar() == 0:
+        _backfill(bind, key_column)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS item_search")
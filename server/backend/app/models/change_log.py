@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, Enum, Index
+from ..database import Base
+import enum
+
+class ChangeEntity(str, enum.Enum):
+    item = "item"
+    category = "category"
+    media = "media"
+
+class ChangeLog(Base):
+    """
+    The warehouse version at which an item, category or media last changed (services/sync.py).
+    Compacted: one row per entity, overwritten by each change, so the table grows with the
+    number of entities, not the number of edits. Rows of hard-deleted categories and media
+    stay behind as tombstones.
+    """
+    __tablename__ = "change_log"
+
+    entity = Column(Enum(ChangeEntity), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouse.warehouse_id", ondelete="CASCADE"), nullable=False)
+    version = Column(BigInteger, nullable=False)
+
+    # Backs the sync query: equality on warehouse_id, range on version
+    __table_args__ = (Index("ix_change_log_warehouse_version", "warehouse_id", "version"),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -19,3 +19,10 @@ class Item(Base):
     warehouse = relationship("Warehouse", back_populates="items")
     category = relationship("Category", back_populates="items") # New relationship
     media = relationship("ItemMedia", back_populates="item")
+
+    __table_args__ = (
+        # Backs keyset pagination of warehouse listings: equality on warehouse_id/deleted_at, range on item_id
+        Index("ix_item_warehouse_deleted_id", "warehouse_id", "deleted_at", "item_id"),
+        # Whether a category is still used by active items
+        Index("ix_item_category_deleted", "category_id", "deleted_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Enum, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -8,6 +8,11 @@ class FileType(str, enum.Enum):
     image = "image"
     video = "video"
 
+class MediaStatus(str, enum.Enum):
+    pending = "pending" # Thumbnail/compression job not finished yet; file_url serves the upload as-is
+    ready = "ready"
+    failed = "failed" # Processing gave up; file_url still serves the upload as-is
+
 class ItemMedia(Base):
     __tablename__ = "item_media"
 
@@ -16,7 +21,20 @@ class ItemMedia(Base):
     file_url = Column(String(2048), nullable=False)
     thumbnail_url = Column(String(2048))
     file_type = Column(Enum(FileType), nullable=False)
+    # Size and SHA-256 of the bytes as uploaded (before any re-compression)
+    file_size = Column(BigInteger)
+    sha256 = Column(String(64)) # Also the key of the shared MediaBlob
+    status = Column(Enum(MediaStatus), nullable=False, default=MediaStatus.ready, server_default=MediaStatus.ready.value)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     item = relationship("Item", back_populates="media")
+    jobs = relationship("MediaJob", back_populates="media", cascade="all, delete-orphan", passive_deletes=True)
+    renditions = relationship("MediaRendition", back_populates="media", cascade="all, delete-orphan",
+                              passive_deletes=True, order_by="MediaRendition.size")
+
+    __table_args__ = (
+        Index("ix_item_media_item_id", "item_id"),
+        # Deduplication looks up uploads of the same content in a given status
+        Index("ix_item_media_sha256_status", "sha256", "status"),
+    )
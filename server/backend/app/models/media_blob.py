@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Enum, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+from .item_media import MediaStatus
+
+class MediaBlob(Base):
+    """
+    One stored file, shared by every ItemMedia with the same content. Keyed by the SHA-256
+    of the uploaded bytes (ItemMedia.sha256); the file is deleted when ref_count reaches 0.
+    """
+    __tablename__ = "media_blob"
+
+    sha256 = Column(String(64), primary_key=True)
+    file_url = Column(String(2048), nullable=False)
+    file_size = Column(BigInteger, nullable=False) # Bytes as uploaded
+    ref_count = Column(Integer, nullable=False, default=0)
+    # Processing (compression, thumbnail, renditions) happens once per blob
+    status = Column(Enum(MediaStatus), nullable=False, default=MediaStatus.pending)
+    thumbnail_url = Column(String(2048))
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
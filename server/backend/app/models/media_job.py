@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, DateTime, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..database import Base
+import enum
+
+class JobStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    failed = "failed" # Gave up after media_job_max_attempts; finished jobs are deleted
+
+class MediaJob(Base):
+    """Thumbnail/compression work for an uploaded file, persisted so it survives restarts."""
+    __tablename__ = "media_job"
+
+    id = Column(Integer, primary_key=True, index=True)
+    media_id = Column(Integer, ForeignKey("item_media.id", ondelete="CASCADE"), nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(1024))
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    media = relationship("ItemMedia", back_populates="jobs")
+
+    __table_args__ = (
+        # Startup recovery scans jobs by status
+        Index("ix_media_job_status_id", "status", "id"),
+        Index("ix_media_job_media_id", "media_id"),
+    )
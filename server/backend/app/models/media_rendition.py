@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from ..database import Base
+
+class MediaRendition(Base):
+    """A downscaled copy of an image: at most `size` pixels on the long edge, in one format."""
+    __tablename__ = "media_rendition"
+
+    id = Column(Integer, primary_key=True, index=True)
+    media_id = Column(Integer, ForeignKey("item_media.id", ondelete="CASCADE"), nullable=False)
+    size = Column(Integer, nullable=False) # Configured size (bounding box), see settings.media_rendition_sizes
+    format = Column(String(8), nullable=False) # "avif", "webp" or "jpeg"
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    file_url = Column(String(2048), nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+
+    media = relationship("ItemMedia", back_populates="renditions")
+
+    __table_args__ = (UniqueConstraint("media_id", "size", "format", name="uq_media_rendition"),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Enum, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, Enum, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -21,4 +21,10 @@ class UserWarehouse(Base):
     user = relationship("User", back_populates="user_warehouses")
     warehouse = relationship("Warehouse", back_populates="user_warehouses")
 
-    __table_args__ = (UniqueConstraint("user_id", "warehouse_id", name="_user_warehouse_uc"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "warehouse_id", name="_user_warehouse_uc"),
+        # A user's warehouses and roles (every access check), answered from the index alone
+        Index("ix_user_warehouse_user_role", "user_id", "warehouse_id", "role"),
+        # Memberships of a warehouse (warehouse deletion check)
+        Index("ix_user_warehouse_warehouse_user", "warehouse_id", "user_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -10,6 +10,9 @@ class Warehouse(Base):
     name = Column(String(255), nullable=False)
     description = Column(Text)
     created_by_user_id = Column(Integer, ForeignKey("user.user_id"), nullable=False)
+    # Bumped by every change to the warehouse's items, categories or media (services/sync.py
+    # record_changes); listing ETags and sync tokens are derived from it
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Enum
+from ..database import Base
+import enum
+
+class StatDimension(str, enum.Enum):
+    total = "total" # One row per warehouse, group_key ""
+    category = "category" # group_key is the category_id, "" for uncategorized items
+    location = "location" # group_key is the location, "" for items without one
+
+class WarehouseStat(Base):
+    """
+    Item counts per warehouse, category and location, kept up to date by every item change
+    (services/stats.py) so dashboards never scan the item table. Rebuild with
+    `python -m app.cli rebuild-stats`.
+    """
+    __tablename__ = "warehouse_stat"
+
+    warehouse_id = Column(Integer, ForeignKey("warehouse.warehouse_id", ondelete="CASCADE"), primary_key=True)
+    dimension = Column(Enum(StatDimension), primary_key=True)
+    group_key = Column(String(255), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0) # Active items
+    total_quantity = Column(BigInteger, nullable=False, default=0) # Sum of active items' quantity
+    deleted_count = Column(Integer, nullable=False, default=0) # Soft-deleted items
@@ -1,40 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 
-from ..database import get_db
-from ..schemas.user import UserResponse
+from ..database import get_db, pool_status
+from ..schemas.user import UserResponse, AuthenticatedUser
 from ..schemas.warehouse import WarehouseResponse
 from ..schemas.user_warehouse import UserWarehouseCreate, UserWarehouseResponse
 from ..schemas.response import ResponseModel
 from ..services import user as user_service
 from ..services import warehouse as warehouse_service
-from ..routes.auth import get_current_admin_user
-from ..models.user import User
+from ..services import media_jobs as media_job_service
+from ..routes.auth import get_current_admin_user, get_cached_admin_user
+from ..utils.security import get_password_hash_async
+from ..utils.file_serving import file_serving_stats
+from ..utils.compression import compression_stats
 from ..models.user_warehouse import UserRole
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.get("/users", response_model=ResponseModel[List[UserResponse]])
-async def get_all_users_route(
-    current_admin_user: User = Depends(get_current_admin_user),
+def get_all_users_route(
+    current_admin_user: AuthenticatedUser = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     users = user_service.get_all_users(db)
     return ResponseModel(data=users, message="All users retrieved successfully")
 
 @router.get("/warehouses", response_model=ResponseModel[List[WarehouseResponse]])
-async def get_all_warehouses_route(
-    current_admin_user: User = Depends(get_current_admin_user),
+def get_all_warehouses_route(
+    current_admin_user: AuthenticatedUser = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     warehouses = warehouse_service.get_all_warehouses(db)
     return ResponseModel(data=warehouses, message="All warehouses retrieved successfully")
 
 @router.post("/assign_warehouse", response_model=ResponseModel[UserWarehouseResponse])
-async def assign_warehouse_to_user_route(
+def assign_warehouse_to_user_route(
     user_warehouse_data: UserWarehouseCreate,
-    current_admin_user: User = Depends(get_current_admin_user),
+    current_admin_user: AuthenticatedUser = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     # Check if user and warehouse exist
@@ -64,10 +68,10 @@ async def assign_warehouse_to_user_route(
         return ResponseModel(data=new_assignment, message="User assigned to warehouse successfully")
 
 @router.delete("/remove_warehouse_assignment", response_model=ResponseModel)
-async def remove_warehouse_assignment_route(
+def remove_warehouse_assignment_route(
     user_id: int,
     warehouse_id: int,
-    current_admin_user: User = Depends(get_current_admin_user),
+    current_admin_user: AuthenticatedUser = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     success = warehouse_service.remove_user_from_warehouse(db, user_id, warehouse_id)
@@ -78,10 +82,44 @@ async def remove_warehouse_assignment_route(
 @router.put("/users/{user_id}/reset-password", response_model=ResponseModel)
 async def reset_user_password_route(
     user_id: int,
-    current_admin_user: User = Depends(get_current_admin_user),
+    current_admin_user: AuthenticatedUser = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    updated_user = user_service.reset_user_password(db, user_id, "123456")
+    default_password_hash = await get_password_hash_async("123456")
+    updated_user = await run_in_threadpool(user_service.reset_user_password, db, user_id, default_password_hash)
     if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return ResponseModel(message="User password reset to '123456' successfully")
+
+@router.get("/auth-cache", response_model=ResponseModel[dict])
+async def get_auth_cache_stats_route(
+    current_admin_user: AuthenticatedUser = Depends(get_cached_admin_user)
+):
+    return ResponseModel(data=user_service.principal_cache.stats(), message="Auth cache statistics retrieved successfully")
+
+@router.get("/db-pool", response_model=ResponseModel[dict])
+async def get_db_pool_stats_route(
+    current_admin_user: AuthenticatedUser = Depends(get_cached_admin_user)
+):
+    # Async, with the admin checked against the principal cache: once the admin's principal is
+    # cached, stays answerable when the thread pool is busy waiting on connections
+    return ResponseModel(data=pool_status(), message="Database pool statistics retrieved successfully")
+
+@router.get("/media-serving", response_model=ResponseModel[dict])
+async def get_media_serving_stats_route(
+    current_admin_user: AuthenticatedUser = Depends(get_cached_admin_user)
+):
+    return ResponseModel(data=file_serving_stats.stats(), message="Media serving statistics retrieved successfully")
+
+@router.get("/compression", response_model=ResponseModel[dict])
+async def get_compression_stats_route(
+    current_admin_user: AuthenticatedUser = Depends(get_cached_admin_user)
+):
+    return ResponseModel(data=compression_stats.stats(), message="Compression statistics retrieved successfully")
+
+@router.get("/media-jobs", response_model=ResponseModel[dict])
+def get_media_job_stats_route(
+    current_admin_user: AuthenticatedUser = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    return ResponseModel(data=media_job_service.queue_stats(db), message="Media job statistics retrieved successfully")
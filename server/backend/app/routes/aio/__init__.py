@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.routing import APIRoute
+
+# Async versions of the busiest routes, on an AsyncSession (settings.database_mode = "async").
+# Each module's router mirrors (part of) the sync router of the same name and replaces its
+# routes in place, so paths, OpenAPI and route order stay the same in both modes.
+
+def use_async_routes(router: APIRouter, async_router: APIRouter):
+    """Replaces the routes of `router` that `async_router` has (same path and methods)."""
+    replacements = {(route.path, frozenset(route.methods)): route for route in async_router.routes}
+    replaced = set()
+    for index, route in enumerate(router.routes):
+        key = (route.path, frozenset(route.methods)) if isinstance(route, APIRoute) else None
+        if key in replacements:
+            router.routes[index] = replacements[key]
+            replaced.add(key)
+    missing = set(replacements) - replaced
+    if missing:
+        raise RuntimeError(f"Async routes without a sync version: {sorted(path for path, _ in missing)}")
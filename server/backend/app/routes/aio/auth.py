@@ -0,0 +1,28 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from ...database import get_async_db
+from ...schemas.user import AuthenticatedUser
+from ...services.aio import user as user_service
+from ...services.aio import warehouse as warehouse_service
+from ..auth import AuthContext, oauth2_scheme, _credentials_exception, _fingerprint_matches, _token_claims
+
+async def _authenticate(db: AsyncSession, username: str, token_fingerprint: Optional[str]) -> AuthenticatedUser:
+    # As auth._authenticate: the principal cache first, the database when it is stale
+    user = await user_service.get_principal(db, username)
+    if user is not None and not _fingerprint_matches(user, token_fingerprint):
+        user = await user_service.get_principal(db, username, refresh=True)
+    if user is None or not _fingerprint_matches(user, token_fingerprint):
+        raise _credentials_exception()
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    username, token_fingerprint = _token_claims(token)
+    return await _authenticate(db, username, token_fingerprint)
+
+async def get_auth_context(
+    current_user: AuthenticatedUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)
+):
+    roles = await warehouse_service.get_user_warehouse_roles(db, current_user.user_id)
+    return AuthContext(current_user, roles)
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from ...database import get_async_db
+from ...schemas.category import CategoryCreate, CategoryResponse
+from ...schemas.response import ResponseModel
+from ...services.aio import category as category_service
+from ...services.aio import warehouse as warehouse_service
+from ...utils.conditional import etag_matches, listing_etag, not_modified, set_listing_headers
+from ..auth import AuthContext
+from .auth import get_auth_context
+
+# routes/category.py on an AsyncSession
+
+router = APIRouter()
+
+@router.post("/", response_model=ResponseModel[CategoryResponse], status_code=status.HTTP_201_CREATED)
+async def create_category_route(
+    category: CategoryCreate,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    auth.require_access(category.warehouse_id)
+    if await category_service.get_category_by_name_and_warehouse(db, category.name, category.warehouse_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Category with this name already exists in this warehouse.")
+    created_category = await category_service.create_category(db, category)
+    return ResponseModel(data=created_category, message="Category created successfully")
+
+@router.get("/warehouse/{warehouse_id}", response_model=ResponseModel[List[CategoryResponse]])
+async def get_categories_in_warehouse(
+    warehouse_id: int,
+    request: Request,
+    response: Response,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    auth.require_access(warehouse_id)
+    etag = listing_etag(request, warehouse_id, await warehouse_service.get_version(db, warehouse_id))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    categories = await category_service.get_categories_by_warehouse(db, warehouse_id)
+    set_listing_headers(response, etag)
+    return ResponseModel(data=categories, message="Categories retrieved successfully")
+
+@router.delete("/{category_id}", response_model=ResponseModel)
+async def delete_category_route(
+    category_id: int,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_category = await category_service.get_category(db, category_id)
+    if not db_category:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    auth.require_access(db_category.warehouse_id)
+    auth.require_owner(db_category.warehouse_id, detail="Only owners can delete categories from this warehouse.")
+    result = await category_service.delete_category(db, db_category)
+    if not result["success"]:
+        if result["message"] == "Category is in use by items and cannot be deleted":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=result["message"])
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result["message"])
+    return ResponseModel(message=result["message"])
@@ -0,0 +1,210 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from ...database import get_async_db
+from ...schemas.item import ItemCreate, ItemResponse, ItemUpdate, ItemBulkRequest, ItemBulkResponse
+from ...schemas.response import ResponseModel
+from ...schemas.user import AuthenticatedUser
+from ...services.aio import item as item_service
+from ...services.aio import category as category_service
+from ...services.aio import warehouse as warehouse_service
+from ...services.response_rows import ItemProjection
+from ...models.user_warehouse import UserRole
+from ...models.item import Item
+from ...utils.pagination import split_page, MAX_PAGE_LIMIT
+from ...utils.conditional import etag_matches, listing_etag, not_modified, set_listing_headers
+from ...utils.json_response import envelope_response
+from ...utils.settings import settings
+from ..auth import AuthContext
+from ..item import item_projection, parse_cursor
+from .auth import get_auth_context, get_current_user
+
+# routes/item.py on an AsyncSession: same paths, checks, responses and statements
+
+router = APIRouter()
+
+async def check_item_access(
+    item_id: int,
+    include_deleted: bool = False,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_item = await item_service.get_item(db, item_id, include_deleted=include_deleted)
+    if not db_item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    auth.require_access(db_item.warehouse_id, detail="You do not have access to this item's warehouse.")
+    return db_item
+
+async def _check_category(db: AsyncSession, category_id: Optional[int], warehouse_id: int):
+    if category_id is not None:
+        db_category = await category_service.get_category(db, category_id)
+        if not db_category or db_category.warehouse_id != warehouse_id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid category_id for this warehouse")
+
+@router.post("/", response_model=ResponseModel[ItemResponse], status_code=status.HTTP_201_CREATED)
+async def create_item_route(
+    item: ItemCreate,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    auth.require_access(item.warehouse_id)
+    await _check_category(db, item.category_id, item.warehouse_id)
+    created_item = await item_service.create_item(db, item)
+    return ResponseModel(data=created_item, message="Item created successfully")
+
+@router.post("/bulk", response_model=ResponseModel[ItemBulkResponse])
+async def bulk_change_items_route(
+    changes: ItemBulkRequest,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    operations = len(changes.create) + len(changes.update) + len(changes.delete) + len(changes.restore)
+    if operations > settings.item_bulk_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.item_bulk_max_operations} operations per batch"
+        )
+    result = await item_service.bulk_change_items(db, auth.roles, changes)
+    return ResponseModel(data=result, message="Bulk changes applied")
+
+async def _warehouse_listing(
+    request: Request, response: Response, warehouse_id: int, limit: Optional[int], cursor: Optional[str],
+    projection: ItemProjection, auth: AuthContext, db: AsyncSession, deleted: bool, message: str
+):
+    auth.require_access(warehouse_id)
+    # Read before the listing: a change in between only makes the next request refetch
+    etag = listing_etag(request, warehouse_id, await warehouse_service.get_version(db, warehouse_id))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    if settings.fast_listings or not projection.full:
+        rows = await item_service.get_item_rows_by_warehouse(
+            db, warehouse_id, limit=limit, after_id=parse_cursor(cursor), deleted=deleted, projection=projection
+        )
+        rows, next_cursor = split_page(rows, limit, "item_id")
+        fast_response = envelope_response(rows, message, next_cursor)
+        set_listing_headers(fast_response, etag)
+        return fast_response
+    items = await item_service.get_items_by_warehouse(
+        db, warehouse_id, limit=limit, after_id=parse_cursor(cursor), deleted=deleted
+    )
+    items, next_cursor = split_page(items, limit, "item_id")
+    set_listing_headers(response, etag)
+    return ResponseModel(data=items, next_cursor=next_cursor, message=message)
+
+@router.get("/warehouse/{warehouse_id}", response_model=ResponseModel[List[ItemResponse]])
+async def get_items_in_warehouse(
+    warehouse_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    projection: ItemProjection = Depends(item_projection),
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await _warehouse_listing(
+        request, response, warehouse_id, limit, cursor, projection, auth, db,
+        deleted=False, message="Items retrieved successfully"
+    )
+
+@router.get("/warehouse/{warehouse_id}/deleted", response_model=ResponseModel[List[ItemResponse]])
+async def get_deleted_items_in_warehouse(
+    warehouse_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    projection: ItemProjection = Depends(item_projection),
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await _warehouse_listing(
+        request, response, warehouse_id, limit, cursor, projection, auth, db,
+        deleted=True, message="Deleted items retrieved successfully"
+    )
+
+@router.get("/search", response_model=ResponseModel[List[ItemResponse]])
+async def search_items_globally(
+    query: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    projection: ItemProjection = Depends(item_projection),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Searches for items across all warehouses accessible by the current user.
+    Pass `limit` (and then `cursor`) to page through the results, and `view`, `fields` or
+    `media` to get fewer fields per item (see item_projection).
+    """
+    try:
+        if settings.fast_listings or not projection.full:
+            rows = await item_service.search_item_rows(
+                db, current_user.user_id, query, limit=limit, after_id=parse_cursor(cursor), projection=projection
+            )
+            rows, next_cursor = split_page(rows, limit, "item_id")
+            return envelope_response(rows, "Items found successfully", next_cursor)
+        items = await item_service.search_all_items(
+            db, current_user.user_id, query, limit=limit, after_id=parse_cursor(cursor)
+        )
+    except ValueError:
+        # The ranked cursor's item was changed or deleted since the previous page
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor expired, restart the search")
+    items, next_cursor = split_page(items, limit, "item_id")
+    return ResponseModel(data=items, next_cursor=next_cursor, message="Items found successfully")
+
+@router.get("/{item_id}", response_model=ResponseModel[ItemResponse])
+async def get_item_detail(
+    item_id: int,
+    include_deleted: bool = False,
+    db_item: Item = Depends(check_item_access)
+):
+    return ResponseModel(data=db_item, message="Item details retrieved successfully")
+
+@router.put("/{item_id}", response_model=ResponseModel[ItemResponse])
+async def update_item_route(
+    item_id: int,
+    item_update: ItemUpdate,
+    db_item: Item = Depends(check_item_access),
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if auth.role(db_item.warehouse_id) not in [UserRole.owner, UserRole.member]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to update items in this warehouse."
+        )
+    await _check_category(db, item_update.category_id, db_item.warehouse_id)
+    updated_item = await item_service.update_item(db, db_item, item_update)
+    if not updated_item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found after update attempt")
+    return ResponseModel(data=updated_item, message="Item updated successfully")
+
+@router.delete("/{item_id}", response_model=ResponseModel, status_code=status.HTTP_200_OK)
+async def delete_item_route(
+    item_id: int,
+    db_item: Item = Depends(check_item_access),
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    auth.require_owner(db_item.warehouse_id, detail="Only owners can delete items from this warehouse.")
+    deleted_item = await item_service.delete_item(db, db_item)
+    if not deleted_item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found for deletion")
+    return ResponseModel(message="Item deleted successfully")
+
+@router.post("/restore/{item_id}", response_model=ResponseModel[ItemResponse], status_code=status.HTTP_200_OK)
+async def restore_item_route(
+    item_id: int,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_item = await item_service.get_item(db, item_id, include_deleted=True)
+    if not db_item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    auth.require_owner(db_item.warehouse_id, detail="Only owners can restore items from this warehouse.")
+    restored_item = await item_service.restore_item(db, db_item)
+    if not restored_item:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to restore item")
+    return ResponseModel(data=restored_item, message="Item restored successfully")
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from ...database import get_async_db
+from ...schemas.warehouse import WarehouseCreate, WarehouseResponse
+from ...schemas.user import AuthenticatedUser
+from ...schemas.response import ResponseModel
+from ...services.aio import warehouse as warehouse_service
+from ...utils.json_response import envelope_response
+from ...utils.settings import settings
+from .auth import get_current_user
+
+# The warehouse list and create routes of routes/warehouse.py on an AsyncSession
+
+router = APIRouter()
+
+@router.post("/", response_model=ResponseModel[WarehouseResponse], status_code=status.HTTP_201_CREATED)
+async def create_new_warehouse(
+    warehouse: WarehouseCreate,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    created_warehouse = await warehouse_service.create_warehouse(db, warehouse, current_user.user_id)
+    return ResponseModel(data=created_warehouse, message="Warehouse created successfully")
+
+@router.get("/", response_model=ResponseModel[List[WarehouseResponse]])
+async def get_warehouses_for_user(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if settings.fast_listings:
+        rows = await warehouse_service.get_user_warehouse_rows(db, current_user.user_id)
+        return envelope_response(rows, "Warehouses retrieved successfully")
+    warehouses = await warehouse_service.get_user_warehouses(db, current_user.user_id)
+    return ResponseModel(data=warehouses, message="Warehouses retrieved successfully")
@@ -1,40 +1,61 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Dict, Optional, Tuple
 from pydantic import BaseModel # Import BaseModel
 
-from ..database import get_db
-from ..schemas.user import UserCreate, UserResponse
+from ..database import get_db, db_request_slot, SessionLocal
+from ..schemas.user import UserCreate, UserResponse, AuthenticatedUser
 from ..schemas.token import Token
 from ..schemas.response import ResponseModel # Import ResponseModel
 from ..services import user as user_service
-from ..utils.security import verify_password
+from ..services import warehouse as warehouse_service
+from ..utils.security import verify_password_async, get_password_hash_async, password_fingerprint
 from ..utils.auth import create_access_token, decode_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from ..models.user import User
+from ..models.user_warehouse import UserRole
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_claims(token: str) -> Tuple[str, Optional[str]]:
+    """The token's subject (username) and password fingerprint; 401 if it is invalid."""
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     username: str = payload.get("sub")
     if username is None:
-        raise credentials_exception
-    user = user_service.get_user_by_username(db, username=username)
-    if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return username, payload.get("pwd")
+
+def _fingerprint_matches(user: AuthenticatedUser, token_fingerprint: Optional[str]) -> bool:
+    # Tokens issued before the last password change carry a stale fingerprint
+    return token_fingerprint is None or token_fingerprint == user.password_fingerprint
+
+def _authenticate(db: Session, username: str, token_fingerprint: Optional[str]) -> AuthenticatedUser:
+    # Served from the principal cache on the hot path, so most requests skip the user lookup
+    user = user_service.get_principal(db, username)
+    if user is not None and not _fingerprint_matches(user, token_fingerprint):
+        # The cache may be the stale one instead: the password was changed through another worker process
+        user = user_service.get_principal(db, username, refresh=True)
+    if user is None or not _fingerprint_matches(user, token_fingerprint):
+        raise _credentials_exception()
     return user
 
-async def get_current_admin_user(current_user: User = Depends(get_current_user)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    username, token_fingerprint = _token_claims(token)
+    return _authenticate(db, username, token_fingerprint)
+
+def _require_admin(current_user: AuthenticatedUser) -> AuthenticatedUser:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -42,25 +63,94 @@ async def get_current_admin_user(current_user: User = Depends(get_current_user))
         )
     return current_user
 
+async def get_current_admin_user(current_user: AuthenticatedUser = Depends(get_current_user)):
+    return _require_admin(current_user)
+
+def _with_own_session(func, *args):
+    db = SessionLocal()
+    try:
+        return func(db, *args)
+    finally:
+        db.close()
+
+async def _run_with_own_session(func, *args):
+    """
+    func(db, *args) in the thread pool, on a session of its own. For the async routes that also
+    await the bcrypt pool: the request slot (database.db_request_slot) and the connection are
+    only held for this call, not while the password is hashed.
+    """
+    async with db_request_slot():
+        return await run_in_threadpool(_with_own_session, func, *args)
+
+async def get_cached_admin_user(token: str = Depends(oauth2_scheme)) -> AuthenticatedUser:
+    """
+    get_current_admin_user for the in-process statistics routes. Checks the token against
+    the principal cache on the event loop, so while the admin's principal is cached (any
+    request in the last auth_cache_ttl_seconds) it takes no thread-pool slot and no
+    connection, and stays answerable when both are exhausted. Falls back to the database
+    when the principal is not cached or its fingerprint does not match.
+    """
+    username, token_fingerprint = _token_claims(token)
+    user = user_service.principal_cache.get(username)
+    if user is None or not _fingerprint_matches(user, token_fingerprint):
+        user = await _run_with_own_session(_authenticate, username, token_fingerprint)
+    return _require_admin(user)
+
+class AuthContext:
+    """
+    The authenticated user and their role in every warehouse, resolved once per request.
+    FastAPI caches dependencies per request, so every route dependency that asks for
+    get_auth_context shares the same instance and no role is looked up twice.
+    """
+    def __init__(self, user: AuthenticatedUser, roles: Dict[int, UserRole]):
+        self.user = user
+        self.roles = roles
+
+    def role(self, warehouse_id: int) -> Optional[UserRole]:
+        return self.roles.get(warehouse_id)
+
+    def require_access(self, warehouse_id: int, detail: str = "You do not have access to this warehouse.") -> UserRole:
+        user_role = self.role(warehouse_id)
+        if user_role is None:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return user_role
+
+    def require_owner(self, warehouse_id: int, detail: str) -> UserRole:
+        user_role = self.role(warehouse_id)
+        if user_role != UserRole.owner:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return user_role
+
+def get_auth_context(current_user: AuthenticatedUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    roles = warehouse_service.get_user_warehouse_roles(db, current_user.user_id)
+    return AuthContext(current_user, roles)
+
 class PasswordUpdate(BaseModel): # New Pydantic model for password update
     new_password: str
 
+def _get_credentials(db: Session, username: str) -> Optional[Tuple[str, str]]:
+    """(username, password_hash), or None if there is no such user."""
+    db_user = user_service.get_user_by_username(db, username)
+    return (db_user.username, db_user.password_hash) if db_user else None
+
 @router.post("/register", response_model=ResponseModel[UserResponse])
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate):
     # Email is now optional, so no need to check if it's already registered
     # db_user = user_service.get_user_by_email(db, email=user.email)
     # if db_user:
     #     raise HTTPException(status_code=400, detail="Email already registered")
-    db_user = user_service.get_user_by_username(db, username=user.username)
-    if db_user:
+    # Async for the bcrypt pool; blocking DB calls are pushed to the thread pool
+    if await _run_with_own_session(_get_credentials, user.username):
         raise HTTPException(status_code=400, detail="Username already taken")
-    created_user = user_service.create_user(db=db, user=user)
+    hashed_password = await get_password_hash_async(user.password)
+    created_user = await _run_with_own_session(user_service.create_user, user, hashed_password)
     return ResponseModel(data=created_user, message="User registered successfully")
 
 @router.post("/token", response_model=ResponseModel[Token]) # Use ResponseModel
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = user_service.get_user_by_username(db, username=form_data.username)
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    credentials = await _run_with_own_session(_get_credentials, form_data.username)
+    username, password_hash = credentials or (None, None)
+    if not credentials or not await verify_password_async(form_data.password, password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -68,21 +158,22 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": username, "pwd": password_fingerprint(password_hash)},
+        expires_delta=access_token_expires
     )
     return ResponseModel(data={"access_token": access_token, "token_type": "bearer"}, message="Login successful") # Wrap response
 
 @router.get("/users/me", response_model=ResponseModel[UserResponse]) # Use ResponseModel
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: AuthenticatedUser = Depends(get_current_user)):
     return ResponseModel(data=current_user, message="User information retrieved successfully") # Wrap response
 
 @router.put("/users/me/password", response_model=ResponseModel)
 async def update_password(
     password_update: PasswordUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
-    updated_user = user_service.update_user_password(db, current_user.user_id, password_update.new_password)
+    new_password_hash = await get_password_hash_async(password_update.new_password)
+    updated_user = await _run_with_own_session(user_service.update_user_password, current_user.user_id, new_password_hash)
     if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return ResponseModel(message="Password updated successfully")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -7,33 +7,19 @@ from ..schemas.category import CategoryCreate, CategoryResponse
 from ..schemas.response import ResponseModel
 from ..services import category as category_service
 from ..services import warehouse as warehouse_service
-from ..routes.auth import get_current_user
-from ..models.user import User
-from ..models.user_warehouse import UserRole
+from ..routes.auth import AuthContext, get_auth_context
+from ..utils.conditional import etag_matches, listing_etag, not_modified, set_listing_headers
 
 router = APIRouter()
 
-async def check_warehouse_access_for_category(
-    warehouse_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, warehouse_id)
-    if user_role is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have access to this warehouse."
-        )
-    return user_role
-
 @router.post("/", response_model=ResponseModel[CategoryResponse], status_code=status.HTTP_201_CREATED)
-async def create_category_route(
+def create_category_route(
     category: CategoryCreate,
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Ensure user has access to the warehouse
-    await check_warehouse_access_for_category(category.warehouse_id, current_user, db)
+    auth.require_access(category.warehouse_id)
     
     # Check if category name already exists for this warehouse
     existing_category = category_service.get_category_by_name_and_warehouse(db, category.name, category.warehouse_id)
@@ -44,20 +30,26 @@ async def create_category_route(
     return ResponseModel(data=created_category, message="Category created successfully")
 
 @router.get("/warehouse/{warehouse_id}", response_model=ResponseModel[List[CategoryResponse]])
-async def get_categories_in_warehouse(
+def get_categories_in_warehouse(
     warehouse_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Ensure user has access to the warehouse
-    await check_warehouse_access_for_category(warehouse_id, current_user, db)
+    auth.require_access(warehouse_id)
+    etag = listing_etag(request, warehouse_id, warehouse_service.get_version(db, warehouse_id))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
     categories = category_service.get_categories_by_warehouse(db=db, warehouse_id=warehouse_id)
+    set_listing_headers(response, etag)
     return ResponseModel(data=categories, message="Categories retrieved successfully")
 
 @router.delete("/{category_id}", response_model=ResponseModel)
-async def delete_category_route(
+def delete_category_route(
     category_id: int,
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     db_category = category_service.get_category(db, category_id)
@@ -65,17 +57,12 @@ async def delete_category_route(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
 
     # Ensure user has access to the warehouse of the category
-    await check_warehouse_access_for_category(db_category.warehouse_id, current_user, db)
+    auth.require_access(db_category.warehouse_id)
 
     # Only owner can delete categories
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, db_category.warehouse_id)
-    if user_role != UserRole.owner:
-         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only owners can delete categories from this warehouse."
-        )
+    auth.require_owner(db_category.warehouse_id, detail="Only owners can delete categories from this warehouse.")
 
-    result = category_service.delete_category(db, category_id)
+    result = category_service.delete_category(db, db_category)
     if not result["success"]:
         if result["message"] == "Category is in use by items and cannot be deleted":
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=result["message"])
@@ -1,59 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from ..database import get_db
-from ..schemas.item import ItemCreate, ItemResponse, ItemUpdate
+from ..schemas.item import (
+    ItemCreate, ItemResponse, ItemUpdate, ItemBulkRequest, ItemBulkResponse, ItemMediaMode, ItemView
+)
 from ..schemas.response import ResponseModel
 from ..services import item as item_service
-from ..services import warehouse as warehouse_service
 from ..services import category as category_service # Import category_service
-from ..routes.auth import get_current_user
-from ..models.user import User
+from ..services import warehouse as warehouse_service
+from ..services.response_rows import ITEM_FIELDS, SUMMARY_FIELDS, ItemProjection
+from ..routes.auth import AuthContext, get_auth_context, get_current_user
+from ..schemas.user import AuthenticatedUser
 from ..models.user_warehouse import UserRole
 from ..models.item import Item
+from ..utils.pagination import decode_cursor, split_page, MAX_PAGE_LIMIT
+from ..utils.conditional import etag_matches, listing_etag, not_modified, set_listing_headers
+from ..utils.json_response import envelope_response
+from ..utils.settings import settings
 
 router = APIRouter()
 
-async def check_warehouse_access(
-    warehouse_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, warehouse_id)
-    if user_role is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have access to this warehouse."
-        )
-    return user_role
-
-async def check_item_access(
+def check_item_access(
     item_id: int,
     include_deleted: bool = False, # Add parameter
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     db_item = item_service.get_item(db, item_id, include_deleted=include_deleted) # Pass to service
     if not db_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, db_item.warehouse_id)
-    if user_role is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have access to this item's warehouse."
-        )
+    auth.require_access(db_item.warehouse_id, detail="You do not have access to this item's warehouse.")
     return db_item
 
+def parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def item_projection(
+    view: ItemView = ItemView.full,
+    fields: Optional[str] = None, # Comma-separated response fields, overrides view
+    media: ItemMediaMode = ItemMediaMode.all
+) -> ItemProjection:
+    # Anything but the default is served from the selected columns (response_rows), not ItemResponse
+    selected = SUMMARY_FIELDS if view == ItemView.summary else None
+    if fields is not None:
+        requested = {field.strip() for field in fields.split(",")} - {""}
+        unknown = sorted(requested - set(ITEM_FIELDS))
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(ITEM_FIELDS)}"
+            )
+        # item_id is always returned: next_cursor is taken from it
+        selected = tuple(field for field in ITEM_FIELDS if field in requested or field == "item_id")
+    return ItemProjection(selected, media == ItemMediaMode.primary)
+
 @router.post("/", response_model=ResponseModel[ItemResponse], status_code=status.HTTP_201_CREATED)
-async def create_item_route(
+def create_item_route(
     item: ItemCreate,
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Ensure current user has access to the warehouse
-    await check_warehouse_access(item.warehouse_id, current_user, db)
+    auth.require_access(item.warehouse_id)
     
     # Validate category_id
     if item.category_id is not None:
@@ -64,61 +78,137 @@ async def create_item_route(
     created_item = item_service.create_item(db=db, item=item)
     return ResponseModel(data=created_item, message="Item created successfully")
 
+@router.post("/bulk", response_model=ResponseModel[ItemBulkResponse])
+def bulk_change_items_route(
+    changes: ItemBulkRequest,
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    """
+    Creates, updates, soft-deletes and restores many items in one transaction. Rows failing
+    access or category checks are reported in `errors` and skipped; the others are written.
+    """
+    operations = len(changes.create) + len(changes.update) + len(changes.delete) + len(changes.restore)
+    if operations > settings.item_bulk_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.item_bulk_max_operations} operations per batch"
+        )
+    result = item_service.bulk_change_items(db, auth.roles, changes)
+    return ResponseModel(data=result, message="Bulk changes applied")
+
 @router.get("/warehouse/{warehouse_id}", response_model=ResponseModel[List[ItemResponse]])
-async def get_items_in_warehouse(
+def get_items_in_warehouse(
     warehouse_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT), # Omit to get the whole list
+    cursor: Optional[str] = None, # next_cursor from the previous page
+    projection: ItemProjection = Depends(item_projection),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Ensure current user has access to the warehouse
-    await check_warehouse_access(warehouse_id, current_user, db)
-    items = item_service.get_items_by_warehouse(db=db, warehouse_id=warehouse_id)
-    return ResponseModel(data=items, message="Items retrieved successfully")
+    auth.require_access(warehouse_id)
+    # Read before the listing: a change in between only makes the next request refetch
+    etag = listing_etag(request, warehouse_id, warehouse_service.get_version(db, warehouse_id))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    if settings.fast_listings or not projection.full:
+        rows = item_service.get_item_rows_by_warehouse(
+            db=db, warehouse_id=warehouse_id, limit=limit, after_id=parse_cursor(cursor), projection=projection
+        )
+        rows, next_cursor = split_page(rows, limit, "item_id")
+        fast_response = envelope_response(rows, "Items retrieved successfully", next_cursor)
+        set_listing_headers(fast_response, etag)
+        return fast_response
+    items = item_service.get_items_by_warehouse(
+        db=db, warehouse_id=warehouse_id, limit=limit, after_id=parse_cursor(cursor)
+    )
+    items, next_cursor = split_page(items, limit, "item_id")
+    set_listing_headers(response, etag)
+    return ResponseModel(data=items, next_cursor=next_cursor, message="Items retrieved successfully")
 
 @router.get("/warehouse/{warehouse_id}/deleted", response_model=ResponseModel[List[ItemResponse]])
-async def get_deleted_items_in_warehouse(
+def get_deleted_items_in_warehouse(
     warehouse_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    projection: ItemProjection = Depends(item_projection),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Ensure current user has access to the warehouse
-    await check_warehouse_access(warehouse_id, current_user, db)
-    items = item_service.get_deleted_items_by_warehouse(db=db, warehouse_id=warehouse_id)
-    return ResponseModel(data=items, message="Deleted items retrieved successfully")
+    auth.require_access(warehouse_id)
+    etag = listing_etag(request, warehouse_id, warehouse_service.get_version(db, warehouse_id))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    if settings.fast_listings or not projection.full:
+        rows = item_service.get_item_rows_by_warehouse(
+            db=db, warehouse_id=warehouse_id, limit=limit, after_id=parse_cursor(cursor), deleted=True,
+            projection=projection
+        )
+        rows, next_cursor = split_page(rows, limit, "item_id")
+        fast_response = envelope_response(rows, "Deleted items retrieved successfully", next_cursor)
+        set_listing_headers(fast_response, etag)
+        return fast_response
+    items = item_service.get_deleted_items_by_warehouse(
+        db=db, warehouse_id=warehouse_id, limit=limit, after_id=parse_cursor(cursor)
+    )
+    items, next_cursor = split_page(items, limit, "item_id")
+    set_listing_headers(response, etag)
+    return ResponseModel(data=items, next_cursor=next_cursor, message="Deleted items retrieved successfully")
 
 @router.get("/search", response_model=ResponseModel[List[ItemResponse]])
-async def search_items_globally(
+def search_items_globally(
     query: str,
-    current_user: User = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    projection: ItemProjection = Depends(item_projection),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Searches for items across all warehouses accessible by the current user.
+    Pass `limit` (and then `cursor`) to page through the results, and `view`, `fields` or
+    `media` to get fewer fields per item (see item_projection).
     """
-    items = item_service.search_all_items(db, current_user.user_id, query)
-    return ResponseModel(data=items, message="Items found successfully")
+    try:
+        if settings.fast_listings or not projection.full:
+            rows = item_service.search_item_rows(
+                db, current_user.user_id, query, limit=limit, after_id=parse_cursor(cursor), projection=projection
+            )
+            rows, next_cursor = split_page(rows, limit, "item_id")
+            return envelope_response(rows, "Items found successfully", next_cursor)
+        items = item_service.search_all_items(
+            db, current_user.user_id, query, limit=limit, after_id=parse_cursor(cursor)
+        )
+    except ValueError:
+        # The ranked cursor's item was changed or deleted since the previous page
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor expired, restart the search")
+    items, next_cursor = split_page(items, limit, "item_id")
+    return ResponseModel(data=items, next_cursor=next_cursor, message="Items found successfully")
 
 @router.get("/{item_id}", response_model=ResponseModel[ItemResponse])
-async def get_item_detail(
+def get_item_detail(
     item_id: int,
     include_deleted: bool = False, # Add query parameter
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db_item: Item = Depends(check_item_access)
 ):
-    # Manually call the dependency with the parameter
-    db_item = await check_item_access(item_id, include_deleted, current_user, db)
     return ResponseModel(data=db_item, message="Item details retrieved successfully")
 
 @router.put("/{item_id}", response_model=ResponseModel[ItemResponse])
-async def update_item_route(
+def update_item_route(
     item_id: int,
     item_update: ItemUpdate,
     db_item: Item = Depends(check_item_access),
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Only owner or member can update item
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, db_item.warehouse_id)
+    user_role = auth.role(db_item.warehouse_id)
     if user_role not in [UserRole.owner, UserRole.member]:
          raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -131,36 +221,31 @@ async def update_item_route(
         if not db_category or db_category.warehouse_id != db_item.warehouse_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid category_id for this warehouse")
 
-    updated_item = item_service.update_item(db, item_id, item_update)
+    updated_item = item_service.update_item(db, db_item, item_update)
     if not updated_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found after update attempt")
     return ResponseModel(data=updated_item, message="Item updated successfully")
 
 
 @router.delete("/{item_id}", response_model=ResponseModel, status_code=status.HTTP_200_OK)
-async def delete_item_route(
+def delete_item_route(
     item_id: int,
     db_item: Item = Depends(check_item_access),
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Only owner can delete items
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, db_item.warehouse_id)
-    if user_role != UserRole.owner:
-         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only owners can delete items from this warehouse."
-        )
+    auth.require_owner(db_item.warehouse_id, detail="Only owners can delete items from this warehouse.")
     
-    deleted_item = item_service.delete_item(db, item_id)
+    deleted_item = item_service.delete_item(db, db_item)
     if not deleted_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found for deletion")
     return ResponseModel(message="Item deleted successfully")
 
 @router.post("/restore/{item_id}", response_model=ResponseModel[ItemResponse], status_code=status.HTTP_200_OK)
-async def restore_item_route(
+def restore_item_route(
     item_id: int,
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # We need to fetch the item including deleted ones to restore it
@@ -169,14 +254,9 @@ async def restore_item_route(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
     # Only owner can restore items
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, db_item.warehouse_id)
-    if user_role != UserRole.owner:
-         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only owners can restore items from this warehouse."
-        )
+    auth.require_owner(db_item.warehouse_id, detail="Only owners can restore items from this warehouse.")
     
-    restored_item = item_service.restore_item(db, item_id)
+    restored_item = item_service.restore_item(db, db_item)
     if not restored_item:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to restore item")
     return ResponseModel(data=restored_item, message="Item restored successfully")
\ No newline at end of file
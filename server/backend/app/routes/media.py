@@ -1,25 +1,28 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Header, Query, status
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
 from ..schemas.media import MediaResponse
 from ..schemas.response import ResponseModel # Import ResponseModel
 from ..services import media as media_service
+from ..services import media_jobs as media_job_service
+from ..services import renditions as rendition_service
 from ..services import item as item_service
-from ..services import warehouse as warehouse_service
-from ..routes.auth import get_current_user
-from ..models.user import User
+from ..services.storage import get_storage, key_from_url
+from ..routes.auth import AuthContext, get_auth_context
 from ..models.item_media import FileType
+from ..utils.settings import settings
 # Removed: from ..utils.media import save_upload_file, delete_upload_file # These are now handled by media_service
 
 router = APIRouter()
 
 @router.post("/upload/{item_id}", response_model=ResponseModel[MediaResponse]) # Use ResponseModel
-async def upload_item_media(
+def upload_item_media(
     item_id: int,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     db_item = item_service.get_item(db, item_id)
@@ -27,12 +30,7 @@ async def upload_item_media(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
     # Check if user has access to the item's warehouse
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, db_item.warehouse_id)
-    if user_role is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have access to this item's warehouse."
-        )
+    auth.require_access(db_item.warehouse_id, detail="You do not have access to this item's warehouse.")
 
     # Determine file type
     content_type = file.content_type
@@ -43,25 +41,28 @@ async def upload_item_media(
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
 
-    # Read file content
-    file_content = await file.read()
-
-    # Save the file using the service function
-    file_url, thumbnail_url = media_service.save_upload_file(file_content, file.filename, content_type)
+    # Stream the spooled upload to disk (sync route: runs in the thread pool, off the event loop)
+    try:
+        saved = media_service.save_upload_file(file.file, file.filename)
+    except media_service.UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds the maximum size of {settings.media_max_upload_bytes} bytes"
+        )
 
     media_create = {
         "item_id": item_id,
-        "file_url": file_url,
-        "thumbnail_url": thumbnail_url,
         "file_type": file_type
     }
-    created_media = media_service.create_item_media(db, media_create)
+    # Stored by content hash; thumbnail and compression run in the background, so the media
+    # is "pending" until they finish (unless the same file was uploaded and processed before)
+    created_media = media_job_service.create_uploaded_media(db, media_create, saved)
     return ResponseModel(data=created_media, message="Media uploaded successfully") # Wrap response
 
 @router.delete("/{media_id}", response_model=ResponseModel)
-async def delete_media(
+def delete_media(
     media_id: int,
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     db_media = media_service.get_media_by_id(db, media_id)
@@ -69,17 +70,36 @@ async def delete_media(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
 
     # Check if user has access to the item's warehouse
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, db_media.item.warehouse_id)
-    if user_role is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have access to this item's warehouse."
-        )
+    auth.require_access(db_media.item.warehouse_id, detail="You do not have access to this item's warehouse.")
 
     # Delete the file and the database record using the service function
-    deleted = media_service.delete_media_by_id(db, media_id) # No delete_file_callback needed
-    if not deleted:
-        # This case should ideally not be hit if the initial check passes
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found during deletion")
+    media_service.delete_media(db, db_media)
+
+    return ResponseModel(message="Media deleted successfully")
+
+@router.get("/{media_id}/rendition", response_class=RedirectResponse, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+def get_media_rendition(
+    media_id: int,
+    size: int = Query(256, ge=1, le=4096), # Long edge the client will draw, in physical pixels
+    format: Optional[str] = None, # "avif", "webp" or "jpeg"; negotiated from Accept when omitted
+    accept: Optional[str] = Header(None),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    """Redirects to the best rendition of an image for the requested display size."""
+    db_media = media_service.get_media_by_id(db, media_id)
+    if not db_media:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+
+    # Check if user has access to the item's warehouse
+    auth.require_access(db_media.item.warehouse_id, detail="You do not have access to this item's warehouse.")
 
-    return ResponseModel(message="Media deleted successfully")
\ No newline at end of file
+    if format is not None and format not in rendition_service.enabled_formats():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported rendition format")
+    formats = [format] if format else rendition_service.accepted_formats(accept)
+    rendition = rendition_service.pick_rendition(db_media.renditions, size, formats)
+    # Still processing, or a video: the thumbnail (if any) beats downloading the whole file
+    url = rendition.file_url if rendition else (db_media.thumbnail_url or db_media.file_url)
+    # Straight to the file (a presigned URL with object storage), skipping the /uploads hop
+    url = get_storage().download_url(key_from_url(url))
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers={"Vary": "Accept"})
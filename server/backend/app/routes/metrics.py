@@ -0,0 +1,18 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from ..utils import metrics
+from ..utils.settings import settings
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    # Async on purpose, like the admin statistics: scrapes still answer when the thread pool is busy
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.metrics_token and not hmac.compare_digest(authorization or "", f"Bearer {settings.metrics_token}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
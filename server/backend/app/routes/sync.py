@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from ..database import get_db
+from ..schemas.sync import SyncResponse
+from ..schemas.response import ResponseModel
+from ..services import sync as sync_service
+from ..routes.auth import AuthContext, get_auth_context
+
+router = APIRouter()
+
+@router.get("/warehouse/{warehouse_id}", response_model=ResponseModel[SyncResponse])
+def sync_warehouse(
+    warehouse_id: int,
+    since: Optional[str] = None, # token from the previous sync; omit for a full sync
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    """
+    Items, categories and media changed since the token, plus the ids of deleted ones.
+    The cost follows the number of changes, not the size of the warehouse.
+    """
+    # Ensure current user has access to the warehouse
+    auth.require_access(warehouse_id)
+    try:
+        since_version = sync_service.decode_token(since, warehouse_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    changes = sync_service.changes_since(db, warehouse_id, since_version)
+    return ResponseModel(data=changes, message="Changes retrieved successfully")
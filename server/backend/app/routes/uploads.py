@@ -0,0 +1,39 @@
+import os
+import stat
+from anyio import to_thread
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import RedirectResponse, Response
+
+from ..services.storage import get_storage, key_from_url, url_for_key, LocalStorage, STORED_PREFIXES
+from ..utils.file_serving import MediaFileResponse
+from ..utils.settings import settings
+
+# Media files at /uploads. Local files are served with immutable caching headers, ETags and
+# range support (see utils/file_serving.py); with object storage the client is redirected
+# to a presigned URL, and the bytes come from the object store.
+router = APIRouter()
+
+@router.api_route("/{path:path}", methods=["GET", "HEAD"], response_class=Response)
+async def serve_upload(path: str):
+    # Async: a stat in a worker thread is all the work, no database
+    key = key_from_url(url_for_key(path))
+    if key is None or not key.startswith(STORED_PREFIXES): # Never scratch files
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        # Signing is local, no request to the store. The redirect may be reused for half the
+        # URL's lifetime, so repeat views hit the client's cache of the presigned URL.
+        return RedirectResponse(
+            storage.download_url(key), status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+            headers={"Cache-Control": f"private, max-age={settings.s3_presign_expire_seconds // 2}"}
+        )
+
+    file_path = storage.path(key)
+    try:
+        stat_result = await to_thread.run_sync(os.stat, file_path)
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return MediaFileResponse(file_path, stat_result)
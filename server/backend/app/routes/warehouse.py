@@ -1,35 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
-from ..schemas.warehouse import WarehouseCreate, WarehouseResponse, UserWarehouseResponse, WarehouseWithUserRoleResponse
-from ..schemas.user import UserResponse # Import UserResponse
+from ..schemas.warehouse import WarehouseCreate, WarehouseResponse, UserWarehouseResponse, WarehouseWithUserRoleResponse, WarehouseImportResponse, WarehouseStatsResponse
+from ..schemas.user import UserResponse, AuthenticatedUser # Import UserResponse
 from ..schemas.response import ResponseModel # Import ResponseModel
 from ..services import warehouse as warehouse_service
-from ..routes.auth import get_current_user, get_current_admin_user
-from ..models.user import User
-from ..models.user_warehouse import UserRole
+from ..services import import_export as import_export_service
+from ..services import stats as stats_service
+from ..routes.auth import AuthContext, get_auth_context, get_current_user, get_current_admin_user
+from ..utils.conditional import etag_matches, listing_etag, not_modified, set_listing_headers
+from ..utils.json_response import envelope_response
+from ..utils.settings import settings
 
 router = APIRouter()
 
-async def check_warehouse_access(
-    warehouse_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, warehouse_id)
-    if user_role is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have access to this warehouse."
-        )
-    return user_role
-
 @router.post("/", response_model=ResponseModel[WarehouseResponse], status_code=status.HTTP_201_CREATED) # Use ResponseModel
 def create_new_warehouse(
     warehouse: WarehouseCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     created_warehouse = warehouse_service.create_warehouse(db=db, warehouse=warehouse, user_id=current_user.user_id)
@@ -37,16 +28,19 @@ def create_new_warehouse(
 
 @router.get("/", response_model=ResponseModel[List[WarehouseResponse]]) # Use ResponseModel
 def get_warehouses_for_user(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    if settings.fast_listings:
+        rows = warehouse_service.get_user_warehouse_rows(db=db, user_id=current_user.user_id)
+        return envelope_response(rows, "Warehouses retrieved successfully")
     warehouses = warehouse_service.get_user_warehouses(db=db, user_id=current_user.user_id) # Call the new service function
     return ResponseModel(data=warehouses, message="Warehouses retrieved successfully") # Wrap response
 
 @router.get("/user/{user_id}", response_model=ResponseModel[List[WarehouseWithUserRoleResponse]])
 def get_user_warehouses_route(
     user_id: int,
-    current_admin_user: User = Depends(get_current_admin_user), # Corrected dependency
+    current_admin_user: AuthenticatedUser = Depends(get_current_admin_user), # Corrected dependency
     db: Session = Depends(get_db)
 ):
     warehouses_with_roles = warehouse_service.get_user_warehouses_with_roles(db=db, user_id=user_id) # Call the new service function
@@ -67,19 +61,14 @@ def get_user_warehouses_route(
 def invite_user_to_warehouse_route(
     warehouse_id: int,
     invited_username: str, # Changed from invited_user_email
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     # Check if current_user is owner of the warehouse
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, warehouse_id)
-    if user_role != UserRole.owner:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only warehouse owners can invite users."
-        )
+    user_role = auth.require_owner(warehouse_id, detail="Only warehouse owners can invite users.")
 
     invited_user_warehouse = warehouse_service.invite_user_to_warehouse(
-        db, warehouse_id, invited_username, current_user.user_id # Changed invited_user_email to invited_username
+        db, warehouse_id, invited_username, auth.user.user_id, inviter_role=user_role # Changed invited_user_email to invited_username
     )
     if invited_user_warehouse is None:
         raise HTTPException(
@@ -91,7 +80,7 @@ def invite_user_to_warehouse_route(
 @router.delete("/{warehouse_id}", response_model=ResponseModel)
 def delete_warehouse_route(
     warehouse_id: int,
-    current_user: User = Depends(get_current_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     db_warehouse = warehouse_service.get_warehouse(db, warehouse_id)
@@ -99,17 +88,64 @@ def delete_warehouse_route(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Warehouse not found")
 
     # Only the owner of the warehouse can delete it
-    user_role = warehouse_service.get_user_warehouse_role(db, current_user.user_id, warehouse_id)
-    if user_role != UserRole.owner:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only warehouse owners can delete a warehouse."
-        )
+    auth.require_owner(warehouse_id, detail="Only warehouse owners can delete a warehouse.")
 
-    result = warehouse_service.delete_warehouse(db, warehouse_id)
+    result = warehouse_service.delete_warehouse(db, db_warehouse)
     if not result["success"]:
         if "items" in result["message"] or "categories" in result["message"] or "assignments" in result["message"]:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=result["message"])
         else:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result["message"])
-    return ResponseModel(message=result["message"])
\ No newline at end of file
+    return ResponseModel(message=result["message"])
+
+@router.get("/{warehouse_id}/stats", response_model=ResponseModel[WarehouseStatsResponse])
+def get_warehouse_stats_route(
+    warehouse_id: int,
+    request: Request,
+    response: Response,
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    auth.require_access(warehouse_id)
+    # Stats only change with items, which bump the version: same ETag scheme as the listings
+    etag = listing_etag(request, warehouse_id, warehouse_service.get_version(db, warehouse_id))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    stats = stats_service.get_stats(db, warehouse_id)
+    set_listing_headers(response, etag)
+    return ResponseModel(data=stats, message="Warehouse statistics retrieved successfully")
+
+@router.get("/{warehouse_id}/export", response_class=StreamingResponse)
+def export_warehouse_route(
+    warehouse_id: int,
+    format: str = "csv", # "csv" or "jsonl"
+    auth: AuthContext = Depends(get_auth_context)
+):
+    auth.require_access(warehouse_id)
+    if format not in import_export_service.MEDIA_TYPES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported export format")
+    # Read and sent in keyset batches; the body is produced after this returns
+    return StreamingResponse(
+        import_export_service.export_items(warehouse_id, format),
+        media_type=import_export_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="warehouse-{warehouse_id}.{format}"'}
+    )
+
+@router.post("/{warehouse_id}/import", response_model=ResponseModel[WarehouseImportResponse])
+def import_warehouse_route(
+    warehouse_id: int,
+    file: UploadFile = File(...),
+    format: Optional[str] = None, # "csv" or "jsonl"; from the file name when omitted
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    user_role = auth.require_access(warehouse_id)
+    format = format or import_export_service.format_for_filename(file.filename)
+    if format not in import_export_service.MEDIA_TYPES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported import format")
+    # Parsed straight from the spooled upload (sync route: runs in the thread pool)
+    try:
+        result = import_export_service.import_items(db, warehouse_id, user_role, file.file, format)
+    except import_export_service.InvalidImportFile as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return ResponseModel(data=result, message="Items imported successfully")
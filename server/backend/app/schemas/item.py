@@ -1,3 +1,4 @@
+from enum import Enum
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
@@ -36,3 +37,37 @@ class ItemResponse(ItemBase):
 
     class Config:
         from_attributes = True
+
+class ItemView(str, Enum):
+    full = "full" # ItemResponse
+    summary = "summary" # item_id, name, quantity and the first media's thumbnail_url
+
+class ItemMediaMode(str, Enum):
+    all = "all"
+    primary = "primary" # Only each item's first media
+
+class ItemBulkUpdate(ItemUpdate):
+    item_id: int
+
+class ItemBulkRequest(BaseModel):
+    create: List[ItemCreate] = []
+    update: List[ItemBulkUpdate] = []
+    delete: List[int] = [] # item_ids
+    restore: List[int] = [] # item_ids
+
+class ItemBulkCreated(BaseModel):
+    index: int # Position in the request's create list
+    item_id: int
+
+class ItemBulkError(BaseModel):
+    operation: str # "create", "update", "delete" or "restore"
+    index: int # Position in the request's list for that operation
+    item_id: Optional[int] = None
+    detail: str
+
+class ItemBulkResponse(BaseModel):
+    created: List[ItemBulkCreated] = []
+    updated: List[int] = []
+    deleted: List[int] = []
+    restored: List[int] = []
+    errors: List[ItemBulkError] = [] # Rows that were skipped; the others were written
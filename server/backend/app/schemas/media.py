@@ -1,7 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from ..models.item_media import FileType
+from ..models.item_media import FileType, MediaStatus
 
 class MediaBase(BaseModel):
     file_url: str
@@ -19,9 +19,23 @@ class MediaInDB(MediaBase):
     class Config:
         from_attributes = True
 
+class RenditionResponse(BaseModel):
+    size: int
+    format: str
+    width: int
+    height: int
+    file_url: str
+    file_size: int
+
+    class Config:
+        from_attributes = True
+
 class MediaResponse(MediaBase):
     id: int
     thumbnail_url: Optional[str] = None
+    file_size: Optional[int] = None
+    status: MediaStatus = MediaStatus.ready # "pending" until the thumbnail has been generated
+    renditions: List[RenditionResponse] = []
 
     class Config:
         from_attributes = True
@@ -7,3 +7,4 @@ class ResponseModel(BaseModel, Generic[T]):
     status: str = "success"
     data: Optional[T] = None
     message: Optional[str] = None
+    next_cursor: Optional[str] = None # Set on paginated listings when another page exists
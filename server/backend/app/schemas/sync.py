@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from .item import ItemBase
+from .media import MediaResponse
+from .category import CategoryResponse
+
+class SyncItem(ItemBase):
+    # Category and media come in their own lists; clients join them locally
+    item_id: int
+    warehouse_id: int
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None # Soft-deleted items are sent so clients can hide them
+
+    class Config:
+        from_attributes = True
+
+class SyncMedia(MediaResponse):
+    item_id: int
+
+class SyncDeleted(BaseModel):
+    items: List[int] = []
+    categories: List[int] = []
+    media: List[int] = []
+
+class SyncResponse(BaseModel):
+    token: str # Pass as `since` on the next sync
+    full: bool # True: the lists hold the whole warehouse, replace the local copy
+    items: List[SyncItem] = []
+    categories: List[CategoryResponse] = []
+    media: List[SyncMedia] = []
+    deleted: SyncDeleted = SyncDeleted()
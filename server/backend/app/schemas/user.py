@@ -23,3 +23,14 @@ class UserResponse(UserBase):
 
     class Config:
         from_attributes = True
+
+class AuthenticatedUser(BaseModel):
+    """The principal resolved from an access token; cached between requests."""
+    user_id: int
+    username: str
+    email: Optional[str] = None
+    is_admin: bool
+    password_fingerprint: str
+
+    class Config:
+        frozen = True
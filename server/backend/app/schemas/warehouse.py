@@ -53,3 +53,29 @@ class UserWarehouseResponse(UserWarehouseBase):
 
     class Config:
         from_attributes = True
+
+class ImportRowError(BaseModel):
+    line: int # Line number in the uploaded file
+    detail: str
+
+class WarehouseImportResponse(BaseModel):
+    imported: int
+    failed: int
+    created_categories: List[str] = []
+    errors: List[ImportRowError] = [] # The first 100 of `failed`
+
+class StatCounts(BaseModel):
+    item_count: int # Active items
+    total_quantity: int # Sum of active items' quantity
+    deleted_count: int # Soft-deleted items
+
+class CategoryStats(StatCounts):
+    category_id: Optional[int] = None # None: items without a category
+    name: Optional[str] = None
+
+class LocationStats(StatCounts):
+    location: Optional[str] = None
+
+class WarehouseStatsResponse(StatCounts):
+    categories: List[CategoryStats] = []
+    locations: List[LocationStats] = []
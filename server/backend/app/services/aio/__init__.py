@@ -0,0 +1,6 @@
+# Async versions of the services, on an AsyncSession (settings.database_mode = "async").
+# Reads are written with select(); writes, and the reads built on the sync services' legacy
+# queries, run the sync service on the same connection through AsyncSession.run_sync, so the
+# change log, warehouse stats and search index stay maintained in one place. Whatever a
+# function returns is fully loaded: the response is serialized outside the session's greenlet,
+# where a lazy load would fail.
@@ -0,0 +1,25 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from ...models.category import Category
+from ...schemas.category import CategoryCreate
+from .. import category as category_service
+
+async def create_category(db: AsyncSession, category: CategoryCreate) -> Category:
+    # Records the change (sync service); the category is refreshed after the commit
+    return await db.run_sync(category_service.create_category, category)
+
+async def get_category(db: AsyncSession, category_id: int) -> Optional[Category]:
+    return (await db.execute(select(Category).filter(Category.category_id == category_id))).scalars().first()
+
+async def get_category_by_name_and_warehouse(db: AsyncSession, name: str, warehouse_id: int) -> Optional[Category]:
+    return (await db.execute(
+        select(Category).filter(Category.name == name, Category.warehouse_id == warehouse_id)
+    )).scalars().first()
+
+async def get_categories_by_warehouse(db: AsyncSession, warehouse_id: int) -> List[Category]:
+    return list((await db.execute(select(Category).filter(Category.warehouse_id == warehouse_id))).scalars().all())
+
+async def delete_category(db: AsyncSession, db_category: Category) -> dict:
+    return await db.run_sync(category_service.delete_category, db_category)
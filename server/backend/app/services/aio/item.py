@@ -0,0 +1,64 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+
+from ...models.item import Item
+from ...models.user_warehouse import UserRole
+from ...schemas.item import ItemCreate, ItemUpdate, ItemBulkRequest
+from ..loaders import item_response_options
+from .. import item as item_service
+from .. import response_rows
+
+async def create_item(db: AsyncSession, item: ItemCreate) -> Item:
+    return await db.run_sync(item_service.create_item, item)
+
+async def get_item(db: AsyncSession, item_id: int, include_deleted: bool = False) -> Optional[Item]:
+    query = select(Item).options(*item_response_options()).filter(Item.item_id == item_id)
+    if not include_deleted:
+        query = query.filter(Item.deleted_at == None)
+    return (await db.execute(query)).scalars().first()
+
+def _warehouse_items_query(warehouse_id: int, deleted: bool):
+    deleted_filter = Item.deleted_at != None if deleted else Item.deleted_at == None
+    return select(Item).filter(Item.warehouse_id == warehouse_id, deleted_filter)
+
+async def get_items_by_warehouse(
+    db: AsyncSession, warehouse_id: int, limit: Optional[int] = None, after_id: Optional[int] = None,
+    deleted: bool = False
+) -> List[Item]:
+    """item.get_items_by_warehouse, or get_deleted_items_by_warehouse with deleted."""
+    query = _warehouse_items_query(warehouse_id, deleted).options(*item_response_options())
+    # _apply_keyset only uses filter, order_by and limit, which select() has too
+    return list((await db.execute(item_service._apply_keyset(query, limit, after_id))).scalars().all())
+
+async def get_item_rows_by_warehouse(
+    db: AsyncSession, warehouse_id: int, limit: Optional[int] = None, after_id: Optional[int] = None,
+    deleted: bool = False, projection: response_rows.ItemProjection = response_rows.ItemProjection()
+) -> List[dict]:
+    return await db.run_sync(
+        item_service.get_item_rows_by_warehouse, warehouse_id, limit, after_id, deleted, projection
+    )
+
+async def search_all_items(
+    db: AsyncSession, user_id: int, query: str, limit: Optional[int] = None, after_id: Optional[int] = None
+) -> List[Item]:
+    """item.search_all_items; raises ValueError if the cursor item no longer matches the query."""
+    return await db.run_sync(item_service.search_all_items, user_id, query, limit, after_id)
+
+async def search_item_rows(
+    db: AsyncSession, user_id: int, query: str, limit: Optional[int] = None, after_id: Optional[int] = None,
+    projection: response_rows.ItemProjection = response_rows.ItemProjection()
+) -> List[dict]:
+    return await db.run_sync(item_service.search_item_rows, user_id, query, limit, after_id, projection)
+
+async def update_item(db: AsyncSession, db_item: Item, item_update: ItemUpdate) -> Item:
+    return await db.run_sync(item_service.update_item, db_item, item_update)
+
+async def delete_item(db: AsyncSession, db_item: Item) -> Item:
+    return await db.run_sync(item_service.delete_item, db_item)
+
+async def restore_item(db: AsyncSession, db_item: Item) -> Item:
+    return await db.run_sync(item_service.restore_item, db_item)
+
+async def bulk_change_items(db: AsyncSession, roles: Dict[int, UserRole], changes: ItemBulkRequest) -> dict:
+    return await db.run_sync(item_service.bulk_change_items, roles, changes)
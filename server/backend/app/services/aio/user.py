@@ -0,0 +1,27 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from ...models.user import User
+from ...schemas.user import AuthenticatedUser
+from ..user import principal_cache, invalidate_principal, to_principal
+
+async def get_principal(db: AsyncSession, username: str, refresh: bool = False) -> Optional[AuthenticatedUser]:
+    """user.get_principal: the user as cached for authentication; refresh skips (and replaces) the cached entry."""
+    if refresh:
+        invalidate_principal(username)
+    else:
+        principal = principal_cache.get(username)
+        if principal is not None:
+            return principal
+    # Taken before the read: a password change committed meanwhile keeps this load out of the cache
+    generation = principal_cache.generation()
+    db_user = await get_user_by_username(db, username)
+    if db_user is None:
+        return None
+    principal = to_principal(db_user)
+    principal_cache.set(username, principal, generation)
+    return principal
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    return (await db.execute(select(User).filter(User.username == username))).scalars().first()
@@ -0,0 +1,43 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+
+from ...models.warehouse import Warehouse
+from ...models.user_warehouse import UserWarehouse, UserRole
+from ...schemas.warehouse import WarehouseCreate
+from ..loaders import warehouse_response_options
+from .. import warehouse as warehouse_service
+
+async def create_warehouse(db: AsyncSession, warehouse: WarehouseCreate, user_id: int) -> Warehouse:
+    # The warehouse and its owner are written in one transaction
+    db_warehouse = Warehouse(name=warehouse.name, description=warehouse.description, created_by_user_id=user_id)
+    db.add(db_warehouse)
+    await db.flush()
+    warehouse_id = db_warehouse.warehouse_id
+    db.add(UserWarehouse(user_id=user_id, warehouse_id=warehouse_id, role=UserRole.owner))
+    await db.commit()
+    return (await db.execute(
+        select(Warehouse).options(*warehouse_response_options()).filter(Warehouse.warehouse_id == warehouse_id)
+    )).scalars().one()
+
+def _user_warehouses_query(user_id: int):
+    return select(Warehouse).join(UserWarehouse).filter(UserWarehouse.user_id == user_id)
+
+async def get_user_warehouses(db: AsyncSession, user_id: int) -> List[Warehouse]:
+    return list((await db.execute(
+        _user_warehouses_query(user_id).options(*warehouse_response_options())
+    )).scalars().all())
+
+async def get_user_warehouse_rows(db: AsyncSession, user_id: int) -> List[dict]:
+    """get_user_warehouses as WarehouseResponse dicts."""
+    return await db.run_sync(warehouse_service.get_user_warehouse_rows, user_id)
+
+async def get_version(db: AsyncSession, warehouse_id: int) -> Optional[int]:
+    return (await db.execute(select(Warehouse.version).filter(Warehouse.warehouse_id == warehouse_id))).scalar()
+
+async def get_user_warehouse_roles(db: AsyncSession, user_id: int) -> Dict[int, UserRole]:
+    """All of a user's warehouse roles in one query, keyed by warehouse_id."""
+    rows = (await db.execute(
+        select(UserWarehouse.warehouse_id, UserWarehouse.role).filter(UserWarehouse.user_id == user_id)
+    )).all()
+    return {warehouse_id: role for warehouse_id, role in rows}
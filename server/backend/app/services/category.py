@@ -2,10 +2,14 @@ from sqlalchemy.orm import Session
 from ..models.category import Category
 from ..models.item import Item # Import Item model
 from ..schemas.category import CategoryCreate
+from ..models.change_log import ChangeEntity
+from . import sync as sync_service
 
 def create_category(db: Session, category: CategoryCreate):
     db_category = Category(name=category.name, warehouse_id=category.warehouse_id)
     db.add(db_category)
+    db.flush() # Assigns category_id for the change log
+    sync_service.record_change(db, db_category.warehouse_id, ChangeEntity.category, db_category.category_id)
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -19,16 +23,17 @@ def get_category_by_name_and_warehouse(db: Session, name: str, warehouse_id: int
 def get_categories_by_warehouse(db: Session, warehouse_id: int):
     return db.query(Category).filter(Category.warehouse_id == warehouse_id).all()
 
-def delete_category(db: Session, category_id: int) -> dict:
-    db_category = db.query(Category).filter(Category.category_id == category_id).first()
-    if not db_category:
-        return {"success": False, "message": "Category not found"}
-    
-    # Check if any active items are using this category
-    associated_items_count = db.query(Item).filter(Item.category_id == category_id, Item.deleted_at == None).count()
-    if associated_items_count > 0:
+def category_in_use(db: Session, category_id: int) -> bool:
+    # Whether any active items are using this category
+    return db.query(
+        db.query(Item.item_id).filter(Item.category_id == category_id, Item.deleted_at == None).exists()
+    ).scalar()
+
+def delete_category(db: Session, db_category: Category) -> dict:
+    if category_in_use(db, db_category.category_id):
         return {"success": False, "message": "Category is in use by active items and cannot be deleted"}
 
     db.delete(db_category)
+    sync_service.record_change(db, db_category.warehouse_id, ChangeEntity.category, db_category.category_id)
     db.commit()
     return {"success": True, "message": "Category deleted successfully"}
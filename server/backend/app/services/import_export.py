@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.category import Category
+from ..models.item import Item
+from ..models.item_media import ItemMedia
+from ..models.user_warehouse import UserRole
+from ..schemas.category import CategoryCreate
+from ..schemas.item import ItemBulkRequest, ItemCreate
+from ..utils.settings import settings
+from . import category as category_service
+from . import item as item_service
+
+# Warehouse import and export as CSV or JSON Lines.
+# Export reads the warehouse's active items in keyset batches and sends each batch as one
+# chunk of a streamed response, so memory use does not depend on the warehouse size. Import reads
+# the upload row by row and writes every settings.import_batch_size rows in one transaction
+# through item_service.bulk_change_items, creating unknown categories on the way.
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+CSV_FIELDS = ["item_id", "name", "location", "quantity", "category", "media"]
+MAX_NAME_LENGTH = 255 # name, location and category name are String(255)
+MAX_REPORTED_ERRORS = 100
+
+class InvalidImportFile(Exception):
+    """The upload cannot be read at all (as opposed to single bad rows, which are skipped)."""
+
+def format_for_filename(filename: Optional[str]) -> str:
+    return "jsonl" if (filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+def _exported_items(db: Session, warehouse_id: int) -> Iterator[List[dict]]:
+    """Batches of active items, each with its category name and media URLs."""
+    last_id = 0
+    while True:
+        # Keyset batches (as in search_service.rebuild_index) rather than a server-side
+        # cursor, which the mysql-connector dialect does not support: it would buffer the
+        # whole result. Each batch is two indexed queries.
+        rows = (
+            db.query(Item.item_id, Item.name, Item.location, Item.quantity, Category.name)
+            .outerjoin(Category, Item.category_id == Category.category_id)
+            .filter(Item.warehouse_id == warehouse_id, Item.deleted_at == None, Item.item_id > last_id)
+            .order_by(Item.item_id)
+            .limit(settings.export_batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        items = {
+            item_id: {"item_id": item_id, "name": name, "location": location,
+                      "quantity": quantity, "category": category_name, "media": []}
+            for item_id, name, location, quantity, category_name in rows
+        }
+        media = (
+            db.query(ItemMedia.item_id, ItemMedia.file_url)
+            .filter(ItemMedia.item_id.in_(items))
+            .order_by(ItemMedia.id)
+        )
+        for item_id, file_url in media:
+            items[item_id]["media"].append(file_url)
+        db.rollback() # Hands the connection back to the pool while the client reads the chunk
+        yield list(items.values())
+        last_id = rows[-1][0]
+
+def _encode(items: List[dict], format: str) -> bytes:
+    if format == "jsonl":
+        return "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for item in items:
+        writer.writerow([
+            item["item_id"], item["name"], item["location"], item["quantity"], item["category"], " ".join(item["media"])
+        ])
+    return buffer.getvalue().encode()
+
+def export_items(warehouse_id: int, format: str) -> Iterator[bytes]:
+    """
+    Body of the export StreamingResponse. Uses its own session: it runs after the route has
+    returned, chunk by chunk in the thread pool.
+    """
+    db = SessionLocal()
+    try:
+        if format == "csv":
+            # The BOM lets spreadsheet applications detect UTF-8 (Chinese names)
+            yield ("\ufeff" + ",".join(CSV_FIELDS) + "\r\n").encode()
+        for items in _exported_items(db, warehouse_id):
+            yield _encode(items, format)
+    finally:
+        db.close()
+
+def _csv_rows(text: io.TextIOWrapper) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None or "name" not in reader.fieldnames:
+        raise InvalidImportFile("The CSV header must include a name column")
+    for row in reader:
+        yield reader.line_num, row
+
+def _jsonl_rows(text: io.TextIOWrapper) -> Iterator[Tuple[int, object]]:
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f"Invalid JSON: {e.msg}")
+
+def _text_field(row: dict, key: str) -> Optional[str]:
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    if len(value) > MAX_NAME_LENGTH:
+        raise ValueError(f"{key} is longer than {MAX_NAME_LENGTH} characters")
+    return value or None
+
+def _parse_row(row: object) -> Tuple[str, Optional[str], int, Optional[str]]:
+    """(name, location, quantity, category name) of an imported row, or raises ValueError."""
+    if isinstance(row, ValueError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Expected a JSON object")
+    name = _text_field(row, "name")
+    if name is None:
+        raise ValueError("name is required")
+    quantity = row.get("quantity")
+    if quantity is None or quantity == "":
+        quantity = 1
+    elif isinstance(quantity, bool) or not str(quantity).strip().lstrip("-").isdigit():
+        raise ValueError("quantity must be an integer")
+    return name, _text_field(row, "location"), int(quantity), _text_field(row, "category")
+
+def _add_error(result: dict, line: int, detail: str):
+    result["failed"] += 1
+    if len(result["errors"]) < MAX_REPORTED_ERRORS:
+        result["errors"].append({"line": line, "detail": detail})
+
+def _write_batch(db: Session, warehouse_id: int, role: UserRole, batch: List[Tuple[int, ItemCreate]], result: dict):
+    outcome = item_service.bulk_change_items(
+        db, {warehouse_id: role}, ItemBulkRequest(create=[item for _, item in batch])
+    )
+    result["imported"] += len(outcome["created"])
+    for error in outcome["errors"]:
+        _add_error(result, batch[error["index"]][0], error["detail"])
+
+def import_items(db: Session, warehouse_id: int, role: UserRole, upload: BinaryIO, format: str) -> dict:
+    """
+    Imports items from a CSV (header with at least a name column) or JSON Lines upload.
+    Columns/keys: name, location, quantity, category (by name); others, such as the
+    item_id and media of an export, are ignored. Categories that do not exist yet are
+    created. Bad rows are skipped and reported by line number; each batch of good rows
+    is committed as it fills up.
+    """
+    result = {"imported": 0, "failed": 0, "created_categories": [], "errors": []}
+    categories: Dict[str, int] = {
+        category.name: category.category_id for category in category_service.get_categories_by_warehouse(db, warehouse_id)
+    }
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    rows: Iterable[Tuple[int, object]] = _csv_rows(text) if format == "csv" else _jsonl_rows(text)
+    batch: List[Tuple[int, ItemCreate]] = []
+    line = 0
+    try:
+        for line, row in rows:
+            try:
+                name, location, quantity, category_name = _parse_row(row)
+            except ValueError as e:
+                _add_error(result, line, str(e))
+                continue
+            category_id = None
+            if category_name is not None:
+                if category_name not in categories:
+                    db_category = category_service.create_category(
+                        db, CategoryCreate(name=category_name, warehouse_id=warehouse_id)
+                    )
+                    categories[category_name] = db_category.category_id
+                    result["created_categories"].append(category_name)
+                category_id = categories[category_name]
+            batch.append((line, ItemCreate(
+                name=name, location=location, quantity=quantity, category_id=category_id, warehouse_id=warehouse_id
+            )))
+            if len(batch) >= settings.import_batch_size:
+                _write_batch(db, warehouse_id, role, batch, result)
+                batch = []
+    except (csv.Error, UnicodeDecodeError) as e:
+        # Unreadable from here on: keep what was read so far
+        if line == 0 and not batch and not result["imported"]:
+            raise InvalidImportFile(f"Cannot read the file: {e}")
+        _add_error(result, line + 1, f"Cannot read the rest of the file: {e}")
+    finally:
+        text.detach() # The upload is closed by its owner
+    if batch:
+        _write_batch(db, warehouse_id, role, batch, result)
+    return result
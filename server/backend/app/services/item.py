@@ -1,42 +1,98 @@
-from sqlalchemy.orm import Session, joinedload
+from collections import defaultdict
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 
 from ..models.item import Item
 from ..models.user_warehouse import UserWarehouse, UserRole
 from ..models.category import Category # Import Category model
-from ..schemas.item import ItemCreate, ItemUpdate
+from ..models.change_log import ChangeEntity
+from ..schemas.item import ItemCreate, ItemUpdate, ItemBulkRequest
+from .loaders import item_response_options
+from . import response_rows
+from . import search as search_service
+from . import sync as sync_service
+from . import stats as stats_service
 
 def create_item(db: Session, item: ItemCreate):
     db_item = Item(**item.dict())
     db.add(db_item)
+    db.flush() # Assigns item_id for the search index
+    search_service.index_item(db, db_item)
+    sync_service.record_change(db, db_item.warehouse_id, ChangeEntity.item, db_item.item_id)
+    stats_service.record_item_change(db, db_item.warehouse_id, None, stats_service.item_state(db_item))
+    item_id = db_item.item_id
     db.commit()
-    db.refresh(db_item)
-    return db_item
+    return _reload(db, item_id)
 
 def get_item(db: Session, item_id: int, include_deleted: bool = False):
-    query = db.query(Item).filter(Item.item_id == item_id)
+    query = db.query(Item).options(*item_response_options()).filter(Item.item_id == item_id)
     if not include_deleted:
         query = query.filter(Item.deleted_at == None)
     return query.first()
 
-def get_items_by_warehouse(db: Session, warehouse_id: int) -> List[Item]:
+def _apply_keyset(query, limit: Optional[int], after_id: Optional[int]):
+    """
+    Orders by item_id and starts after the cursor key. When a limit is given one extra
+    row is fetched so the caller can tell whether another page exists.
+    """
+    if after_id is not None:
+        query = query.filter(Item.item_id > after_id)
+    query = query.order_by(Item.item_id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+def _warehouse_items_query(db: Session, warehouse_id: int, deleted: bool):
+    deleted_filter = Item.deleted_at != None if deleted else Item.deleted_at == None
+    return db.query(Item).filter(Item.warehouse_id == warehouse_id, deleted_filter)
+
+def get_items_by_warehouse(
+    db: Session, warehouse_id: int, limit: Optional[int] = None, after_id: Optional[int] = None
+) -> List[Item]:
     # Only return active (not soft-deleted) items
-    return db.query(Item).filter(Item.warehouse_id == warehouse_id, Item.deleted_at == None).all()
+    query = _warehouse_items_query(db, warehouse_id, deleted=False).options(*item_response_options())
+    return _apply_keyset(query, limit, after_id).all()
 
-def get_deleted_items_by_warehouse(db: Session, warehouse_id: int) -> List[Item]:
+def get_deleted_items_by_warehouse(
+    db: Session, warehouse_id: int, limit: Optional[int] = None, after_id: Optional[int] = None
+) -> List[Item]:
     # Return only soft-deleted items
-    return db.query(Item).filter(Item.warehouse_id == warehouse_id, Item.deleted_at != None).all()
+    query = _warehouse_items_query(db, warehouse_id, deleted=True).options(*item_response_options())
+    return _apply_keyset(query, limit, after_id).all()
+
+def get_item_rows_by_warehouse(
+    db: Session, warehouse_id: int, limit: Optional[int] = None, after_id: Optional[int] = None,
+    deleted: bool = False, projection: response_rows.ItemProjection = response_rows.ItemProjection()
+) -> List[dict]:
+    """get_items_by_warehouse (or get_deleted_items_by_warehouse) as ItemResponse dicts."""
+    query = _warehouse_items_query(db, warehouse_id, deleted)
+    return response_rows.item_rows(db, _apply_keyset(query, limit, after_id), projection)
+
+def _search_query(db: Session, user_id: int, query: str, limit: Optional[int], after_id: Optional[int]):
+    # The search, ordered and limited, without loader options (see search_all_items)
+    item_match = search_service.get_search_backend().match(query)
+    if item_match is not None:
+        items_query = (
+            db.query(Item)
+            .join(item_match, Item.item_id == item_match.c.item_id)
+            .join(UserWarehouse, Item.warehouse_id == UserWarehouse.warehouse_id)
+            .filter(UserWarehouse.user_id == user_id, Item.deleted_at == None)
+        )
+        # Ranked, paginated or not: keyset on (score, item_id), the cursor being the previous page's last item
+        if after_id is not None:
+            after_score = db.query(item_match.c.score).filter(item_match.c.item_id == after_id).scalar()
+            if after_score is None:
+                raise ValueError("The cursor item no longer matches the query")
+            items_query = items_query.filter(
+                (item_match.c.score < after_score) | ((item_match.c.score == after_score) & (Item.item_id > after_id))
+            )
+        items_query = items_query.order_by(item_match.c.score.desc(), Item.item_id)
+        return items_query.limit(limit + 1) if limit is not None else items_query
 
-def search_all_items(db: Session, user_id: int, query: str) -> List[Item]:
-    """
-    Searches for items across all warehouses accessible by the user.
-    Filters by item name, category name, and location.
-    Excludes soft-deleted items.
-    """
     search_pattern = f"%{query.lower()}%"
     
-    return (
+    items_query = (
         db.query(Item)
         .join(UserWarehouse, Item.warehouse_id == UserWarehouse.warehouse_id)
         .outerjoin(Category, Item.category_id == Category.category_id) # Outerjoin to include items without category
@@ -49,44 +105,205 @@ def search_all_items(db: Session, user_id: int, query: str) -> List[Item]:
                 func.lower(func.coalesce(Category.name, '')).like(search_pattern) # Search by category name, handle None
             )
         )
-        # .options(joinedload(Item.category)) # Eager load category for response - Removed for debugging 
-        .all()
     )
+    return _apply_keyset(items_query, limit, after_id)
 
-def update_item(db: Session, item_id: int, item_update: ItemUpdate):
-    db_item = get_item(db, item_id)
-    if not db_item:
-        return None
-    
+def search_all_items(
+    db: Session, user_id: int, query: str, limit: Optional[int] = None, after_id: Optional[int] = None
+) -> List[Item]:
+    """
+    Searches for items across all warehouses accessible by the user.
+    Filters by item name, category name, and location.
+    Excludes soft-deleted items.
+    Uses the full-text index when the database supports it; results (paginated or not) are
+    then ordered by relevance, else by item_id. Raises ValueError if the cursor item no
+    longer matches the query.
+    """
+    # Eager load category and media for ItemResponse
+    return _search_query(db, user_id, query, limit, after_id).options(*item_response_options()).all()
+
+def search_item_rows(
+    db: Session, user_id: int, query: str, limit: Optional[int] = None, after_id: Optional[int] = None,
+    projection: response_rows.ItemProjection = response_rows.ItemProjection()
+) -> List[dict]:
+    """search_all_items as ItemResponse dicts."""
+    return response_rows.item_rows(db, _search_query(db, user_id, query, limit, after_id), projection)
+
+def _reload(db: Session, item_id: int) -> Item:
+    # Re-populates the instance expired by commit, eager loading what ItemResponse serializes
+    return get_item(db, item_id, include_deleted=True)
+
+def update_item(db: Session, db_item: Item, item_update: ItemUpdate):
     update_data = item_update.dict(exclude_unset=True)
+    before = stats_service.item_state(db_item)
     for key, value in update_data.items():
         setattr(db_item, key, value)
         
     db.add(db_item)
+    if update_data.keys() & {"name", "location", "category_id"}:
+        search_service.index_item(db, db_item)
+    sync_service.record_change(db, db_item.warehouse_id, ChangeEntity.item, db_item.item_id)
+    stats_service.record_item_change(db, db_item.warehouse_id, before, stats_service.item_state(db_item))
+    item_id = db_item.item_id
     db.commit()
-    db.refresh(db_item)
-    return db_item
+    return _reload(db, item_id)
 
-def delete_item(db: Session, item_id: int):
+def delete_item(db: Session, db_item: Item):
     """
     Soft deletes an item by setting its deleted_at timestamp.
     """
-    db_item = get_item(db, item_id)
-    if not db_item:
-        return None
+    before = stats_service.item_state(db_item)
     db_item.deleted_at = func.now()
+    search_service.remove_item(db, db_item.item_id)
+    sync_service.record_change(db, db_item.warehouse_id, ChangeEntity.item, db_item.item_id)
+    stats_service.record_item_change(db, db_item.warehouse_id, before, stats_service.item_state(db_item))
     db.commit()
-    db.refresh(db_item)
     return db_item
 
-def restore_item(db: Session, item_id: int):
+def restore_item(db: Session, db_item: Item):
     """
     Restores a soft-deleted item by setting its deleted_at timestamp to None.
     """
-    db_item = db.query(Item).filter(Item.item_id == item_id).first()
-    if not db_item:
-        return None
+    before = stats_service.item_state(db_item)
     db_item.deleted_at = None
+    search_service.index_item(db, db_item)
+    sync_service.record_change(db, db_item.warehouse_id, ChangeEntity.item, db_item.item_id)
+    stats_service.record_item_change(db, db_item.warehouse_id, before, stats_service.item_state(db_item))
+    item_id = db_item.item_id
     db.commit()
-    db.refresh(db_item)
-    return db_item
+    return _reload(db, item_id)
+
+def bulk_change_items(db: Session, roles: Dict[int, UserRole], changes: ItemBulkRequest) -> dict:
+    """
+    Applies a batch of creates, updates, soft deletes and restores in one transaction.
+    The targeted items and categories are loaded with one query each, so access and
+    category_id are checked once per distinct warehouse and category. Rows that fail a check
+    are skipped and listed in "errors"; the rest are written with batched statements.
+    `roles` are the caller's roles by warehouse_id.
+    """
+    errors = []
+
+    def fail(operation: str, index: int, detail: str, item_id: Optional[int] = None):
+        errors.append({"operation": operation, "index": index, "item_id": item_id, "detail": detail})
+
+    target_ids = {change.item_id for change in changes.update} | set(changes.delete) | set(changes.restore)
+    items = {
+        db_item.item_id: db_item
+        for db_item in (db.query(Item).filter(Item.item_id.in_(target_ids)) if target_ids else [])
+    }
+    category_ids = {change.category_id for change in changes.create + changes.update if change.category_id is not None}
+    category_ids |= {db_item.category_id for db_item in items.values() if db_item.category_id is not None}
+    categories = {
+        category_id: (warehouse_id, name)
+        for category_id, warehouse_id, name in (
+            db.query(Category.category_id, Category.warehouse_id, Category.name)
+            .filter(Category.category_id.in_(category_ids)) if category_ids else []
+        )
+    }
+
+    def category_valid(category_id: Optional[int], warehouse_id: int) -> bool:
+        return category_id is None or categories.get(category_id, (None,))[0] == warehouse_id
+
+    created = []
+    for index, item in enumerate(changes.create):
+        if item.warehouse_id not in roles:
+            fail("create", index, "You do not have access to this warehouse.")
+        elif not category_valid(item.category_id, item.warehouse_id):
+            fail("create", index, "Invalid category_id for this warehouse")
+        else:
+            created.append((index, Item(**item.dict())))
+
+    seen: Set[int] = set()
+
+    def target(operation: str, index: int, item_id: int, deleted_ok: bool, owner_only: bool) -> Optional[Item]:
+        # Same rules as the single-item routes; an item may only be targeted once per batch
+        db_item = items.get(item_id)
+        if item_id in seen:
+            fail(operation, index, "Item appears more than once in this batch", item_id)
+        elif db_item is None or (db_item.deleted_at is not None and not deleted_ok):
+            fail(operation, index, "Item not found", item_id)
+        elif db_item.warehouse_id not in roles:
+            fail(operation, index, "You do not have access to this item's warehouse.", item_id)
+        elif owner_only and roles[db_item.warehouse_id] != UserRole.owner:
+            fail(operation, index, f"Only owners can {operation} items in this warehouse.", item_id)
+        else:
+            seen.add(item_id)
+            return db_item
+        return None
+
+    stat_changes: Dict[int, List[tuple]] = defaultdict(list)
+    for _, db_item in created:
+        stat_changes[db_item.warehouse_id].append((None, stats_service.item_state(db_item)))
+
+    updated = []
+    reindexed = []
+    for index, change in enumerate(changes.update):
+        db_item = target("update", index, change.item_id, deleted_ok=False, owner_only=False)
+        if db_item is None:
+            continue
+        if not category_valid(change.category_id, db_item.warehouse_id):
+            fail("update", index, "Invalid category_id for this warehouse", change.item_id)
+            continue
+        update_data = change.dict(exclude_unset=True, exclude={"item_id"})
+        before = stats_service.item_state(db_item)
+        for key, value in update_data.items():
+            setattr(db_item, key, value)
+        stat_changes[db_item.warehouse_id].append((before, stats_service.item_state(db_item)))
+        updated.append(db_item)
+        if update_data.keys() & {"name", "location", "category_id"}:
+            reindexed.append(db_item)
+
+    deleted = []
+    for index, item_id in enumerate(changes.delete):
+        db_item = target("delete", index, item_id, deleted_ok=False, owner_only=True)
+        if db_item is not None:
+            deleted.append(db_item)
+            before = stats_service.item_state(db_item)
+            stat_changes[db_item.warehouse_id].append((before, before[:3] + (True,)))
+    restored = []
+    for index, item_id in enumerate(changes.restore):
+        db_item = target("restore", index, item_id, deleted_ok=True, owner_only=True)
+        if db_item is not None:
+            restored.append(db_item)
+            before = stats_service.item_state(db_item)
+            stat_changes[db_item.warehouse_id].append((before, before[:3] + (False,)))
+
+    # The new item_ids are needed below. Dialects that return ids in parameter order
+    # (PostgreSQL) get one batched INSERT; SQLite and MySQL cannot guarantee that order, so
+    # the ORM inserts row by row there, on this connection and without per-row commits.
+    db.add_all(db_item for _, db_item in created)
+    db.flush() # Also writes the updates, as executemany per set of changed columns
+    deleted_ids = [db_item.item_id for db_item in deleted]
+    restored_ids = [db_item.item_id for db_item in restored]
+    if deleted_ids:
+        db.query(Item).filter(Item.item_id.in_(deleted_ids)).update(
+            {Item.deleted_at: func.now()}, synchronize_session=False
+        )
+    if restored_ids:
+        db.query(Item).filter(Item.item_id.in_(restored_ids)).update(
+            {Item.deleted_at: None}, synchronize_session=False
+        )
+
+    category_names = {category_id: name for category_id, (_, name) in categories.items()}
+    search_service.index_items(db, [db_item for _, db_item in created] + reindexed + restored, category_names)
+    search_service.remove_items(db, deleted_ids)
+
+    changed_by_warehouse: Dict[int, Set[int]] = defaultdict(set)
+    for db_item in [db_item for _, db_item in created] + updated + deleted + restored:
+        changed_by_warehouse[db_item.warehouse_id].add(db_item.item_id)
+    # Warehouse rows are locked in id order, as in sync_service.record_media_changes
+    for warehouse_id in sorted(changed_by_warehouse):
+        sync_service.record_changes(
+            db, warehouse_id, [(ChangeEntity.item, item_id) for item_id in changed_by_warehouse[warehouse_id]]
+        )
+        stats_service.record_item_changes(db, warehouse_id, stat_changes[warehouse_id])
+
+    result = {
+        "created": [{"index": index, "item_id": db_item.item_id} for index, db_item in created],
+        "updated": [db_item.item_id for db_item in updated],
+        "deleted": deleted_ids,
+        "restored": restored_ids,
+        "errors": errors,
+    }
+    db.commit()
+    return result
@@ -0,0 +1,21 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from ..models.item import Item
+from ..models.item_media import ItemMedia
+from ..models.warehouse import Warehouse
+
+# Loader option profiles, one per response schema.
+# Every service that returns ORM objects serialized through a response schema
+# should apply the matching profile so that Pydantic's from_attributes does not
+# trigger a lazy load per row.
+
+def item_response_options():
+    """Options for ItemResponse: category is many-to-one (joined), media and renditions are one-to-many (selectin)."""
+    return (
+        joinedload(Item.category),
+        selectinload(Item.media).selectinload(ItemMedia.renditions),
+    )
+
+def warehouse_response_options():
+    """Options for WarehouseResponse: the creator is always serialized."""
+    return (joinedload(Warehouse.creator),)
@@ -1,20 +1,23 @@
-from sqlalchemy.orm import Session
-from ..models.item_media import ItemMedia
+from sqlalchemy.orm import Session, joinedload
+from ..models.item_media import ItemMedia, FileType, MediaStatus
 from ..schemas.media import MediaCreate
-from typing import Callable, Optional
+from typing import BinaryIO, Iterable, NamedTuple, Optional
+import hashlib
+import logging
 import os
 import shutil
+import subprocess
 from PIL import Image # For thumbnail generation
-import io # Import io module
 from ..utils.settings import settings # Import settings
+from . import media_store
+from . import sync as sync_service
+from .media_store import derived_url, remove_file
+from .storage import get_storage, key_from_url, scratch_path
 
-# Define upload directories based on settings
-UPLOAD_DIR = os.path.join(settings.upload_dir, "original")
-THUMBNAIL_DIR = os.path.join(settings.upload_dir, "thumbnails")
+logger = logging.getLogger(__name__)
 
-# Ensure directories exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+# Files are laid out by content hash (services/media_store.py) in the configured storage
+# backend (services/storage.py): local upload_dir or an S3-compatible bucket
 
 def create_item_media(db: Session, media: dict):
     db_media = ItemMedia(**media)
@@ -24,69 +27,166 @@ def create_item_media(db: Session, media: dict):
     return db_media
 
 def get_media_by_id(db: Session, media_id: int):
-    return db.query(ItemMedia).filter(ItemMedia.id == media_id).first()
+    # The item is needed for the warehouse access check
+    return db.query(ItemMedia).options(joinedload(ItemMedia.item)).filter(ItemMedia.id == media_id).first()
 
-def save_upload_file(upload_file_content: bytes, filename: str, file_type: str) -> tuple[str, Optional[str]]:
-    """Saves the uploaded file and generates a thumbnail if it's an image, with compression."""
-    file_extension = os.path.splitext(filename)[1].lower()
-    unique_filename = f"{os.urandom(16).hex()}{file_extension}"
-    
-    original_filepath = os.path.join(UPLOAD_DIR, unique_filename)
-    thumbnail_filepath = os.path.join(THUMBNAIL_DIR, unique_filename)
+class UploadTooLarge(Exception):
+    pass
+
+class SavedUpload(NamedTuple):
+    temp_path: str # Streamed upload, moved into the content store by media_store.place_upload
+    extension: str
+    file_size: int # Bytes as uploaded
+    sha256: str # Hex digest of the bytes as uploaded
 
-    file_url = f"/uploads/original/{unique_filename}"
-    thumbnail_url: Optional[str] = None
+def _stream_to_disk(source: BinaryIO, path: str) -> tuple[int, str]:
+    """Copies source to path in fixed-size chunks, hashing as it goes. Returns (size, sha256)."""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as buffer:
+            while True:
+                chunk = source.read(settings.media_upload_chunk_bytes)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.media_max_upload_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return size, digest.hexdigest()
 
-    if file_type.startswith("image/"):
-        try:
-            # Open image from bytes
-            img = Image.open(io.BytesIO(upload_file_content))
+def save_upload_file(upload_file: BinaryIO, filename: str) -> SavedUpload:
+    """
+    Streams the uploaded file to a temporary file, hashing it on the way. Memory use does not
+    depend on the file size. The caller stores it under its hash (services/media_store.py);
+    compression and thumbnails are done later by process_media_file (services/media_jobs.py).
+    Raises UploadTooLarge past settings.media_max_upload_bytes.
+    """
+    file_extension = os.path.splitext(filename)[1].lower()
+    # Same filesystem as local storage, so placing the file is a rename
+    partial_filepath = scratch_path(".part")
+    file_size, sha256 = _stream_to_disk(upload_file, partial_filepath)
+    return SavedUpload(partial_filepath, file_extension, file_size, sha256)
 
+def _process_image(original_filepath: str, compressed_filepath: str, thumbnail_filepath: str) -> bool:
+    file_extension = os.path.splitext(original_filepath)[1].lower()
+    try:
+        with Image.open(original_filepath) as img:
             # Save compressed original image
             if file_extension in ['.jpg', '.jpeg']:
-                img.save(original_filepath, quality=80) # Compress JPEG
+                img.save(compressed_filepath, quality=80) # Compress JPEG
             elif file_extension == '.png':
-                img.save(original_filepath, optimize=True) # Optimize PNG
+                img.save(compressed_filepath, optimize=True) # Optimize PNG
             else:
                 # For other image types, save without specific compression
-                img.save(original_filepath)
+                img.save(compressed_filepath)
 
             # Generate thumbnail
             img.thumbnail((128, 128)) # Generate a 128x128 thumbnail
             img.save(thumbnail_filepath)
-            thumbnail_url = f"/uploads/thumbnails/{unique_filename}"
+        return True
+    except Exception as e:
+        logger.warning("Error processing image %s: %s", original_filepath, e)
+        # Fallback: keep the original content if image processing fails
+        return False
 
-        except Exception as e:
-            print(f"Error processing image {filename}: {e}")
-            # Fallback: save original content if image processing fails
-            with open(original_filepath, "wb") as buffer:
-                buffer.write(upload_file_content)
+def _process_video(original_filepath: str, thumbnail_filepath: str) -> bool:
+    """Grabs a frame with ffmpeg when it is installed; without it videos get no thumbnail."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return False
+    # A frame one second in avoids black intro frames; clips shorter than that use the first frame
+    for offset in ("1", "0"):
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-ss", offset, "-i", original_filepath,
+             "-frames:v", "1", "-vf", "scale=128:128:force_original_aspect_ratio=decrease", thumbnail_filepath],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=120
+        )
+        if os.path.exists(thumbnail_filepath) and os.path.getsize(thumbnail_filepath) > 0:
+            return True
+    return False
+
+class ProcessedMedia(NamedTuple):
+    file_url: str # The compressed image, or file_url as uploaded when it was not made smaller
+    thumbnail_url: Optional[str] # None when no thumbnail could be made
+
+def process_media_file(file_url: str, file_type: FileType, original_filepath: str) -> ProcessedMedia:
+    """
+    Compresses an uploaded image and stores its thumbnail, or extracts a video thumbnail.
+    original_filepath is a local copy of file_url (see StorageBackend.local_copy). A smaller
+    compressed image is stored under a new URL (media_store.compressed_url): the stored
+    original is never rewritten, since clients cache it as immutable. The caller points the
+    media at the new URL and then deletes the original.
+    Slow (decodes the whole file): runs on the media job workers, not in a request.
+    """
+    storage = get_storage()
+    if file_type == FileType.image:
+        thumbnail_url = derived_url(file_url, "thumbnails", os.path.splitext(file_url)[1])
     else:
-        # For non-image files, save original content directly
-        with open(original_filepath, "wb") as buffer:
-            buffer.write(upload_file_content)
-    
-    return file_url, thumbnail_url # Return both original and thumbnail URLs
+        thumbnail_url = derived_url(file_url, "thumbnails", ".jpg")
+    processed_url = file_url
+    # Written to scratch files and stored when complete, so no URL ever serves a partial file
+    thumbnail_filepath = scratch_path(os.path.splitext(thumbnail_url)[1])
+    compressed_filepath = scratch_path(os.path.splitext(file_url)[1])
+    try:
+        if file_type == FileType.image:
+            made_thumbnail = _process_image(original_filepath, compressed_filepath, thumbnail_filepath)
+            if made_thumbnail and os.path.getsize(compressed_filepath) < os.path.getsize(original_filepath):
+                processed_url = media_store.compressed_url(file_url, media_store.hash_local_file(compressed_filepath))
+                storage.store(key_from_url(processed_url), compressed_filepath)
+        else:
+            made_thumbnail = _process_video(original_filepath, thumbnail_filepath)
+        if made_thumbnail:
+            storage.store(key_from_url(thumbnail_url), thumbnail_filepath)
+    finally:
+        for path in (compressed_filepath, thumbnail_filepath):
+            if os.path.exists(path):
+                os.remove(path)
+    return ProcessedMedia(processed_url, thumbnail_url if made_thumbnail else None)
 
-def delete_file(file_url: str):
+def delete_file(file_url: str, thumbnail_url: Optional[str] = None):
     """Deletes the original and thumbnail files associated with a file_url."""
     if file_url.startswith("/uploads/original/"):
-        filename = os.path.basename(file_url)
-        original_filepath = os.path.join(UPLOAD_DIR, filename)
-        thumbnail_filepath = os.path.join(THUMBNAIL_DIR, filename)
+        remove_file(file_url)
+        remove_file(thumbnail_url)
 
-        if os.path.exists(original_filepath):
-            os.remove(original_filepath)
-        if os.path.exists(thumbnail_filepath):
-            os.remove(thumbnail_filepath)
+def delete_rendition_files(file_urls: Iterable[str]):
+    for file_url in file_urls:
+        remove_file(file_url)
+
+def delete_media(db: Session, db_media: ItemMedia):
+    file_url, thumbnail_url, sha256 = db_media.file_url, db_media.thumbnail_url, db_media.sha256
+    rendition_urls = [rendition.file_url for rendition in db_media.renditions]
+    if db_media.jobs and sha256:
+        # A queued job also finishes the other pending uploads of the same content: hand it over
+        sibling = (
+            db.query(ItemMedia)
+            .filter(ItemMedia.sha256 == sha256, ItemMedia.id != db_media.id, ItemMedia.status == MediaStatus.pending)
+            .first()
+        )
+        if sibling:
+            for job in list(db_media.jobs):
+                job.media = sibling
+    db.delete(db_media)
+    sync_service.record_media_changes(db, [db_media])
+    last_reference = media_store.release_reference(db, sha256) if sha256 else None
+    db.commit()
+    if last_reference is False:
+        return # Other media still use these files
+    if last_reference and media_store.get_blob(db, sha256) is not None:
+        return # Uploaded again since we committed
+    # After successfully deleting from DB, delete the file
+    delete_file(file_url, thumbnail_url)
+    delete_rendition_files(rendition_urls)
 
 def delete_media_by_id(db: Session, media_id: int) -> bool:
     db_media = get_media_by_id(db, media_id)
     if db_media:
-        file_url = db_media.file_url
-        db.delete(db_media)
-        db.commit()
-        # After successfully deleting from DB, delete the file
-        delete_file(file_url)
+        delete_media(db, db_media)
         return True
     return False
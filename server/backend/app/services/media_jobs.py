@@ -0,0 +1,226 @@
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Set
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.item_media import ItemMedia, MediaStatus, FileType
+from ..models.media_job import MediaJob, JobStatus
+from ..models.media_rendition import MediaRendition
+from ..utils.settings import settings
+from ..utils import metrics
+from . import media as media_service
+from . import media_store
+from . import sync as sync_service
+from . import renditions as rendition_service
+from .storage import get_storage, key_from_url
+
+# Background processing for uploaded media.
+# The upload request only streams the file into the content store and records an
+# ItemMedia in the "pending" state plus a media_job row, in one transaction; uploads
+# of content that is already stored reuse its processing (see create_uploaded_media). Jobs run on a small
+# in-process pool; the job table is the source of truth, so jobs queued or running
+# when the process stopped are picked up again by resume_jobs() at startup.
+
+_executor: Optional[ThreadPoolExecutor] = None # Created on first use, so shutdown() can be followed by a restart
+_executor_lock = threading.Lock()
+_futures: Set[Future] = set() # Queued or running in this process
+
+def _apply_processed(db_media: ItemMedia, thumbnail_url: Optional[str], renditions: List[dict]):
+    db_media.thumbnail_url = thumbnail_url
+    db_media.renditions = [MediaRendition(**rendition) for rendition in renditions]
+    db_media.status = MediaStatus.ready
+
+def _rendition_fields(db: Session, sha256: str) -> List[dict]:
+    """Renditions already made for this content, from any processed media that shares it."""
+    source = (
+        db.query(ItemMedia)
+        .filter(ItemMedia.sha256 == sha256, ItemMedia.status == MediaStatus.ready)
+        .order_by(ItemMedia.id)
+        .first()
+    )
+    if source is None:
+        return []
+    return [
+        {column: getattr(rendition, column)
+         for column in ("size", "format", "width", "height", "file_url", "file_size")}
+        for rendition in source.renditions
+    ]
+
+def create_uploaded_media(db: Session, media: dict, upload: media_service.SavedUpload) -> ItemMedia:
+    """
+    Records an upload and returns the new ItemMedia. New content is moved into the content
+    store and queued for processing (status "pending"). Content that is already stored shares
+    its blob: if that blob was processed, its thumbnail and renditions are reused at once;
+    if it is still being processed, that job finishes this media too.
+    """
+    placed = False
+    try:
+        blob, created = media_store.add_reference(db, upload.sha256, upload.extension, upload.file_size)
+        db_media = ItemMedia(**media, file_url=blob.file_url, file_size=upload.file_size, sha256=upload.sha256)
+        job = None
+        if not created and blob.status == MediaStatus.ready:
+            _apply_processed(db_media, blob.thumbnail_url, _rendition_fields(db, blob.sha256))
+        elif not created and blob.status == MediaStatus.pending:
+            db_media.status = MediaStatus.pending
+        else:
+            # New content, or content whose processing failed before: (re)process it
+            blob.status = MediaStatus.pending
+            db_media.status = MediaStatus.pending
+            job = MediaJob(status=JobStatus.pending)
+            db_media.jobs.append(job)
+        db.add(db_media)
+        db.flush() # Assigns the id for the change log
+        sync_service.record_media_changes(db, [db_media])
+        placed = media_store.place_upload(blob, upload.temp_path)
+        db.commit()
+    except Exception:
+        db.rollback()
+        if placed:
+            media_store.remove_file(blob.file_url)
+        if os.path.exists(upload.temp_path):
+            os.remove(upload.temp_path)
+        raise
+    db.refresh(db_media)
+    if job is not None:
+        submit(job.id)
+    return db_media
+
+def submit(job_id: int):
+    """Hands a committed job to the worker pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.media_job_workers, thread_name_prefix="media-job")
+        future = _executor.submit(run_job, job_id)
+        _futures.add(future)
+    future.add_done_callback(_futures.discard)
+
+def _claim(db: Session, job_id: int) -> bool:
+    # Conditional update, so a job resubmitted by another process's recovery runs only once
+    claimed = (
+        db.query(MediaJob)
+        .filter(MediaJob.id == job_id, MediaJob.status == JobStatus.pending)
+        .update({MediaJob.status: JobStatus.running, MediaJob.attempts: MediaJob.attempts + 1},
+                synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+def _media_to_finish(db: Session, media_id: int, sha256: Optional[str]) -> List[ItemMedia]:
+    # Every unprocessed upload of the same content (failed ones too, when a re-upload retries it);
+    # media stored before content addressing has no blob
+    if media_store.get_blob(db, sha256) is not None:
+        return db.query(ItemMedia).filter(
+            ItemMedia.sha256 == sha256, ItemMedia.status.in_([MediaStatus.pending, MediaStatus.failed])
+        ).all()
+    return db.query(ItemMedia).filter(ItemMedia.id == media_id).all()
+
+def run_job(job_id: int):
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.get(MediaJob, job_id)
+        media_id, file_url, file_type, sha256 = job.media_id, job.media.file_url, job.media.file_type, job.media.sha256
+        db.commit() # Do not hold a transaction (or connection) open while processing
+        started = time.perf_counter()
+        try:
+            # One local copy (a download, with remote storage) serves both steps
+            with get_storage().local_copy(key_from_url(file_url)) as original_filepath:
+                processed = media_service.process_media_file(file_url, file_type, original_filepath)
+                renditions = (rendition_service.generate_renditions(file_url, original_filepath)
+                              if file_type == FileType.image else [])
+        except Exception as e:
+            metrics.media_job_duration.observe(time.perf_counter() - started, file_type.value, "failed")
+            db.rollback()
+            job = db.get(MediaJob, job_id)
+            if job is None:
+                return # Media deleted meanwhile
+            job.last_error = str(e)[:1024]
+            if job.attempts < settings.media_job_max_attempts:
+                job.status = JobStatus.pending
+                db.commit()
+                submit(job_id)
+            else:
+                job.status = JobStatus.failed
+                blob = media_store.get_blob(db, sha256)
+                if blob is not None:
+                    blob.status = MediaStatus.failed
+                failed_media = _media_to_finish(db, media_id, sha256)
+                for db_media in failed_media:
+                    db_media.status = MediaStatus.failed
+                sync_service.record_media_changes(db, failed_media)
+                db.commit()
+            return
+        metrics.media_job_duration.observe(time.perf_counter() - started, file_type.value, "ok")
+
+        targets = _media_to_finish(db, media_id, sha256)
+        if not targets:
+            # Everything using the file was deleted while it was processed; drop what we wrote
+            db.rollback()
+            media_service.delete_file(file_url, processed.thumbnail_url)
+            if processed.file_url != file_url:
+                media_store.remove_file(processed.file_url)
+            media_service.delete_rendition_files(rendition["file_url"] for rendition in renditions)
+            return
+        blob = media_store.get_blob(db, sha256)
+        if blob is not None:
+            blob.status = MediaStatus.ready
+            blob.file_url = processed.file_url
+            blob.thumbnail_url = processed.thumbnail_url
+        for db_media in targets:
+            db_media.file_url = processed.file_url
+            _apply_processed(db_media, processed.thumbnail_url, renditions)
+        sync_service.record_media_changes(db, targets)
+        db.query(MediaJob).filter(MediaJob.id == job_id).delete(synchronize_session=False)
+        db.commit()
+        # The compressed copy replaced the original; an upload of the same content that
+        # committed meanwhile may still point at it, in which case it stays
+        if processed.file_url != file_url and db.query(ItemMedia.id).filter(ItemMedia.file_url == file_url).first() is None:
+            media_store.remove_file(file_url)
+    finally:
+        db.close()
+
+def resume_jobs() -> int:
+    """
+    Re-queues jobs left behind by a previous run: pending ones, and running ones whose
+    process evidently died (not touched for media_job_stale_seconds). Returns how many.
+    """
+    db = SessionLocal()
+    try:
+        # Compared against the database clock, which also stamps updated_at
+        stale_before = db.query(func.now()).scalar() - datetime.timedelta(seconds=settings.media_job_stale_seconds)
+        db.query(MediaJob).filter(
+            MediaJob.status == JobStatus.running, MediaJob.updated_at < stale_before
+        ).update({MediaJob.status: JobStatus.pending}, synchronize_session=False)
+        db.commit()
+        job_ids = [job_id for (job_id,) in
+                   db.query(MediaJob.id).filter(MediaJob.status == JobStatus.pending).order_by(MediaJob.id)]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        submit(job_id)
+    return len(job_ids)
+
+def shutdown():
+    # Unstarted jobs stay pending in the table and are resumed on the next start
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def queue_stats(db: Session) -> dict:
+    counts = dict(db.query(MediaJob.status, func.count(MediaJob.id)).group_by(MediaJob.status).all())
+    return {
+        "workers": settings.media_job_workers,
+        "queued_in_process": len(_futures),
+        "pending": counts.get(JobStatus.pending, 0),
+        "running": counts.get(JobStatus.running, 0),
+        "failed": counts.get(JobStatus.failed, 0),
+    }
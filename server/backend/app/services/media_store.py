@@ -0,0 +1,200 @@
+import hashlib
+import os
+from typing import Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.item_media import ItemMedia, MediaStatus
+from ..models.media_blob import MediaBlob
+from ..models.media_rendition import MediaRendition
+from ..utils.settings import settings
+from .storage import get_storage, key_from_url
+from . import sync as sync_service
+
+# Content-addressed media storage.
+# An uploaded file is stored once per distinct content, at a path derived from the
+# SHA-256 of its bytes and sharded by the first two byte pairs:
+#     uploads/original/ab/cd/abcd...ef.jpg
+# Thumbnails and renditions mirror that path under uploads/thumbnails and
+# uploads/renditions, in whichever backend services/storage.py is configured with.
+# media_blob counts the ItemMedia rows sharing a file, so the same photo attached to
+# ten items is stored and processed once, and its files are only deleted with the
+# last reference.
+
+ORIGINAL_URL_PREFIX = "/uploads/original/"
+
+def blob_file_url(sha256: str, extension: str) -> str:
+    return f"{ORIGINAL_URL_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+def is_blob_url(file_url: str) -> bool:
+    relative = file_url[len(ORIGINAL_URL_PREFIX):] if file_url.startswith(ORIGINAL_URL_PREFIX) else ""
+    return relative.count("/") == 2
+
+def derived_url(file_url: str, directory: str, suffix: str) -> str:
+    """
+    URL of a file generated from an original, mirroring its path:
+    derived_url("/uploads/original/ab/cd/abcd.jpg", "renditions", "_256.webp") == "/uploads/renditions/ab/cd/abcd_256.webp"
+    """
+    relative = file_url[len(ORIGINAL_URL_PREFIX):]
+    return f"/uploads/{directory}/{os.path.splitext(relative)[0]}{suffix}"
+
+def compressed_url(file_url: str, compressed_sha256: str) -> str:
+    """
+    URL of the compressed copy of an original image, named after the hash of its own bytes so
+    that no URL ever serves two contents (files are cached as immutable):
+    compressed_url("/uploads/original/ab/cd/abcd.jpg", "9f86...") == "/uploads/original/ab/cd/abcd_9f86d081884c7d65.jpg"
+    """
+    base, extension = os.path.splitext(file_url)
+    return f"{base}_{compressed_sha256[:16]}{extension}"
+
+def hash_local_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(settings.media_upload_chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_file(file_url: str) -> str:
+    with get_storage().local_copy(key_from_url(file_url)) as path:
+        return hash_local_file(path)
+
+def move_file(source_url: str, target_url: str) -> bool:
+    """Moves a stored file to another URL. Returns False if the source is missing."""
+    source, target = key_from_url(source_url), key_from_url(target_url)
+    if source is None or target is None:
+        return False
+    return get_storage().move(source, target)
+
+def remove_file(file_url: Optional[str]):
+    key = key_from_url(file_url)
+    if key is not None:
+        get_storage().delete(key)
+
+def get_blob(db: Session, sha256: Optional[str]) -> Optional[MediaBlob]:
+    return db.get(MediaBlob, sha256) if sha256 else None
+
+def add_reference(db: Session, sha256: str, extension: str, file_size: int) -> Tuple[MediaBlob, bool]:
+    """
+    Counts one more ItemMedia using this content, creating its blob on first sight.
+    Returns (blob, created). Runs inside the caller's transaction.
+    """
+    # The UPDATE also locks the row on MySQL, so concurrent uploads of the same file serialize here
+    updated = (
+        db.query(MediaBlob)
+        .filter(MediaBlob.sha256 == sha256)
+        .update({MediaBlob.ref_count: MediaBlob.ref_count + 1}, synchronize_session=False)
+    )
+    if not updated:
+        try:
+            with db.begin_nested():
+                blob = MediaBlob(sha256=sha256, file_url=blob_file_url(sha256, extension), file_size=file_size,
+                                 ref_count=1, status=MediaStatus.pending)
+                db.add(blob)
+            return blob, True
+        except IntegrityError:
+            # Another upload of the same content created it first
+            db.query(MediaBlob).filter(MediaBlob.sha256 == sha256) \
+                .update({MediaBlob.ref_count: MediaBlob.ref_count + 1}, synchronize_session=False)
+    return db.query(MediaBlob).filter(MediaBlob.sha256 == sha256).populate_existing().one(), False
+
+def place_upload(blob: MediaBlob, temp_path: str) -> bool:
+    """
+    Stores a freshly uploaded file under its blob key, or discards it if the blob already has
+    its file. Returns True if the file was stored (the caller removes it if its commit fails).
+    """
+    storage, key = get_storage(), key_from_url(blob.file_url)
+    if storage.exists(key):
+        os.remove(temp_path)
+        return False
+    storage.store(key, temp_path)
+    return True
+
+def release_reference(db: Session, sha256: str) -> Optional[bool]:
+    """
+    Drops one reference. Returns True if it was the last one (the blob row is deleted and the
+    caller removes the files after committing), False if the content is still in use, and
+    None if there is no blob (files stored before content addressing, owned by one ItemMedia).
+    """
+    updated = (
+        db.query(MediaBlob)
+        .filter(MediaBlob.sha256 == sha256)
+        .update({MediaBlob.ref_count: MediaBlob.ref_count - 1}, synchronize_session=False)
+    )
+    if not updated:
+        return None
+    deleted = (
+        db.query(MediaBlob)
+        .filter(MediaBlob.sha256 == sha256, MediaBlob.ref_count <= 0)
+        .delete(synchronize_session=False)
+    )
+    return bool(deleted)
+
+def migrate_legacy_media(db: Session) -> dict:
+    """
+    Moves media stored under random filenames (before content addressing) into the store:
+    each file is keyed by its recorded sha256, or by the hash of the stored file for uploads
+    that predate hashing, and moved with its thumbnail and renditions to the sharded layout.
+    Files whose content is already stored are deleted and their media point at the blob.
+    Run with the server stopped.
+    """
+    stats = {"migrated": 0, "deduplicated": 0, "missing": 0, "bytes_freed": 0}
+    media_ids = [media_id for (media_id,) in db.query(ItemMedia.id).order_by(ItemMedia.id)]
+    for media_id in media_ids:
+        db_media = db.get(ItemMedia, media_id)
+        if is_blob_url(db_media.file_url):
+            continue
+        key = key_from_url(db_media.file_url)
+        stored_size = get_storage().size(key) if key else None
+        if stored_size is None:
+            stats["missing"] += 1
+            continue
+        sha256 = db_media.sha256 or hash_file(db_media.file_url)
+        extension = os.path.splitext(key)[1].lower()
+        blob, created = add_reference(db, sha256, extension, db_media.file_size or stored_size)
+        old_thumbnail_url = db_media.thumbnail_url
+        old_rendition_urls = [rendition.file_url for rendition in db_media.renditions]
+        duplicate_urls = []
+        if created:
+            move_file(db_media.file_url, blob.file_url)
+            if old_thumbnail_url:
+                thumbnail_url = derived_url(blob.file_url, "thumbnails", os.path.splitext(old_thumbnail_url)[1])
+                if move_file(old_thumbnail_url, thumbnail_url):
+                    blob.thumbnail_url = thumbnail_url
+            for rendition in db_media.renditions:
+                suffix = rendition.file_url[rendition.file_url.rindex("_"):] # "_256.webp"
+                if move_file(rendition.file_url, derived_url(blob.file_url, "renditions", suffix)):
+                    rendition.file_url = derived_url(blob.file_url, "renditions", suffix)
+            blob.status = db_media.status
+            db_media.thumbnail_url = blob.thumbnail_url
+            stats["migrated"] += 1
+        else:
+            # Same content as a file migrated earlier: share it and drop this copy
+            sibling = (
+                db.query(ItemMedia)
+                .filter(ItemMedia.file_url == blob.file_url, ItemMedia.id != db_media.id)
+                .order_by(ItemMedia.id)
+                .first()
+            )
+            db_media.renditions = []
+            db.flush() # Old rendition rows go before the copies (same media_id, size, format)
+            db_media.renditions = [
+                MediaRendition(size=rendition.size, format=rendition.format, width=rendition.width,
+                                height=rendition.height, file_url=rendition.file_url, file_size=rendition.file_size)
+                for rendition in (sibling.renditions if sibling else [])
+            ]
+            db_media.thumbnail_url = blob.thumbnail_url
+            db_media.status = blob.status
+            duplicate_urls = [db_media.file_url, old_thumbnail_url, *old_rendition_urls]
+            stats["deduplicated"] += 1
+        db_media.file_url = blob.file_url
+        db_media.sha256 = sha256
+        db_media.file_size = db_media.file_size or stored_size
+        sync_service.record_media_changes(db, [db_media]) # URLs changed
+        db.commit()
+        # Only once nothing points at them any more
+        for duplicate_key in filter(None, map(key_from_url, duplicate_urls)):
+            size = get_storage().size(duplicate_key)
+            if size is not None:
+                stats["bytes_freed"] += size
+                get_storage().delete(duplicate_key)
+    return stats
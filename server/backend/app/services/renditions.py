@@ -0,0 +1,109 @@
+import logging
+import os
+from typing import List, Optional
+from PIL import Image, ImageOps, features
+
+from ..models.media_rendition import MediaRendition
+from ..utils.settings import settings
+from .media_store import derived_url
+from .storage import get_storage, key_from_url, scratch_path
+
+logger = logging.getLogger(__name__)
+
+# Responsive image renditions.
+# Each processed image gets one file per configured size and format under
+# uploads/renditions (mirroring the original's path), recorded in media_rendition. Clients pick one with
+# GET /media/{media_id}/rendition?size=..., which negotiates the format from the
+# Accept header, instead of downloading the full original on a grid screen.
+
+# format -> (Pillow format, file extension, MIME type, encoder options)
+_FORMATS = {
+    "avif": ("AVIF", ".avif", "image/avif", {"quality": 60, "speed": 8}),
+    "webp": ("WEBP", ".webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg", {"quality": 80, "progressive": True, "optimize": True}),
+}
+# Most to least preferred when the client accepts several
+_PREFERENCE = ("avif", "webp", "jpeg")
+
+def enabled_formats() -> List[str]:
+    """Configured formats this Pillow build can encode, always including the JPEG fallback."""
+    formats = {name for name in settings.media_rendition_formats
+               if name in _FORMATS and (name == "jpeg" or features.check(name))}
+    formats.add("jpeg")
+    return [name for name in _PREFERENCE if name in formats]
+
+def _open_for_renditions(path: str, max_size: int) -> Image.Image:
+    with Image.open(path) as img:
+        # JPEG only: decode at the smallest DCT scale (1/2, 1/4, 1/8) that still covers the
+        # largest rendition, which skips most of the decoding work for phone photos
+        img.draft("RGB", (max_size, max_size))
+        img = ImageOps.exif_transpose(img) # Phone photos are often stored sideways
+        return img.convert("RGBA" if img.has_transparency_data else "RGB")
+
+def _save(img: Image.Image, path: str, format_name: str):
+    pillow_format, _, _, options = _FORMATS[format_name]
+    if pillow_format == "JPEG" and img.mode == "RGBA":
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    img.save(path, pillow_format, **options)
+
+def generate_renditions(file_url: str, original_filepath: str) -> List[dict]:
+    """
+    Stores the renditions of an uploaded image and returns their MediaRendition fields.
+    original_filepath is a local copy of file_url.
+    Sizes larger than the image are skipped, except that the smallest size is always made.
+    Returns an empty list if the file is not a decodable image.
+    """
+    sizes = sorted(set(settings.media_rendition_sizes), reverse=True)
+    if not sizes:
+        return []
+    try:
+        current = _open_for_renditions(original_filepath, sizes[0])
+    except Exception as e:
+        logger.warning("Error generating renditions for %s: %s", file_url, e)
+        return []
+
+    renditions = []
+    for size in sizes:
+        if size > max(current.size) and size != sizes[-1]:
+            continue
+        # Each size is downscaled from the previous one; reducing_gap lets Pillow use a
+        # fast integer reduce() before the final resampling
+        current = current.copy()
+        current.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for format_name in enabled_formats():
+            rendition_url = derived_url(file_url, "renditions", f"_{size}{_FORMATS[format_name][1]}")
+            rendition_path = scratch_path(_FORMATS[format_name][1])
+            try:
+                _save(current, rendition_path, format_name)
+                file_size = os.path.getsize(rendition_path)
+                get_storage().store(key_from_url(rendition_url), rendition_path)
+            finally:
+                if os.path.exists(rendition_path):
+                    os.remove(rendition_path)
+            renditions.append({
+                "size": size,
+                "format": format_name,
+                "width": current.width,
+                "height": current.height,
+                "file_url": rendition_url,
+                "file_size": file_size,
+            })
+    return renditions
+
+def accepted_formats(accept: Optional[str]) -> List[str]:
+    """Formats the client can display, most preferred first, from its Accept header."""
+    accept = (accept or "").lower()
+    return [name for name in _PREFERENCE if name == "jpeg" or _FORMATS[name][2] in accept]
+
+def pick_rendition(renditions: List[MediaRendition], size: int, formats: List[str]) -> Optional[MediaRendition]:
+    """
+    The smallest rendition at least `size` pixels (or the largest one, if none is that big),
+    in the first of `formats` that has renditions.
+    """
+    for format_name in formats:
+        candidates = sorted((r for r in renditions if r.format == format_name), key=lambda r: r.size)
+        if candidates:
+            return next((r for r in candidates if r.size >= size), candidates[-1])
+    return None
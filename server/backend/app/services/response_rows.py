@@ -0,0 +1,175 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query, Session
+
+from ..models.category import Category
+from ..models.item import Item
+from ..models.item_media import ItemMedia
+from ..models.media_rendition import MediaRendition
+from ..models.user import User
+from ..models.warehouse import Warehouse
+
+# Listing responses built from column tuples (settings.fast_listings).
+# The ORM path loads Item instances with their category, media and renditions, validates each
+# one into ItemResponse and lets FastAPI validate the whole envelope again before encoding.
+# Here the same four queries fetch plain tuples and build_items turns them into the dicts
+# ItemResponse would serialize to, key for key, ready for orjson. Keep both in step with the
+# response schemas.
+# Listings with a projection (a subset of the fields, or only each item's primary media)
+# always come from here: only the requested columns are selected, and the category, media
+# and rendition queries run only when their fields are asked for.
+
+ITEM_COLUMNS = (
+    Item.item_id, Item.name, Item.location, Item.quantity, Item.category_id, Item.warehouse_id, Item.deleted_at,
+)
+CATEGORY_COLUMNS = (Category.category_id, Category.name, Category.warehouse_id)
+MEDIA_COLUMNS = (
+    ItemMedia.id, ItemMedia.item_id, ItemMedia.file_url, ItemMedia.file_type, ItemMedia.thumbnail_url,
+    ItemMedia.file_size, ItemMedia.status,
+)
+RENDITION_COLUMNS = (
+    MediaRendition.media_id, MediaRendition.size, MediaRendition.format, MediaRendition.width,
+    MediaRendition.height, MediaRendition.file_url, MediaRendition.file_size,
+)
+# ItemResponse's fields in serialization order, plus the primary media's thumbnail
+ITEM_FIELDS = (
+    "name", "location", "quantity", "category_id", "item_id", "warehouse_id", "category", "media", "deleted_at",
+    "thumbnail_url",
+)
+SUMMARY_FIELDS = ("name", "quantity", "item_id", "thumbnail_url")
+_ITEM_COLUMN_FIELDS = {column.key: column for column in ITEM_COLUMNS}
+
+class ItemProjection(NamedTuple):
+    fields: Optional[Tuple[str, ...]] = None # Subset of ITEM_FIELDS, None: every ItemResponse field
+    primary_media: bool = False # Only each item's first media (lowest id)
+
+    @property
+    def full(self) -> bool:
+        return self.fields is None and not self.primary_media
+
+WAREHOUSE_COLUMNS = (
+    Warehouse.warehouse_id, Warehouse.name, Warehouse.description, Warehouse.created_by_user_id,
+    User.user_id, User.username, User.email, User.is_admin,
+)
+
+def _category_dicts(categories: Iterable[Sequence]) -> Dict[int, dict]:
+    return {
+        category_id: {"name": name, "category_id": category_id, "warehouse_id": warehouse_id}
+        for category_id, name, warehouse_id in categories
+    }
+
+def _media_dicts(media: Iterable[Sequence], renditions: Iterable[Sequence]) -> Dict[int, List[dict]]:
+    renditions_by_media: Dict[int, List[dict]] = defaultdict(list)
+    for media_id, size, format, width, height, file_url, file_size in renditions:
+        renditions_by_media[media_id].append({
+            "size": size, "format": format, "width": width, "height": height,
+            "file_url": file_url, "file_size": file_size,
+        })
+    media_by_item: Dict[int, List[dict]] = defaultdict(list)
+    for media_id, item_id, file_url, file_type, thumbnail_url, file_size, status in media:
+        media_by_item[item_id].append({
+            "file_url": file_url, "file_type": file_type, "id": media_id, "thumbnail_url": thumbnail_url,
+            "file_size": file_size, "status": status, "renditions": renditions_by_media.get(media_id, []),
+        })
+    return media_by_item
+
+def build_items(items: Iterable[Sequence], categories: Iterable[Sequence], media: Iterable[Sequence],
+                renditions: Iterable[Sequence]) -> List[dict]:
+    """ItemResponse dicts from rows of the *_COLUMNS above (media and renditions in response order)."""
+    category_by_id = _category_dicts(categories)
+    media_by_item = _media_dicts(media, renditions)
+    return [
+        {
+            "name": name, "location": location, "quantity": quantity, "category_id": category_id,
+            "item_id": item_id, "warehouse_id": warehouse_id, "category": category_by_id.get(category_id),
+            "media": media_by_item.get(item_id, []), "deleted_at": deleted_at,
+        }
+        for item_id, name, location, quantity, category_id, warehouse_id, deleted_at in items
+    ]
+
+def _categories(db: Session, category_ids: set) -> list:
+    if not category_ids:
+        return []
+    return db.query(*CATEGORY_COLUMNS).filter(Category.category_id.in_(category_ids)).all()
+
+def _media(db: Session, item_ids: List[int], primary_only: bool) -> list:
+    if not item_ids:
+        return []
+    query = db.query(*MEDIA_COLUMNS)
+    if primary_only:
+        # The lowest id per item: a min() per item_id group of ix_item_media_item_id
+        query = query.filter(ItemMedia.id.in_(
+            select(func.min(ItemMedia.id)).where(ItemMedia.item_id.in_(item_ids)).group_by(ItemMedia.item_id)
+        ))
+    else:
+        query = query.filter(ItemMedia.item_id.in_(item_ids))
+    return query.order_by(ItemMedia.id).all()
+
+def _renditions(db: Session, media: list) -> list:
+    if not media:
+        return []
+    return (
+        db.query(*RENDITION_COLUMNS)
+        .filter(MediaRendition.media_id.in_([row[0] for row in media]))
+        .order_by(MediaRendition.media_id, MediaRendition.size)
+        .all()
+    )
+
+def _projected_item_rows(db: Session, query: Query, projection: ItemProjection) -> List[dict]:
+    fields = projection.fields or ITEM_FIELDS[:-1]
+    # item_id keys the page (cursor) and the media; category_id joins the category
+    keys = ["item_id"] + [field for field in fields if field in _ITEM_COLUMN_FIELDS and field != "item_id"]
+    if "category" in fields and "category_id" not in keys:
+        keys.append("category_id")
+    items = [dict(zip(keys, row)) for row in query.with_entities(*(_ITEM_COLUMN_FIELDS[key] for key in keys))]
+
+    category_by_id = {}
+    if "category" in fields:
+        category_by_id = _category_dicts(_categories(db, {item["category_id"] for item in items} - {None}))
+    media_by_item = {}
+    if "media" in fields or "thumbnail_url" in fields:
+        # thumbnail_url alone needs only the first media of each item, and no renditions
+        media = _media(db, [item["item_id"] for item in items], projection.primary_media or "media" not in fields)
+        media_by_item = _media_dicts(media, _renditions(db, media) if "media" in fields else [])
+
+    rows = []
+    for item in items:
+        item_media = media_by_item.get(item["item_id"], [])
+        derived = {
+            "category": category_by_id.get(item.get("category_id")),
+            "media": item_media,
+            "thumbnail_url": item_media[0]["thumbnail_url"] if item_media else None,
+        }
+        rows.append({field: item[field] if field in item else derived[field] for field in fields})
+    return rows
+
+def item_rows(db: Session, query: Query, projection: ItemProjection = ItemProjection()) -> List[dict]:
+    """
+    Runs an item query (filters, order and limit already applied, no loader options) for
+    columns only, then loads the categories, media and renditions of the page.
+    """
+    if not projection.full:
+        return _projected_item_rows(db, query, projection)
+    items = query.with_entities(*ITEM_COLUMNS).all()
+    categories = _categories(db, {row[4] for row in items if row[4] is not None})
+    media = _media(db, [row[0] for row in items], primary_only=False)
+    return build_items(items, categories, media, _renditions(db, media))
+
+def build_warehouses(rows: Iterable[Sequence]) -> List[dict]:
+    """WarehouseResponse dicts from rows of WAREHOUSE_COLUMNS."""
+    return [
+        {
+            "name": name, "description": description, "warehouse_id": warehouse_id,
+            "created_by_user_id": created_by_user_id,
+            "creator": {"username": username, "email": email, "user_id": user_id, "is_admin": is_admin},
+        }
+        for warehouse_id, name, description, created_by_user_id, user_id, username, email, is_admin in rows
+    ]
+
+def warehouse_rows(query: Query) -> List[dict]:
+    """Runs a warehouse query (without loader options) for the listing columns and the creator's."""
+    return build_warehouses(
+        query.join(User, Warehouse.created_by_user_id == User.user_id).with_entities(*WAREHOUSE_COLUMNS).all()
+    )
@@ -0,0 +1,229 @@
+import logging
+
+from sqlalchemy import bindparam, inspect, text, Integer, Float
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..database import engine, SessionLocal
+from ..models.item import Item
+from ..models.category import Category
+from ..utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Full-text search index for items.
+# Each active item has one row in `item_search` holding its name, location and
+# category name, so a search is a single index lookup instead of a LIKE scan over
+# item JOIN category. Soft-deleted items are removed from the index and re-added
+# on restore. The table is created by migration 0004 (its DDL depends on the dialect).
+
+class SearchBackend:
+    """Fallback backend: no index, services keep using the LIKE query."""
+    name = "like"
+
+    def index_item(self, db: Session, item_id: int, content: str):
+        pass
+
+    def remove_item(self, db: Session, item_id: int):
+        pass
+
+    def index_items(self, db: Session, rows: List[Tuple[int, str]]):
+        for item_id, content in rows:
+            self.index_item(db, item_id, content)
+
+    def remove_items(self, db: Session, item_ids: List[int]):
+        for item_id in item_ids:
+            self.remove_item(db, item_id)
+
+    def clear(self, db: Session):
+        pass
+
+    def count(self, db: Session) -> int:
+        return 0
+
+    def match(self, query: str):
+        """Returns a subquery of (item_id, score) with higher score meaning more relevant, or None to use the LIKE query."""
+        return None
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """SQLite FTS5 with the trigram tokenizer: substring semantics, works for CJK text."""
+    name = "sqlite_fts5"
+
+    def index_item(self, db: Session, item_id: int, content: str):
+        self.remove_item(db, item_id)
+        db.execute(text("INSERT INTO item_search (rowid, content) VALUES (:item_id, :content)"),
+                   {"item_id": item_id, "content": content})
+
+    def remove_item(self, db: Session, item_id: int):
+        db.execute(text("DELETE FROM item_search WHERE rowid = :item_id"), {"item_id": item_id})
+
+    def index_items(self, db: Session, rows: List[Tuple[int, str]]):
+        if not rows:
+            return
+        self.remove_items(db, [item_id for item_id, _ in rows])
+        db.execute(text("INSERT INTO item_search (rowid, content) VALUES (:item_id, :content)"),
+                   [{"item_id": item_id, "content": content} for item_id, content in rows])
+
+    def remove_items(self, db: Session, item_ids: List[int]):
+        if item_ids:
+            db.execute(text("DELETE FROM item_search WHERE rowid IN :item_ids").bindparams(
+                bindparam("item_ids", expanding=True)), {"item_ids": list(item_ids)})
+
+    def clear(self, db: Session):
+        db.execute(text("DELETE FROM item_search"))
+
+    def count(self, db: Session) -> int:
+        return db.execute(text("SELECT COUNT(*) FROM item_search")).scalar()
+
+    def match(self, query: str):
+        if len(query) < 3:
+            # The trigram index cannot answer queries shorter than one trigram
+            return None
+        phrase = '"' + query.replace('"', '""') + '"'
+        statement = text(
+            "SELECT rowid AS item_id, -bm25(item_search) AS score FROM item_search WHERE item_search MATCH :phrase"
+        ).bindparams(phrase=phrase)
+        return statement.columns(item_id=Integer, score=Float).subquery("item_match")
+
+
+class MySQLFulltextBackend(SearchBackend):
+    """MySQL InnoDB FULLTEXT index with the ngram parser (needed for Chinese item names)."""
+    name = "mysql_fulltext"
+
+    def index_item(self, db: Session, item_id: int, content: str):
+        self.index_items(db, [(item_id, content)])
+
+    def remove_item(self, db: Session, item_id: int):
+        db.execute(text("DELETE FROM item_search WHERE item_id = :item_id"), {"item_id": item_id})
+
+    def index_items(self, db: Session, rows: List[Tuple[int, str]]):
+        # executemany: the driver rewrites the batch into one multi-row INSERT
+        if rows:
+            db.execute(text(
+                "INSERT INTO item_search (item_id, content) VALUES (:item_id, :content) "
+                "ON DUPLICATE KEY UPDATE content = VALUES(content)"
+            ), [{"item_id": item_id, "content": content} for item_id, content in rows])
+
+    def remove_items(self, db: Session, item_ids: List[int]):
+        if item_ids:
+            db.execute(text("DELETE FROM item_search WHERE item_id IN :item_ids").bindparams(
+                bindparam("item_ids", expanding=True)), {"item_ids": list(item_ids)})
+
+    def clear(self, db: Session):
+        db.execute(text("DELETE FROM item_search"))
+
+    def count(self, db: Session) -> int:
+        return db.execute(text("SELECT COUNT(*) FROM item_search")).scalar()
+
+    def match(self, query: str):
+        if len(query) < 2:
+            # Shorter than ngram_token_size (default 2): the index has no such tokens
+            return None
+        phrase = '"' + query.replace('"', ' ') + '"'
+        statement = text(
+            "SELECT item_id, MATCH(content) AGAINST(:phrase IN BOOLEAN MODE) AS score "
+            "FROM item_search WHERE MATCH(content) AGAINST(:phrase IN BOOLEAN MODE)"
+        ).bindparams(phrase=phrase)
+        return statement.columns(item_id=Integer, score=Float).subquery("item_match")
+
+
+def _create_backend(bind: Engine) -> SearchBackend:
+    if settings.search_backend == "like":
+        return SearchBackend()
+    if bind.dialect.name == "sqlite":
+        return SQLiteFTSBackend()
+    if bind.dialect.name in ("mysql", "mariadb"):
+        return MySQLFulltextBackend()
+    return SearchBackend()
+
+_backend: Optional[SearchBackend] = None
+
+def get_search_backend() -> SearchBackend:
+    global _backend
+    if _backend is None:
+        _backend = _create_backend(engine)
+    return _backend
+
+def _search_content(name: str, location: Optional[str], category_name: Optional[str]) -> str:
+    """The text indexed for an item: name, location and category name, lower-cased."""
+    return "\n".join(part for part in (name, location, category_name) if part).lower()
+
+def item_search_content(db: Session, item: Item) -> str:
+    # Reuse the loaded category unless category_id was just changed (unflushed) to another one
+    category_name = None
+    if item.category_id is not None:
+        category = inspect(item).attrs.category.loaded_value
+        if isinstance(category, Category) and category.category_id == item.category_id:
+            category_name = category.name
+        else:
+            category_name = db.query(Category.name).filter(Category.category_id == item.category_id).scalar()
+    return _search_content(item.name, item.location, category_name)
+
+def index_item(db: Session, item: Item):
+    """Adds or refreshes an item in the index. Call inside the transaction that changes the item."""
+    get_search_backend().index_item(db, item.item_id, item_search_content(db, item))
+
+def remove_item(db: Session, item_id: int):
+    get_search_backend().remove_item(db, item_id)
+
+def index_items(db: Session, items: Iterable[Item], category_names: Dict[int, str]):
+    """index_item for a batch of items whose category names the caller already has."""
+    get_search_backend().index_items(db, [
+        (item.item_id, _search_content(item.name, item.location, category_names.get(item.category_id)))
+        for item in items
+    ])
+
+def remove_items(db: Session, item_ids: Iterable[int]):
+    get_search_backend().remove_items(db, list(item_ids))
+
+def rebuild_index(db: Session, batch_size: int = 1000) -> int:
+    """Re-creates the index from the item table. Returns the number of indexed items."""
+    backend = get_search_backend()
+    backend.clear(db)
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.query(Item.item_id, Item.name, Item.location, Category.name)
+            .outerjoin(Category, Item.category_id == Category.category_id)
+            .filter(Item.deleted_at == None, Item.item_id > last_id)
+            .order_by(Item.item_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for item_id, name, location, category_name in rows:
+            backend.index_item(db, item_id, _search_content(name, location, category_name))
+        indexed += len(rows)
+        last_id = rows[-1][0]
+        db.commit()
+    db.commit()
+    return indexed
+
+def init_search_index(bind: Engine = engine, report_empty: bool = True):
+    """
+    Checks the index of the configured backend, falling back to the LIKE query when the
+    database has none (migration 0004 creates it where the database supports it). With
+    report_empty, an empty index over existing items is logged; it is not rebuilt here
+    (`python -m app.cli rebuild-search-index`).
+    """
+    global _backend
+    backend = get_search_backend()
+    if backend.name == SearchBackend.name:
+        return
+    if not inspect(bind).has_table("item_search"):
+        logger.warning("Full-text search unavailable (%s): no item_search table, falling back to LIKE search", backend.name)
+        _backend = SearchBackend()
+        return
+
+    if not report_empty:
+        return
+    db = SessionLocal()
+    try:
+        if backend.count(db) == 0 and db.query(Item.item_id).filter(Item.deleted_at == None).first():
+            logger.warning("The %s search index is empty: run `python -m app.cli rebuild-search-index`", backend.name)
+    finally:
+        db.close()
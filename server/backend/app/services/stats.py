@@ -0,0 +1,176 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from ..models.item import Item
+from ..models.warehouse_stat import WarehouseStat, StatDimension
+from . import category as category_service
+
+# Per-warehouse item statistics.
+# warehouse_stat holds active item count, total quantity and soft-deleted count for each
+# warehouse, and for each of its categories and locations. Item changes apply their
+# difference to the (at most six) rows they touch, inside the changing transaction and
+# after sync_service.record_changes has locked the warehouse row, so writers of one
+# warehouse are serialized. Reading the stats is a primary-key range scan whose size depends
+# on the number of categories and locations, not items.
+
+# (category_id, location, quantity, soft-deleted) of an item
+ItemState = Tuple[Optional[int], Optional[str], int, bool]
+Counts = List[int] # [item_count, total_quantity, deleted_count]
+
+def item_state(db_item: Item) -> ItemState:
+    return (db_item.category_id, db_item.location, db_item.quantity, db_item.deleted_at is not None)
+
+def _group_keys(state: ItemState) -> List[Tuple[StatDimension, str]]:
+    category_id, location, _, _ = state
+    return [
+        (StatDimension.total, ""),
+        (StatDimension.category, "" if category_id is None else str(category_id)),
+        (StatDimension.location, location or ""),
+    ]
+
+def _add(deltas: Dict[Tuple[StatDimension, str], Counts], state: ItemState, sign: int):
+    _, _, quantity, deleted = state
+    for group in _group_keys(state):
+        counts = deltas[group]
+        if deleted:
+            counts[2] += sign
+        else:
+            counts[0] += sign
+            counts[1] += sign * quantity
+
+def record_item_changes(db: Session, warehouse_id: int, changes: Iterable[Tuple[Optional[ItemState], Optional[ItemState]]]):
+    """
+    Applies items going from `before` to `after` state (None: not existing) to the stats.
+    Call inside the changing transaction, after sync_service.record_changes.
+    """
+    deltas: Dict[Tuple[StatDimension, str], Counts] = defaultdict(lambda: [0, 0, 0])
+    for before, after in changes:
+        if before is not None:
+            _add(deltas, before, -1)
+        if after is not None:
+            _add(deltas, after, 1)
+
+    added = False
+    emptied: Dict[StatDimension, List[str]] = defaultdict(list)
+    for (dimension, group_key), (count, quantity, deleted) in deltas.items():
+        if count == quantity == deleted == 0:
+            continue
+        updated = (
+            db.query(WarehouseStat)
+            .filter(WarehouseStat.warehouse_id == warehouse_id, WarehouseStat.dimension == dimension,
+                    WarehouseStat.group_key == group_key)
+            .update({
+                WarehouseStat.item_count: WarehouseStat.item_count + count,
+                WarehouseStat.total_quantity: WarehouseStat.total_quantity + quantity,
+                WarehouseStat.deleted_count: WarehouseStat.deleted_count + deleted,
+            }, synchronize_session=False)
+        )
+        if not updated:
+            db.add(WarehouseStat(warehouse_id=warehouse_id, dimension=dimension, group_key=group_key,
+                                 item_count=count, total_quantity=quantity, deleted_count=deleted))
+            added = True
+        elif dimension != StatDimension.total and (count < 0 or deleted < 0):
+            emptied[dimension].append(group_key)
+    if added:
+        db.flush() # A later call in this transaction must find these rows
+    # Drop category and location rows no item refers to any more (renamed locations would pile up)
+    for dimension, group_keys in emptied.items():
+        (
+            db.query(WarehouseStat)
+            .filter(WarehouseStat.warehouse_id == warehouse_id, WarehouseStat.dimension == dimension,
+                    WarehouseStat.group_key.in_(group_keys),
+                    WarehouseStat.item_count == 0, WarehouseStat.deleted_count == 0)
+            .delete(synchronize_session=False)
+        )
+
+def record_item_change(db: Session, warehouse_id: int, before: Optional[ItemState], after: Optional[ItemState]):
+    record_item_changes(db, warehouse_id, [(before, after)])
+
+def _counts(row: Optional[WarehouseStat]) -> dict:
+    if row is None:
+        return {"item_count": 0, "total_quantity": 0, "deleted_count": 0}
+    return {"item_count": row.item_count, "total_quantity": row.total_quantity, "deleted_count": row.deleted_count}
+
+def get_stats(db: Session, warehouse_id: int) -> dict:
+    """Totals, per-category counts (every category, plus uncategorized items) and per-location counts."""
+    rows = db.query(WarehouseStat).filter(WarehouseStat.warehouse_id == warehouse_id).all()
+    by_dimension: Dict[StatDimension, Dict[str, WarehouseStat]] = defaultdict(dict)
+    for row in rows:
+        by_dimension[row.dimension][row.group_key] = row
+
+    category_rows = by_dimension[StatDimension.category]
+    categories = [
+        {"category_id": category.category_id, "name": category.name,
+         **_counts(category_rows.pop(str(category.category_id), None))}
+        for category in category_service.get_categories_by_warehouse(db, warehouse_id)
+    ]
+    uncategorized = category_rows.pop("", None)
+    if uncategorized is not None:
+        categories.append({"category_id": None, "name": None, **_counts(uncategorized)})
+    # Left over: deleted categories still referenced by soft-deleted items
+    for group_key, row in category_rows.items():
+        categories.append({"category_id": int(group_key), "name": None, **_counts(row)})
+
+    locations = [
+        {"location": group_key or None, **_counts(row)}
+        for group_key, row in sorted(by_dimension[StatDimension.location].items())
+    ]
+    return {
+        **_counts(by_dimension[StatDimension.total].get("")),
+        "categories": categories,
+        "locations": locations,
+    }
+
+def _computed_stats(db: Session, warehouse_id: Optional[int]) -> Dict[Tuple[int, StatDimension, str], Tuple[int, int, int]]:
+    """The stats computed from the item table: one GROUP BY per dimension."""
+    active = Item.deleted_at == None
+    aggregates = (
+        func.sum(case((active, 1), else_=0)),
+        func.sum(case((active, Item.quantity), else_=0)),
+        func.sum(case((active, 0), else_=1)),
+    )
+    dimensions = [
+        (StatDimension.total, []),
+        (StatDimension.category, [Item.category_id]),
+        (StatDimension.location, [Item.location]),
+    ]
+    computed = {}
+    for dimension, columns in dimensions:
+        query = db.query(Item.warehouse_id, *columns, *aggregates)
+        if warehouse_id is not None:
+            query = query.filter(Item.warehouse_id == warehouse_id)
+        for row in query.group_by(Item.warehouse_id, *columns):
+            row_warehouse_id, group, (count, quantity, deleted) = row[0], row[1:-3], row[-3:]
+            group_key = "" if not group or group[0] is None else str(group[0])
+            # A NULL and an empty location share the "" group
+            previous = computed.get((row_warehouse_id, dimension, group_key), (0, 0, 0))
+            computed[(row_warehouse_id, dimension, group_key)] = (
+                previous[0] + int(count), previous[1] + int(quantity or 0), previous[2] + int(deleted)
+            )
+    return computed
+
+def rebuild_stats(db: Session, warehouse_id: Optional[int] = None) -> dict:
+    """
+    Recomputes the stats of one warehouse (all when None) from the item table and replaces
+    the stored rows. Returns how many rows were written and how many stored rows had drifted.
+    """
+    computed = _computed_stats(db, warehouse_id)
+    stored_query = db.query(WarehouseStat)
+    if warehouse_id is not None:
+        stored_query = stored_query.filter(WarehouseStat.warehouse_id == warehouse_id)
+    stored = {
+        (row.warehouse_id, row.dimension, row.group_key): (row.item_count, row.total_quantity, row.deleted_count)
+        for row in stored_query
+    }
+    drifted = sum(1 for key in computed.keys() | stored.keys() if computed.get(key) != stored.get(key))
+
+    stored_query.delete(synchronize_session=False)
+    db.add_all(
+        WarehouseStat(warehouse_id=row_warehouse_id, dimension=dimension, group_key=group_key,
+                      item_count=count, total_quantity=quantity, deleted_count=deleted)
+        for (row_warehouse_id, dimension, group_key), (count, quantity, deleted) in computed.items()
+    )
+    db.commit()
+    return {"rows": len(computed), "drifted": drifted}
@@ -0,0 +1,304 @@
+import logging
+import mimetypes
+import os
+import posixpath
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from ..utils.file_serving import IMMUTABLE_CACHE_CONTROL
+from ..utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Where media files are kept.
+# Files are addressed by key, their path below the uploads root
+# ("original/ab/cd/<sha256>.jpg"). The database stores "/uploads/<key>" URLs, which do not
+# depend on the backend: with local storage /uploads is served by the API, with S3 it
+# redirects to a presigned URL so downloads go straight to the object store.
+# Processing (Pillow, ffmpeg) needs real files, so remote objects are fetched into a
+# local scratch directory first (local_copy) and results are uploaded from there.
+
+URL_PREFIX = "/uploads/"
+# Everything the media store writes; the bulk migrator copies these
+STORED_PREFIXES = ("original/", "thumbnails/", "renditions/")
+SCRATCH_DIR = os.path.join(settings.upload_dir, "tmp")
+
+def key_from_url(file_url: Optional[str]) -> Optional[str]:
+    """Storage key of an /uploads URL, or None if it is not one (or tries to leave the uploads root)."""
+    if not file_url or not file_url.startswith(URL_PREFIX):
+        return None
+    key = posixpath.normpath(file_url[len(URL_PREFIX):])
+    if key in (".", "..") or key.startswith(("../", "/")):
+        return None
+    return key
+
+def url_for_key(key: str) -> str:
+    return URL_PREFIX + key
+
+def scratch_path(suffix: str = "") -> str:
+    """A fresh path for a temporary file, on the same filesystem as local storage (so storing it is a rename)."""
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    return os.path.join(SCRATCH_DIR, f"{os.urandom(16).hex()}{suffix}")
+
+def _remove_quietly(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+class StorageBackend(ABC):
+    name = "none"
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """Size in bytes, or None if there is no such file."""
+
+    @abstractmethod
+    def upload(self, key: str, source_path: str):
+        """Copies a local file in, replacing any file under that key."""
+
+    def store(self, key: str, source_path: str):
+        """Like upload, but takes the local file over (it is moved or deleted)."""
+        try:
+            self.upload(key, source_path)
+        finally:
+            _remove_quietly(source_path)
+
+    @abstractmethod
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        """A local path holding the file for the duration of the block. Raises FileNotFoundError if missing."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Deletes a file; missing files are ignored."""
+
+    @abstractmethod
+    def move(self, source_key: str, target_key: str) -> bool:
+        """Renames a file. Returns False if the source is missing."""
+
+    @abstractmethod
+    def keys(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        """(key, size) of every file whose key starts with prefix."""
+
+    @abstractmethod
+    def download_url(self, key: str) -> str:
+        """URL a client can fetch the file from."""
+
+class LocalStorage(StorageBackend):
+    """Files under settings.upload_dir, served by the API at /uploads."""
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = os.path.normpath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, *key.split("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Storage key outside the upload directory: {key}")
+        return path
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.path(key))
+        except OSError:
+            return None
+
+    def upload(self, key: str, source_path: str):
+        # Copied next to the target and renamed, so readers never see a partial file
+        partial_path = scratch_path()
+        try:
+            shutil.copyfile(source_path, partial_path)
+            self.store(key, partial_path)
+        finally:
+            _remove_quietly(partial_path)
+
+    def store(self, key: str, source_path: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        path = self.path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        yield path
+
+    def delete(self, key: str):
+        _remove_quietly(self.path(key))
+
+    def move(self, source_key: str, target_key: str) -> bool:
+        source = self.path(source_key)
+        if not os.path.exists(source):
+            return False
+        self.store(target_key, source)
+        return True
+
+    def keys(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        top = os.path.join(self.root, *prefix.rstrip("/").split("/")) if prefix else self.root
+        for directory, _, filenames in os.walk(top):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    yield key, os.path.getsize(path)
+
+    def download_url(self, key: str) -> str:
+        return url_for_key(key)
+
+class S3Storage(StorageBackend):
+    """
+    An S3-compatible bucket (AWS S3, MinIO, Aliyun OSS in S3 mode, ...). Needs boto3.
+    Large files are sent as parallel multipart uploads straight from disk, in
+    s3_multipart_chunk_bytes parts; downloads are presigned GET URLs.
+    """
+    name = "s3"
+
+    def __init__(self):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3: pip install boto3")
+        if not settings.s3_bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        self.bucket = settings.s3_bucket
+        self.prefix = settings.s3_key_prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.s3_endpoint_url,
+            region_name=settings.s3_region,
+            aws_access_key_id=settings.s3_access_key_id, # None: boto3's usual credential chain
+            aws_secret_access_key=settings.s3_secret_access_key,
+            config=Config(
+                signature_version="s3v4",
+                # Self-hosted endpoints (MinIO) rarely have per-bucket DNS names
+                s3={"addressing_style": "path" if settings.s3_endpoint_url else "auto"},
+                # Clients are shared by all request and job threads
+                max_pool_connections=settings.threadpool_workers + settings.s3_transfer_concurrency,
+            ),
+        )
+        self.transfer = TransferConfig(
+            multipart_threshold=settings.s3_multipart_chunk_bytes,
+            multipart_chunksize=settings.s3_multipart_chunk_bytes,
+            max_concurrency=settings.s3_transfer_concurrency,
+        )
+
+    def _object_key(self, key: str) -> str:
+        return self.prefix + key
+
+    def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))["ContentLength"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def upload(self, key: str, source_path: str):
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        # The store sends the same caching headers as /uploads does for local files
+        self.client.upload_file(source_path, self.bucket, self._object_key(key),
+                                ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL},
+                                Config=self.transfer)
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        from botocore.exceptions import ClientError
+        path = scratch_path(posixpath.splitext(key)[1]) # Keep the extension: Pillow and ffmpeg look at it
+        try:
+            try:
+                self.client.download_file(self.bucket, self._object_key(key), path, Config=self.transfer)
+            except ClientError as e:
+                if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                    raise FileNotFoundError(key)
+                raise
+            yield path
+        finally:
+            _remove_quietly(path)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def move(self, source_key: str, target_key: str) -> bool:
+        if not self.exists(source_key):
+            return False
+        # Server-side copy (multipart for large objects), no download
+        self.client.copy({"Bucket": self.bucket, "Key": self._object_key(source_key)},
+                         self.bucket, self._object_key(target_key), Config=self.transfer)
+        self.delete(source_key)
+        return True
+
+    def keys(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for entry in page.get("Contents", []):
+                yield entry["Key"][len(self.prefix):], entry["Size"]
+
+    def download_url(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object_key(key)},
+            ExpiresIn=settings.s3_presign_expire_seconds,
+        )
+
+def create_storage(name: str) -> StorageBackend:
+    if name == "local":
+        return LocalStorage(settings.upload_dir)
+    if name == "s3":
+        return S3Storage()
+    raise ValueError(f"Unknown storage backend: {name}")
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> StorageBackend:
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_storage(settings.storage_backend)
+    return _storage
+
+def _copy_file(source: StorageBackend, target: StorageBackend, key: str, size: int, delete_source: bool) -> bool:
+    """Returns False if the target already had the file (from an earlier, interrupted run)."""
+    copied = target.size(key) != size
+    if copied:
+        with source.local_copy(key) as path:
+            target.upload(key, path)
+    if delete_source:
+        source.delete(key)
+    return copied
+
+def migrate_storage(source: StorageBackend, target: StorageBackend, workers: int, delete_source: bool = False) -> dict:
+    """
+    Copies every stored media file from one backend to another, `workers` files at a time.
+    Files already present in the target with the same size are skipped, so an interrupted
+    run can simply be repeated. Keys (and so the URLs in the database) stay the same.
+    """
+    stats = {"copied": 0, "skipped": 0, "failed": 0, "bytes_copied": 0}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage-migrate") as executor:
+        for prefix in STORED_PREFIXES:
+            futures = [(executor.submit(_copy_file, source, target, key, size, delete_source), key, size)
+                       for key, size in source.keys(prefix)]
+            for future, key, size in futures:
+                try:
+                    copied = future.result()
+                except Exception as e:
+                    logger.warning("Error copying %s: %s", key, e)
+                    stats["failed"] += 1
+                    continue
+                if copied:
+                    stats["copied"] += 1
+                    stats["bytes_copied"] += size
+                else:
+                    stats["skipped"] += 1
+    return stats
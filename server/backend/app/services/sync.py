@@ -0,0 +1,115 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy.orm import Session, selectinload
+
+from ..models.change_log import ChangeLog, ChangeEntity
+from ..models.item import Item
+from ..models.item_media import ItemMedia
+from ..models.category import Category
+from . import warehouse as warehouse_service
+
+# Delta sync for offline clients.
+# Every change to an item, category or media bumps its warehouse's version (which also
+# drives the listing ETags) and records that version against the entity in change_log, in
+# the same transaction. The bump is an UPDATE of the warehouse row, which holds the row lock
+# until commit, so the versions of one warehouse commit in order: a client that has seen
+# version N has seen every change up to N. GET /sync/warehouse/{id}?since=<token> then
+# returns the entities recorded after N, however large the warehouse is.
+
+def encode_token(warehouse_id: int, version: int) -> str:
+    return f"{warehouse_id}.{version}"
+
+def decode_token(token: Optional[str], warehouse_id: int) -> Optional[int]:
+    """The version in a sync token, or raises ValueError if it is malformed or from another warehouse."""
+    if token is None or token == "":
+        return None
+    token_warehouse, version = (int(part) for part in token.split("."))
+    if token_warehouse != warehouse_id or version < 0:
+        raise ValueError("sync token does not belong to this warehouse")
+    return version
+
+def record_changes(db: Session, warehouse_id: int, changes: Iterable[Tuple[ChangeEntity, int]]):
+    """Bumps the warehouse version and records it for each (entity, id). Call inside the changing transaction."""
+    version = warehouse_service.bump_version(db, warehouse_id)
+    ids_by_entity: Dict[ChangeEntity, Set[int]] = defaultdict(set)
+    for entity, entity_id in changes:
+        ids_by_entity[entity].add(entity_id)
+    for entity, entity_ids in ids_by_entity.items():
+        # One UPDATE for the whole batch; rows are only looked up when some are missing
+        updated = (
+            db.query(ChangeLog)
+            .filter(ChangeLog.entity == entity, ChangeLog.entity_id.in_(entity_ids))
+            .update({ChangeLog.version: version, ChangeLog.warehouse_id: warehouse_id}, synchronize_session=False)
+        )
+        if updated == len(entity_ids):
+            continue
+        existing = {
+            entity_id for entity_id, in
+            db.query(ChangeLog.entity_id).filter(ChangeLog.entity == entity, ChangeLog.entity_id.in_(entity_ids))
+        }
+        db.add_all(
+            ChangeLog(entity=entity, entity_id=entity_id, warehouse_id=warehouse_id, version=version)
+            for entity_id in entity_ids - existing
+        )
+
+def record_change(db: Session, warehouse_id: int, entity: ChangeEntity, entity_id: int):
+    record_changes(db, warehouse_id, [(entity, entity_id)])
+
+def record_media_changes(db: Session, media: Iterable[ItemMedia]):
+    """record_changes for media that may span warehouses (a job finishes every upload of the same content)."""
+    media_ids_by_item: Dict[int, Set[int]] = defaultdict(set)
+    for db_media in media:
+        media_ids_by_item[db_media.item_id].add(db_media.id)
+    if not media_ids_by_item:
+        return
+    changes_by_warehouse: Dict[int, Set[Tuple[ChangeEntity, int]]] = defaultdict(set)
+    for item_id, warehouse_id in db.query(Item.item_id, Item.warehouse_id).filter(Item.item_id.in_(media_ids_by_item)):
+        changes_by_warehouse[warehouse_id].update((ChangeEntity.media, media_id) for media_id in media_ids_by_item[item_id])
+    # Warehouse rows are locked in id order, so two such transactions cannot deadlock
+    for warehouse_id in sorted(changes_by_warehouse):
+        record_changes(db, warehouse_id, changes_by_warehouse[warehouse_id])
+
+def changes_since(db: Session, warehouse_id: int, since: Optional[int]) -> dict:
+    """
+    Items (soft-deleted ones included), categories and media changed after version `since`,
+    ids of those deleted since, and the token to pass next time. Without `since`, or with a
+    version the server has not reached (a database restored from backup), everything.
+    """
+    # Read first: changes committed while this runs are at most sent again next time
+    version = warehouse_service.get_version(db, warehouse_id)
+    items_query = db.query(Item).filter(Item.warehouse_id == warehouse_id)
+    categories_query = db.query(Category).filter(Category.warehouse_id == warehouse_id)
+    media_query = (
+        db.query(ItemMedia)
+        .join(Item, ItemMedia.item_id == Item.item_id)
+        .filter(Item.warehouse_id == warehouse_id)
+        .options(selectinload(ItemMedia.renditions))
+    )
+    full = since is None or since > version
+    changed: Dict[ChangeEntity, Set[int]] = defaultdict(set)
+    if not full:
+        rows = db.query(ChangeLog.entity, ChangeLog.entity_id).filter(
+            ChangeLog.warehouse_id == warehouse_id, ChangeLog.version > since
+        )
+        for entity, entity_id in rows:
+            changed[entity].add(entity_id)
+        items_query = items_query.filter(Item.item_id.in_(changed[ChangeEntity.item]))
+        categories_query = categories_query.filter(Category.category_id.in_(changed[ChangeEntity.category]))
+        media_query = media_query.filter(ItemMedia.id.in_(changed[ChangeEntity.media]))
+
+    # Skip the queries that cannot return anything
+    items = items_query.order_by(Item.item_id).all() if full or changed[ChangeEntity.item] else []
+    categories = categories_query.order_by(Category.category_id).all() if full or changed[ChangeEntity.category] else []
+    media = media_query.order_by(ItemMedia.id).all() if full or changed[ChangeEntity.media] else []
+    return {
+        "token": encode_token(warehouse_id, version),
+        "full": full,
+        "items": items,
+        "categories": categories,
+        "media": media,
+        "deleted": {
+            "items": sorted(changed[ChangeEntity.item] - {item.item_id for item in items}),
+            "categories": sorted(changed[ChangeEntity.category] - {category.category_id for category in categories}),
+            "media": sorted(changed[ChangeEntity.media] - {db_media.id for db_media in media}),
+        },
+    }
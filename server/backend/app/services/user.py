@@ -1,9 +1,43 @@
 from sqlalchemy.orm import Session
 from ..models.user import User
-from ..schemas.user import UserCreate
-from ..utils.security import get_password_hash
+from ..schemas.user import UserCreate, AuthenticatedUser
+from ..utils.security import password_fingerprint
+from ..utils.cache import TTLCache
+from ..utils.settings import settings
 from typing import Optional, List
 
+# Authenticated principals keyed by token subject (username)
+principal_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl_seconds)
+
+def get_principal(db: Session, username: str, refresh: bool = False) -> Optional[AuthenticatedUser]:
+    """The user as cached for authentication; refresh skips (and replaces) the cached entry."""
+    if refresh:
+        invalidate_principal(username)
+    else:
+        principal = principal_cache.get(username)
+        if principal is not None:
+            return principal
+    # Taken before the read: a password change committed meanwhile keeps this load out of the cache
+    generation = principal_cache.generation()
+    db_user = get_user_by_username(db, username)
+    if db_user is None:
+        return None
+    principal = to_principal(db_user)
+    principal_cache.set(username, principal, generation)
+    return principal
+
+def to_principal(db_user: User) -> AuthenticatedUser:
+    return AuthenticatedUser(
+        user_id=db_user.user_id,
+        username=db_user.username,
+        email=db_user.email,
+        is_admin=db_user.is_admin,
+        password_fingerprint=password_fingerprint(db_user.password_hash),
+    )
+
+def invalidate_principal(username: str):
+    principal_cache.invalidate(username)
+
 def get_user_by_email(db: Session, email: Optional[str]):
     if email is None:
         return None
@@ -15,8 +49,8 @@ def get_user_by_username(db: Session, username: str):
 def get_user_by_id(db: Session, user_id: int):
     return db.query(User).filter(User.user_id == user_id).first()
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: str):
+    # The password is hashed by the caller (see utils.security.get_password_hash_async)
     
     # Check if this is the first user being registered
     is_first_user = db.query(User).count() == 0
@@ -29,20 +63,22 @@ def create_user(db: Session, user: UserCreate):
     db.refresh(db_user)
     return db_user
 
-def update_user_password(db: Session, user_id: int, new_password: str):
+def update_user_password(db: Session, user_id: int, new_password_hash: str):
     db_user = get_user_by_id(db, user_id)
     if db_user:
-        db_user.password_hash = get_password_hash(new_password)
+        db_user.password_hash = new_password_hash
         db.commit()
         db.refresh(db_user)
+        invalidate_principal(db_user.username)
     return db_user
 
-def reset_user_password(db: Session, user_id: int, default_password: str):
+def reset_user_password(db: Session, user_id: int, default_password_hash: str):
     db_user = get_user_by_id(db, user_id)
     if db_user:
-        db_user.password_hash = get_password_hash(default_password)
+        db_user.password_hash = default_password_hash
         db.commit()
         db.refresh(db_user)
+        invalidate_principal(db_user.username)
     return db_user
 
 def get_all_users(db: Session) -> List[User]:
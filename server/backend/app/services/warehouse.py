@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from ..models.warehouse import Warehouse
 from ..models.user_warehouse import UserWarehouse, UserRole
@@ -7,6 +7,8 @@ from ..models.user import User
 from ..models.item import Item # Import Item model
 from ..models.category import Category # Import Category model
 from ..schemas.warehouse import WarehouseCreate
+from .loaders import warehouse_response_options
+from . import response_rows
 
 def create_warehouse(db: Session, warehouse: WarehouseCreate, user_id: int):
     db_warehouse = Warehouse(
@@ -31,31 +33,45 @@ def create_warehouse(db: Session, warehouse: WarehouseCreate, user_id: int):
     return db_warehouse
 
 def get_all_warehouses(db: Session) -> List[Warehouse]:
-    return db.query(Warehouse).all()
+    return db.query(Warehouse).options(*warehouse_response_options()).all()
+
+def _user_warehouses_query(db: Session, user_id: int):
+    return db.query(Warehouse).join(UserWarehouse).filter(UserWarehouse.user_id == user_id)
 
 def get_user_warehouses(db: Session, user_id: int) -> List[Warehouse]:
-    return (
-        db.query(Warehouse)
-        .join(UserWarehouse)
-        .filter(UserWarehouse.user_id == user_id)
-        .all()
-    )
+    return _user_warehouses_query(db, user_id).options(*warehouse_response_options()).all()
+
+def get_user_warehouse_rows(db: Session, user_id: int) -> List[dict]:
+    """get_user_warehouses as WarehouseResponse dicts."""
+    return response_rows.warehouse_rows(_user_warehouses_query(db, user_id))
 
 def get_user_warehouses_with_roles(db: Session, user_id: int) -> List[tuple[Warehouse, UserRole]]:
     return (
         db.query(Warehouse, UserWarehouse.role)
+        .options(*warehouse_response_options())
         .join(UserWarehouse, Warehouse.warehouse_id == UserWarehouse.warehouse_id)
         .filter(UserWarehouse.user_id == user_id)
         .all()
     )
 
+def get_version(db: Session, warehouse_id: int) -> Optional[int]:
+    return db.query(Warehouse.version).filter(Warehouse.warehouse_id == warehouse_id).scalar()
+
+def bump_version(db: Session, warehouse_id: int) -> int:
+    """
+    Marks the warehouse's listings as changed and returns the new version. Used through
+    services/sync.py record_changes, inside the transaction that changes an item, category or
+    media of the warehouse; the row stays locked until that transaction ends.
+    """
+    db.query(Warehouse).filter(Warehouse.warehouse_id == warehouse_id) \
+        .update({Warehouse.version: Warehouse.version + 1}, synchronize_session=False)
+    return get_version(db, warehouse_id)
+
 def get_warehouse(db: Session, warehouse_id: int):
     return db.query(Warehouse).filter(Warehouse.warehouse_id == warehouse_id).first()
 
-def delete_warehouse(db: Session, warehouse_id: int) -> dict:
-    db_warehouse = db.query(Warehouse).filter(Warehouse.warehouse_id == warehouse_id).first()
-    if not db_warehouse:
-        return {"success": False, "message": "Warehouse not found"}
+def delete_warehouse(db: Session, db_warehouse: Warehouse) -> dict:
+    warehouse_id = db_warehouse.warehouse_id
 
     # Check for associated items
     associated_items_count = db.query(Item).filter(Item.warehouse_id == warehouse_id).count()
@@ -84,6 +100,15 @@ def get_user_warehouse_role(db: Session, user_id: int, warehouse_id: int) -> Opt
     )
     return user_warehouse.role if user_warehouse else None
 
+def get_user_warehouse_roles(db: Session, user_id: int) -> Dict[int, UserRole]:
+    """All of a user's warehouse roles in one query, keyed by warehouse_id."""
+    rows = (
+        db.query(UserWarehouse.warehouse_id, UserWarehouse.role)
+        .filter(UserWarehouse.user_id == user_id)
+        .all()
+    )
+    return {warehouse_id: role for warehouse_id, role in rows}
+
 def add_user_to_warehouse(db: Session, user_id: int, warehouse_id: int, role: UserRole):
     db_user_warehouse = UserWarehouse(
         user_id=user_id,
@@ -119,9 +144,13 @@ def remove_user_from_warehouse(db: Session, user_id: int, warehouse_id: int):
         return True
     return False
 
-def invite_user_to_warehouse(db: Session, warehouse_id: int, invited_username: str, inviter_user_id: int):
-    # Check if inviter is owner of the warehouse
-    inviter_role = get_user_warehouse_role(db, inviter_user_id, warehouse_id)
+def invite_user_to_warehouse(
+    db: Session, warehouse_id: int, invited_username: str, inviter_user_id: int,
+    inviter_role: Optional[UserRole] = None
+):
+    # Check if inviter is owner of the warehouse (callers that already resolved the role pass it in)
+    if inviter_role is None:
+        inviter_role = get_user_warehouse_role(db, inviter_user_id, warehouse_id)
     if inviter_role != UserRole.owner:
         return None # Or raise an exception for insufficient permissions
 
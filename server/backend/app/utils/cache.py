@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Bounded in-process cache: least recently used entries are evicted once maxsize is
+    reached, and every entry expires ttl seconds after it was stored.
+    Thread-safe, since sync routes run in FastAPI's thread pool.
+
+    A value loaded while another thread invalidates its key is older than the invalidation:
+    take generation() before loading and pass it to set(), which then drops the value.
+    """
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0 # Bumped by every invalidation
+        # Generation of the latest invalidation per key, for the maxsize most recent ones;
+        # older ones are covered by _forgotten (the latest generation dropped from the map)
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._forgotten = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self._timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Stores value, unless key was invalidated after `generation` (when given)."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and self._invalidated.get(key, self._forgotten) > generation:
+                return
+            self._data[key] = (self._timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > max(self.maxsize, 1):
+                _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
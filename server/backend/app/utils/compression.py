@@ -0,0 +1,254 @@
+import logging
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Response compression.
+# Responses of an allowed content type and at least minimum_size bytes are compressed with
+# the best encoding the client accepts (gzip, or br / zstd when the optional brotli /
+# zstandard packages are installed). Streamed bodies are compressed chunk by chunk and each
+# chunk is flushed, so an export keeps arriving while it is produced. Range (206), 304 and
+# already encoded responses, and the paths in exclude_paths, pass through untouched.
+
+class CompressionStats:
+    """Compressed responses, bytes before and after and CPU time, per encoding."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encodings: Dict[str, Dict[str, float]] = {}
+        self.uncompressed = 0 # Compressible type, but too small or not accepted by the client
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float, response: bool):
+        with self._lock:
+            entry = self.encodings.setdefault(
+                encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+            )
+            entry["responses"] += int(response)
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["cpu_seconds"] += cpu_seconds
+
+    def record_uncompressed(self):
+        with self._lock:
+            self.uncompressed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "encodings": {
+                    encoding: {**entry, "ratio": round(entry["bytes_out"] / entry["bytes_in"], 4) if entry["bytes_in"] else None}
+                    for encoding, entry in self.encodings.items()
+                },
+                "uncompressed": self.uncompressed,
+            }
+
+compression_stats = CompressionStats()
+
+def _compression_metrics():
+    stats = compression_stats.stats()
+    entries = stats["encodings"].items()
+    families = [
+        (name, "counter", documentation, [(name, {"encoding": encoding}, entry[key]) for encoding, entry in entries])
+        for name, key, documentation in (
+            ("http_compressed_responses_total", "responses", "Compressed responses."),
+            ("http_compression_bytes_in_total", "bytes_in", "Response bytes before compression."),
+            ("http_compression_bytes_out_total", "bytes_out", "Response bytes after compression."),
+            ("http_compression_cpu_seconds_total", "cpu_seconds", "CPU time spent compressing responses."),
+        )
+    ]
+    families.append(metrics.single(
+        "http_uncompressed_responses_total", "counter",
+        "Compressible responses sent as they are (too small, or not accepted by the client).", stats["uncompressed"]
+    ))
+    return families
+
+metrics.registry.register_collector(_compression_metrics)
+
+class _Compressor:
+    """One response's stream: compress() returns what can be sent so far, finish() the rest."""
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.finish = finish
+
+def _gzip(level: int) -> _Compressor:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip container
+    return _Compressor(
+        lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+def _brotli(level: int) -> _Compressor:
+    import brotli
+    compressor = brotli.Compressor(quality=level)
+    return _Compressor(lambda data: compressor.process(data) + compressor.flush(), compressor.finish)
+
+def _zstd(level: int) -> _Compressor:
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return _Compressor(
+        lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush,
+    )
+
+_ENCODERS = {"gzip": (_gzip, None), "br": (_brotli, "brotli"), "zstd": (_zstd, "zstandard")}
+
+def available_encodings(encodings: Sequence[str]) -> List[str]:
+    """The configured encodings this process can produce, in the configured order."""
+    available = []
+    for encoding in encodings:
+        if encoding not in _ENCODERS:
+            raise ValueError(f"Unknown compression encoding: {encoding}")
+        module = _ENCODERS[encoding][1]
+        if module is not None:
+            try:
+                __import__(module)
+            except ImportError:
+                logger.warning("Compression encoding %s disabled: the %s package is not installed", encoding, module)
+                continue
+        available.append(encoding)
+    return available
+
+def negotiate(accept_encoding: str, encodings: Sequence[str]) -> Optional[str]:
+    """
+    The encoding to use for an Accept-Encoding header: the highest q-value, ties broken by
+    the order of `encodings` (the server's preference). None when none is acceptable.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class CompressionMiddleware:
+    def __init__(
+        self, app: ASGIApp, encodings: Sequence[str], minimum_size: int, content_types: Sequence[str],
+        levels: Dict[str, int], route_levels: Dict[str, Dict[str, int]], exclude_paths: Sequence[str] = ()
+    ):
+        self.app = app
+        self.encodings = available_encodings(encodings)
+        self.minimum_size = minimum_size
+        self.content_types = {content_type.lower() for content_type in content_types}
+        self.levels = levels # Per encoding
+        self.route_levels = route_levels # Route path template -> per-encoding levels
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http" or scope["method"] == "HEAD" or not self.encodings
+            or scope["path"].startswith(self.exclude_paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        await _CompressedResponse(self, scope, encoding, send).run(receive)
+
+    def level(self, scope: Scope, encoding: str) -> int:
+        # Set by the router once it has matched; the response only starts after that
+        route = scope.get("route")
+        route_levels = self.route_levels.get(getattr(route, "path", None), {})
+        return route_levels.get(encoding, self.levels[encoding])
+
+class _CompressedResponse:
+    """Send wrapper for one response: decides on the first body message, then compresses."""
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, encoding: Optional[str], send: Send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def run(self, receive: Receive):
+        await self.middleware.app(self.scope, receive, self.wrapped_send)
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return media_type in self.middleware.content_types
+
+    def _compress(self, data: bytes, final: bool) -> bytes:
+        started = time.thread_time()
+        body = self.compressor.compress(data) if data else b""
+        if final:
+            body += self.compressor.finish()
+        compression_stats.record(
+            self.encoding, len(data), len(body), time.thread_time() - started, response=final
+        )
+        return body
+
+    async def wrapped_send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=list(self.start["headers"]))
+            self.start["headers"] = headers.raw
+            if not self._compressible(headers):
+                self.passthrough = True
+            else:
+                # The representation depends on Accept-Encoding, whether or not this one is compressed
+                headers.add_vary_header("Accept-Encoding")
+                content_length = headers.get("content-length")
+                size = int(content_length) if content_length and content_length.isdigit() else None
+                if size is None and not more_body:
+                    size = len(body)
+                if self.encoding is None or (size is not None and size < self.middleware.minimum_size):
+                    compression_stats.record_uncompressed()
+                    self.passthrough = True
+            if self.passthrough:
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            level = self.middleware.level(self.scope, self.encoding)
+            self.compressor = _ENCODERS[self.encoding][0](level)
+            headers["Content-Encoding"] = self.encoding
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # Byte-for-byte different from the identity representation
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["content-length"]
+            else:
+                body = self._compress(body, final=True)
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(self.start)
+
+        body = self._compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
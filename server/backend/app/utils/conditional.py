@@ -0,0 +1,33 @@
+import zlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Conditional GET helpers.
+# Warehouse listings are tagged with the warehouse's version counter (bumped by every item,
+# category and media change), so an unchanged listing is answered with 304 after a single
+# primary-key lookup, before the listing query runs.
+
+# Clients may store listings but must revalidate them; never shared between users
+LISTING_CACHE_CONTROL = "private, no-cache"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or opaque in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def listing_etag(request: Request, warehouse_id: int, version: int) -> str:
+    # Weak: the same version serializes the same data, not necessarily the same bytes.
+    # The path and query are part of it, since pages and views of one warehouse differ.
+    variant = zlib.crc32(f"{request.url.path}?{request.url.query}".encode())
+    return f'W/"{warehouse_id}-{version}-{variant:08x}"'
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": LISTING_CACHE_CONTROL})
+
+def set_listing_headers(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = LISTING_CACHE_CONTROL
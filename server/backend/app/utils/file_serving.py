@@ -0,0 +1,116 @@
+import os
+import threading
+from email.utils import parsedate_to_datetime
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Message, Receive, Scope, Send
+
+from . import metrics
+from .conditional import etag_matches
+
+# Media files are stored under content-hash names and never change once written (a
+# compressed image gets a new name, see media_store.compressed_url), so clients may cache
+# them for good and revalidation is almost never needed.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class FileServingStats:
+    """Responses by kind, and bytes not sent thanks to 304s and range requests."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.full = 0
+        self.partial = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    def record(self, status_code: int, file_size: int, bytes_sent: int):
+        with self._lock:
+            if status_code == 304:
+                self.not_modified += 1
+            elif status_code == 206:
+                self.partial += 1
+            elif status_code == 200:
+                self.full += 1
+            self.bytes_sent += bytes_sent
+            if status_code in (206, 304):
+                self.bytes_saved += max(file_size - bytes_sent, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "full": self.full,
+                "partial": self.partial,
+                "not_modified": self.not_modified,
+                "bytes_sent": self.bytes_sent,
+                "bytes_saved": self.bytes_saved,
+            }
+
+file_serving_stats = FileServingStats()
+
+def _file_serving_metrics():
+    stats = file_serving_stats.stats()
+    return [
+        ("media_responses_total", "counter", "/uploads responses by kind.", [
+            ("media_responses_total", {"kind": kind}, stats[kind]) for kind in ("full", "partial", "not_modified")
+        ]),
+        metrics.single("media_bytes_sent_total", "counter", "/uploads bytes sent.", stats["bytes_sent"]),
+        metrics.single("media_bytes_saved_total", "counter",
+                       "/uploads bytes not sent thanks to 304 and range responses.", stats["bytes_saved"]),
+    ]
+
+metrics.registry.register_collector(_file_serving_metrics)
+
+def file_etag(stat_result: os.stat_result) -> str:
+    # Strong: files are only ever replaced whole (rename), which changes the mtime
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+def _not_modified_since(if_modified_since: str, stat_result: os.stat_result) -> bool:
+    try:
+        return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse (single and multi-range requests, If-Range, zero-copy "pathsend" on servers
+    that offer it) with immutable caching headers, 304 answers to conditional requests and
+    file_serving_stats accounting.
+    """
+    # Larger than FileResponse's 64 KiB: each chunk is a thread hop, which dominates large video reads
+    chunk_size = 1024 * 1024
+
+    def __init__(self, path: str, stat_result: os.stat_result):
+        super().__init__(path, stat_result=stat_result,
+                         headers={"cache-control": IMMUTABLE_CACHE_CONTROL, "etag": file_etag(stat_result)})
+
+    def is_not_modified(self, request_headers: Headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.headers["etag"])
+        if_modified_since = request_headers.get("if-modified-since")
+        return if_modified_since is not None and _not_modified_since(if_modified_since, self.stat_result)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        file_size = self.stat_result.st_size
+        if self.is_not_modified(Headers(scope=scope)):
+            headers = {name: self.headers[name] for name in ("cache-control", "etag", "last-modified")}
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            file_serving_stats.record(304, file_size, 0)
+            return
+
+        status_code = 200
+        bytes_sent = 0
+
+        async def counting_send(message: Message):
+            nonlocal status_code, bytes_sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_sent += len(message.get("body", b""))
+            elif message["type"] == "http.response.pathsend":
+                bytes_sent += file_size
+            await send(message)
+
+        await super().__call__(scope, receive, counting_send)
+        file_serving_stats.record(status_code, file_size, bytes_sent)
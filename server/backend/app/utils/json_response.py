@@ -0,0 +1,11 @@
+from typing import Any, Optional
+
+from fastapi.responses import ORJSONResponse
+
+# Envelope for routes that build their response data themselves (settings.fast_listings).
+# Returning a Response skips FastAPI's response_model validation and encoding; the data
+# must already have the schema's shape (services/response_rows.py).
+
+def envelope_response(data: Any, message: Optional[str] = None, next_cursor: Optional[str] = None) -> ORJSONResponse:
+    # Same keys, in the same order, as ResponseModel
+    return ORJSONResponse({"status": "success", "data": data, "message": message, "next_cursor": next_cursor})
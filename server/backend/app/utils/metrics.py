@@ -0,0 +1,244 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Prometheus metrics, kept in process and rendered in the text exposition format at /metrics.
+# Request metrics are labelled by route path template (not the raw path), so their number
+# stays bounded. The SQL hooks in database.py add every query to the RequestQueries of the
+# request that ran it: the route's thread inherits the request's context, so the object the
+# middleware created is the one the hooks update.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+MEDIA_JOB_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float] # Name (with suffix), labels, value
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    @abstractmethod
+    def samples(self) -> List[Sample]:
+        """(name, labels, value) of every series, read when /metrics is scraped."""
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(values), value) for values, value in self._values.items()]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, amount: float = 1, *labelvalues: str):
+        self.inc(-amount, *labelvalues)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(values), value) for values, value in self._values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {} # Per-bucket counts, [sum]
+
+    def observe(self, value: float, *labelvalues: str):
+        with self._lock:
+            counts, total = self._values.setdefault(labelvalues, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1 # Last slot: above every bucket
+            total[0] += value
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            for values, (counts, total) in self._values.items():
+                labels = self._labels(values)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+                samples.append((f"{self.name}_sum", labels, total[0]))
+                samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+# A collector returns (name, kind, documentation, samples) for values kept elsewhere
+# (pool usage, compression and file serving statistics), read when /metrics is scraped
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+def single(name: str, kind: str, documentation: str, value: float):
+    """A collector family with one unlabelled sample."""
+    return name, kind, documentation, [(name, {}, value)]
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families = [(metric.name, metric.kind, metric.documentation, metric.samples()) for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to its last response byte.", ("method", "route")
+))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "Requests being handled."
+))
+http_request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements run per request.", ("method", "route"), QUERY_COUNT_BUCKETS
+))
+http_request_db_duration = registry.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL statements per request.", ("method", "route")
+))
+db_queries = registry.register(Counter(
+    "db_queries_total", "SQL statements run, by requests and background work."
+))
+db_query_duration = registry.register(Counter(
+    "db_query_duration_seconds_total", "Time spent in SQL statements, by requests and background work."
+))
+media_job_duration = registry.register(Histogram(
+    "media_job_duration_seconds", "Media processing time (thumbnail and renditions) per job attempt.",
+    ("file_type", "result"), MEDIA_JOB_BUCKETS
+))
+
+class RequestQueries:
+    """SQL statements run on behalf of one request."""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.seconds += elapsed
+
+current_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_request_queries", default=None)
+
+def record_query(elapsed: float):
+    """Called by the engine hooks after each statement."""
+    db_queries.inc()
+    db_query_duration.inc(elapsed)
+    queries = current_request_queries.get()
+    if queries is not None:
+        queries.record(elapsed)
+
+def route_label(scope: Scope) -> str:
+    # Set by the router once it has matched; unmatched paths (404s) share one label
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """
+    Records latency, status and SQL usage of every HTTP request. With server_timing, the
+    response also carries a Server-Timing header (SQL time and count, time to headers).
+    """
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        queries = RequestQueries()
+        token = current_request_queries.set(queries)
+        status_code = 500 # Unless a response starts
+
+        async def timed_send(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(raw=list(message["headers"]))
+                    headers.append("Server-Timing", (
+                        f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries", '
+                        f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+                    ))
+                    message["headers"] = headers.raw
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            http_requests_in_progress.dec()
+            current_request_queries.reset(token)
+            method, route = scope["method"], route_label(scope)
+            http_requests.inc(1, method, route, str(status_code))
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_request_db_queries.observe(queries.count, method, route)
+            http_request_db_duration.observe(queries.seconds, method, route)
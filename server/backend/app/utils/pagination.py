@@ -0,0 +1,32 @@
+from typing import List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Keyset (cursor) pagination helpers.
+# A cursor is the primary key of the last row of the previous page, so fetching
+# page N is an index range scan starting at that key instead of an OFFSET scan.
+
+MAX_PAGE_LIMIT = 500
+
+def encode_cursor(last_id: int) -> str:
+    return str(last_id)
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Returns the key encoded in the cursor, or raises ValueError if it is malformed."""
+    if cursor is None or cursor == "":
+        return None
+    value = int(cursor)
+    if value < 0:
+        raise ValueError("cursor must be non-negative")
+    return value
+
+def split_page(rows: List[T], limit: Optional[int], key: str) -> Tuple[List[T], Optional[str]]:
+    """
+    Rows are ORM objects or response dicts. Services fetch limit + 1 rows; the extra row only signals that another page exists.
+    Returns the page and the cursor for the next one (None on the last page).
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[key] if isinstance(last, dict) else getattr(last, key))
@@ -0,0 +1,213 @@
+import logging
+import os
+import re
+import sys
+import sysconfig
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import sqlalchemy
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .metrics import route_label
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Development and test guardrail against per-row loading.
+# With settings.query_inspection, every request's SQL statements are recorded by shape
+# (fingerprint: the statement with its values and IN lists folded) together with the app
+# code that ran them. A SELECT repeated query_repeat_threshold times in one request is the
+# signature of an N+1 (a lazy load of Item.category, Item.media or Warehouse.creator per
+# row); it is reported with that code location, as are statements slower than
+# slow_query_ms and requests over their route's query budget. In strict mode a violation
+# raises QueryInspectionError once the response is sent, which TestClient re-raises in the
+# test. Service code can be checked directly with inspect_queries().
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames to look past when attributing a statement to app code
+_INFRASTRUCTURE = (os.path.join(_APP_DIR, "utils") + os.sep, os.path.join(_APP_DIR, "database.py"))
+_SQLALCHEMY_DIR = os.path.dirname(sqlalchemy.__file__)
+_LIBRARIES = tuple({sysconfig.get_paths()[name] for name in ("stdlib", "purelib", "platlib")})
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|:\w+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+def fingerprint(statement: str) -> str:
+    """The statement's shape: the same for every run of a query, whatever its values."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("(?)", shape)
+
+def _caller() -> str:
+    # The innermost app frame outside the instrumentation, e.g. "services/item.py:57 in get_item";
+    # else the innermost one outside the libraries (a test or script calling SQLAlchemy itself);
+    # else the innermost library one outside SQLAlchemy (a lazy load while FastAPI serializes)
+    frame, outside, library = sys._getframe(1), None, None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR):
+            if not filename.startswith(_INFRASTRUCTURE):
+                return f"{os.path.relpath(filename, _APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        elif not filename.startswith(_LIBRARIES):
+            if outside is None and not filename.startswith("<"):
+                outside = f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        elif library is None and not filename.startswith(_SQLALCHEMY_DIR):
+            library = f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return outside or library or "?"
+
+class StatementShape(NamedTuple):
+    fingerprint: str
+    count: int
+    seconds: float
+    caller: str # Where the first one was run
+
+class SlowStatement(NamedTuple):
+    statement: str
+    seconds: float
+    caller: str
+
+class QueryReport:
+    """The statements run by one request (or one inspect_queries block)."""
+    def __init__(self, label: str = ""):
+        self.label = label # "GET /items/{item_id}" for requests
+        self.count = 0
+        self.seconds = 0.0
+        self._shapes: Dict[str, List] = {} # fingerprint -> [count, seconds, caller]
+        self.slow: List[SlowStatement] = []
+        self.budget: Optional[int] = None
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.seconds += elapsed
+        key = fingerprint(statement)
+        shape = self._shapes.get(key)
+        caller = None
+        if shape is None:
+            caller = _caller()
+            self._shapes[key] = [1, elapsed, caller]
+        else:
+            shape[0] += 1
+            shape[1] += elapsed
+        if elapsed * 1000 >= settings.slow_query_ms:
+            self.slow.append(SlowStatement(statement, elapsed, caller or _caller()))
+
+    def shapes(self) -> List[StatementShape]:
+        return sorted(
+            (StatementShape(key, count, seconds, caller) for key, (count, seconds, caller) in self._shapes.items()),
+            key=lambda shape: -shape.count,
+        )
+
+    def repeated(self, threshold: int) -> List[StatementShape]:
+        """
+        SELECT shapes run at least `threshold` times: likely per-row loading. Shapes with an
+        IN list are batch loads (selectinload splits long lists into chunks) and repeated
+        writes are left to the budget; the per-group stats updates repeat by design.
+        """
+        return [
+            shape for shape in self.shapes()
+            if shape.count >= threshold and shape.fingerprint[:6].upper() == "SELECT"
+            and " IN (?)" not in shape.fingerprint
+        ]
+
+    def problems(self, repeat_threshold: Optional[int]) -> List[str]:
+        """
+        Repeated shapes (unless repeat_threshold is None) and an exceeded budget, one message
+        each; slow statements are only logged.
+        """
+        messages = [] if repeat_threshold is None else [
+            f"{shape.count}x the same statement (N+1?), first from {shape.caller}: {shape.fingerprint[:300]}"
+            for shape in self.repeated(repeat_threshold)
+        ]
+        if self.budget is not None and self.count > self.budget:
+            messages.append(f"{self.count} statements, over the budget of {self.budget}")
+        return messages
+
+    def check(self, budget: Optional[int] = None, repeat_threshold: Optional[int] = None):
+        """Raises QueryInspectionError if this report has problems (for tests)."""
+        if budget is not None:
+            self.budget = budget
+        messages = self.problems(repeat_threshold or settings.query_repeat_threshold)
+        if messages:
+            raise QueryInspectionError(self.label or "queries", messages)
+
+class QueryInspectionError(AssertionError):
+    def __init__(self, label: str, messages: List[str]):
+        super().__init__(f"{label}: " + "; ".join(messages))
+        self.messages = messages
+
+_current_report: ContextVar[Optional[QueryReport]] = ContextVar("current_query_report", default=None)
+
+def record(statement: str, elapsed: float):
+    """Called by the engine hooks after each statement; a no-op outside an inspection."""
+    report = _current_report.get()
+    if report is not None:
+        report.record(statement, elapsed)
+
+@contextmanager
+def inspect_queries(label: str = "") -> Iterator[QueryReport]:
+    """Records the statements run in this block (this thread and what it awaits or hands its context to)."""
+    report = QueryReport(label)
+    token = _current_report.set(report)
+    try:
+        yield report
+    finally:
+        _current_report.reset(token)
+
+# Reports of finished requests go to every list handed out by recorded_requests(). Tests
+# use it around TestClient calls: the app runs them in another thread, out of reach of a
+# context variable set in the test.
+_sinks: List[List[QueryReport]] = []
+_sinks_lock = threading.Lock()
+
+@contextmanager
+def recorded_requests() -> Iterator[List[QueryReport]]:
+    reports: List[QueryReport] = []
+    with _sinks_lock:
+        _sinks.append(reports)
+    try:
+        yield reports
+    finally:
+        with _sinks_lock:
+            _sinks.remove(reports)
+
+class QueryInspectionMiddleware:
+    def __init__(
+        self, app: ASGIApp, repeat_threshold: int, budget: Optional[int], route_budgets: Dict[str, int],
+        repeat_exempt: Sequence[str] = (), strict: bool = False
+    ):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        self.repeat_exempt = set(repeat_exempt) # Routes (as in route_budgets) not checked for repeats
+        self.budget = budget
+        self.route_budgets = route_budgets # "GET /items/search" (method, path template) -> statements per request
+        self.strict = strict
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with inspect_queries() as report:
+            await self.app(scope, receive, send)
+        report.label = f"{scope['method']} {route_label(scope)}"
+        report.budget = self.route_budgets.get(report.label, self.budget)
+        with _sinks_lock:
+            for reports in _sinks:
+                reports.append(report)
+
+        for slow in report.slow:
+            logger.warning("%s: slow statement (%.0f ms) from %s: %s",
+                           report.label, slow.seconds * 1000, slow.caller, _WHITESPACE.sub(" ", slow.statement)[:500])
+        messages = report.problems(None if report.label in self.repeat_exempt else self.repeat_threshold)
+        for message in messages:
+            logger.warning("%s: %s", report.label, message)
+        if messages and self.strict:
+            raise QueryInspectionError(report.label, messages)
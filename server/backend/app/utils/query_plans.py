@@ -0,0 +1,74 @@
+import re
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, NamedTuple, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Query plan check.
+# capture_statements records the SELECTs a piece of code sends; full_scans runs EXPLAIN on
+# each and reports the tables read in full. `python -m app.cli check-query-plans` runs the
+# request-path queries through it, so a query without a usable index fails the check.
+
+Statement = Tuple[str, object] # SQL as sent to the driver, and its parameters
+
+class FullScan(NamedTuple):
+    table: str
+    detail: str # The plan line
+    statement: str
+
+# SQLite: "SCAN item" (table) or "SCAN item USING COVERING INDEX ..." (whole index);
+# lookups are reported as "SEARCH ..."
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+# Plans name tables by their alias; SQLAlchemy aliases eager loaded tables as <table>_<n>
+_ALIAS_SUFFIX = re.compile(r"_\d+$")
+
+def _table(name: str, tables: Set[str]) -> str:
+    if name not in tables:
+        name = _ALIAS_SUFFIX.sub("", name)
+    return name if name in tables else ""
+
+@contextmanager
+def capture_statements(bind: Engine) -> Iterator[List[Statement]]:
+    statements: List[Statement] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", before_cursor_execute)
+
+def full_scans(bind: Engine, statements: Iterable[Statement], tables: Set[str]) -> List[FullScan]:
+    """
+    EXPLAINs each statement and returns the full scans of `tables` (subqueries, virtual
+    tables and other names are ignored). Supports SQLite and MySQL.
+    """
+    dialect = bind.dialect.name
+    if dialect not in ("sqlite", "mysql"):
+        raise ValueError(f"Query plans of {dialect} are not supported")
+    scans = []
+    with bind.connect() as connection:
+        # The plan depends on the SQL, not on the values: EXPLAIN each statement once
+        unique = {}
+        for statement, parameters in statements:
+            unique.setdefault(statement, parameters)
+        for statement, parameters in unique.items():
+            if dialect == "sqlite":
+                for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+                    detail = row[-1]
+                    match = _SQLITE_SCAN.match(detail)
+                    table = _table(match.group(1), tables) if match else ""
+                    if table:
+                        scans.append(FullScan(table, detail, statement))
+            else:
+                for row in connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings():
+                    # type ALL: every row of the table is read
+                    table = _table(row["table"] or "", tables)
+                    if row["type"] == "ALL" and table:
+                        scans.append(FullScan(table, f"type=ALL possible_keys={row['possible_keys']}", statement))
+        connection.rollback()
+    return scans
@@ -1,9 +1,54 @@
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
+from .settings import settings
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full; surfaced to clients as 503."""
+    pass
+
+# bcrypt costs ~100-300 ms of CPU per call. Hashing runs on its own small pool so a
+# burst of logins cannot occupy the thread pool that serves every other sync route,
+# and requests beyond the queue limit are rejected instead of piling up.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+_hash_pending = 0
+_hash_pending_lock = threading.Lock()
+
+async def _run_hash_job(func, *args):
+    global _hash_pending
+    with _hash_pending_lock:
+        if _hash_pending >= settings.password_hash_workers + settings.password_hash_queue_limit:
+            raise PasswordHasherBusy()
+        _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        with _hash_pending_lock:
+            _hash_pending -= 1
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await _run_hash_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await _run_hash_job(get_password_hash, password)
+
+def password_hash_queue_depth() -> int:
+    return _hash_pending
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
+
+def password_fingerprint(hashed_password: str) -> str:
+    """
+    Short digest of the stored hash, embedded in access tokens. Changing the password
+    changes the fingerprint, which revokes every token issued before the change.
+    """
+    return hashlib.sha256(hashed_password.encode()).hexdigest()[:16]
@@ -1,6 +1,7 @@
 # server/backend/app/utils/settings.py
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
@@ -15,6 +16,147 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
+    # Authenticated-user cache used by get_current_user (per process; 0 disables it).
+    # Password changes invalidate entries immediately in the process that handled them.
+    # Other worker processes reload the user as soon as a token issued after the change
+    # arrives, and keep accepting tokens issued before it for at most the TTL.
+    auth_cache_size: int = 1024
+    auth_cache_ttl_seconds: int = 60
+
+    # Dedicated bcrypt pool: worker threads, and how many more requests may wait for one
+    # before login/registration answers 503
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 32
+
+    # Database connection pool (ignored for in-memory SQLite). At most pool_size + max_overflow
+    # requests use a session of it at once, the others wait for a slot (database.get_db); keep
+    # threadpool_workers at least that so admitted requests do not queue for threads.
+    # pool_recycle must stay below MySQL's wait_timeout; pre-ping re-checks idle connections.
+    db_pool_size: int = 10
+    db_max_overflow: int = 30
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+
+    # Worker threads for sync (database-bound) routes and dependencies
+    threadpool_workers: int = 40
+
+    # "sync": every route uses the blocking driver of DATABASE_URL from the thread pool above.
+    # "async": the item and category routes and the warehouse list and create routes
+    # (routes/aio) run on the event loop with an AsyncSession on ASYNC_DATABASE_URL, by default
+    # DATABASE_URL with its async driver (aiomysql for MySQL, aiosqlite for SQLite; install it).
+    # The other routes stay sync. Each engine gets a pool of the size above. Compare the two
+    # modes with `python -m app.benchmarks.db_modes`.
+    database_mode: str = "sync"
+
+    # Prometheus metrics at GET /metrics (request latency, SQL per request, pool, media jobs).
+    # With metrics_token set, scrapers must send "Authorization: Bearer <token>".
+    metrics_enabled: bool = True
+    metrics_token: Optional[str] = None
+    # Debugging aid: add a Server-Timing header (SQL time and statement count, time to the
+    # response headers) to every response, shown by the browser's network panel
+    server_timing: bool = False
+
+    # Development and tests (utils/query_inspection.py): record each request's SQL statements
+    # by shape and report shapes repeated query_repeat_threshold times (per-row loading, N+1),
+    # statements slower than slow_query_ms and requests over their query budget (per route
+    # method and path template, e.g. "GET /items/search", else query_budget; None: unchecked). Strict mode raises after the
+    # response, which fails the request in TestClient and so the test. The listing budgets
+    # hold for any page up to MAX_PAGE_LIMIT rows; unpaged lists of more rows load their
+    # media in more chunks.
+    query_inspection: bool = False
+    query_inspection_strict: bool = False
+    query_repeat_threshold: int = 5
+    slow_query_ms: float = 100
+    query_budget: Optional[int] = None
+    query_budgets: Dict[str, int] = {
+        "GET /items/warehouse/{warehouse_id}": 8,
+        "GET /items/warehouse/{warehouse_id}/deleted": 8,
+        "GET /items/search": 8,
+        "GET /items/{item_id}": 6,
+        "GET /warehouses/": 4,
+        "GET /warehouses/{warehouse_id}/stats": 6,
+        "GET /categories/warehouse/{warehouse_id}": 6,
+        "GET /sync/warehouse/{warehouse_id}": 10,
+    }
+    # Batched by design: the same statements run once per batch of rows, not per row
+    query_repeat_exempt: List[str] = [
+        "POST /warehouses/{warehouse_id}/import",
+        "GET /warehouses/{warehouse_id}/export",
+    ]
+
+    # Item and warehouse listings: fetch column tuples instead of ORM objects and encode the
+    # response dicts with orjson, skipping Pydantic validation (services/response_rows.py).
+    # Same JSON; off by default so a schema change cannot silently diverge from it.
+    # Compare with `python -m app.benchmarks.serialization`.
+    fast_listings: bool = False
+
+    # Response compression (utils/compression.py): encodings in order of preference (br and
+    # zstd need the optional brotli / zstandard packages and are skipped without them),
+    # responses smaller than the minimum are sent as they are, and only these content types
+    # are compressed. Levels per encoding, overridden per route path template: the export
+    # stream is large and produced as it is sent, so it trades ratio for speed.
+    compression_encodings: List[str] = ["zstd", "br", "gzip"]
+    compression_minimum_size: int = 1024
+    compression_content_types: List[str] = [
+        "application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html",
+    ]
+    compression_levels: Dict[str, int] = {"gzip": 6, "br": 5, "zstd": 3}
+    compression_route_levels: Dict[str, Dict[str, int]] = {
+        "/warehouses/{warehouse_id}/export": {"gzip": 1, "br": 1, "zstd": 1},
+    }
+    # Uploaded media are already compressed (JPEG, WebP, MP4) and served with range support
+    compression_exclude_paths: List[str] = ["/uploads/"]
+
+    # Most operations (creates, updates, deletes and restores together) in one POST /items/bulk;
+    # a batch is one transaction, so this bounds how long it holds its locks
+    item_bulk_max_operations: int = 5000
+
+    # Warehouse export reads and sends items in batches of this many rows; import commits
+    # every import_batch_size rows
+    export_batch_size: int = 1000
+    import_batch_size: int = 500
+
+    # Media uploads are streamed to disk in chunks of this size; bodies larger than the
+    # maximum are rejected with 413 (up front when Content-Length says so)
+    media_max_upload_bytes: int = 512 * 1024 * 1024
+    media_upload_chunk_bytes: int = 1024 * 1024
+
+    # Background media processing (thumbnails, compressed originals): worker threads per
+    # process, attempts before a job is marked failed, and how long a job may stay
+    # "running" before startup recovery assumes its process died and runs it again
+    media_job_workers: int = 2
+    media_job_max_attempts: int = 3
+    media_job_stale_seconds: int = 600
+
+    # Image renditions made by the media jobs: long-edge sizes in pixels, and encodings
+    # (JSON lists in the environment, e.g. MEDIA_RENDITION_FORMATS='["avif","webp","jpeg"]').
+    # JPEG is always produced as the fallback; AVIF is slow to encode, so it is opt-in.
+    media_rendition_sizes: List[int] = [128, 256, 512, 1024]
+    media_rendition_formats: List[str] = ["webp", "jpeg"]
+
+    # Where media files are stored: "local" (upload_dir, served at /uploads) or "s3" (any
+    # S3-compatible object store; needs boto3). upload_dir is still used for scratch files.
+    # Copy existing files between backends with `python -m app.cli migrate-storage`.
+    storage_backend: str = "local"
+    # S3: set s3_endpoint_url for MinIO/OSS-style services, leave it unset for AWS. Credentials
+    # left unset come from boto3's usual chain (AWS_* environment variables, instance role).
+    s3_bucket: str = ""
+    s3_key_prefix: str = "" # e.g. "homeinventory/"
+    s3_endpoint_url: Optional[str] = None
+    s3_region: Optional[str] = None
+    s3_access_key_id: Optional[str] = None
+    s3_secret_access_key: Optional[str] = None
+    # /uploads URLs redirect to presigned GET URLs valid this long
+    s3_presign_expire_seconds: int = 3600
+    # Files above one part are sent as multipart uploads, this many parts at a time
+    s3_multipart_chunk_bytes: int = 8 * 1024 * 1024
+    s3_transfer_concurrency: int = 4
+
+    # Item search: "auto" uses MySQL FULLTEXT (ngram) or SQLite FTS5 depending on the database,
+    # "like" forces the unindexed LIKE query
+    search_backend: str = "auto"
+
 # Ensure the upload directory is absolute
 settings = Settings()
 if not os.path.isabs(settings.upload_dir):
@@ -0,0 +1,44 @@
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects request bodies larger than max_bytes on the given path prefix before they are
+    parsed. A declared Content-Length over the limit is answered with 413 without reading
+    the body; otherwise the body is counted as it arrives and parsing stops once it goes
+    over, so an oversize upload is never fully received or spooled to disk.
+    """
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefix: str):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload exceeds the maximum size of {self.max_bytes} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"status": "error", "data": None, "message": detail},
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing; FastAPI re-raises HTTPException to the app handler
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
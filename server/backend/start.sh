@@ -22,6 +22,12 @@ fi
 # 创建日志目录
 mkdir -p logs
 
+# 升级数据库结构（迁移）
+if ! python -m app.cli migrate; then
+    echo "❌ 数据库迁移失败"
+    exit 1
+fi
+
 # 启动守护进程
 echo "🚀 启动守护进程..."
 nohup uvicorn app.main:app --host 0.0.0.0 --port 7001 > logs/app.log 2>&1 &
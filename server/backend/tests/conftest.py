@@ -0,0 +1,97 @@
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# The app reads its settings and creates its engine at import: point them at a throwaway
+# SQLite database and upload directory before anything from app is imported
+_TMP_DIR = tempfile.mkdtemp(prefix="homeinventory-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP_DIR, "uploads")
+# Every request the tests make fails on an N+1 or a route over its query budget (settings.query_budgets)
+os.environ["QUERY_INSPECTION"] = "true"
+os.environ["QUERY_INSPECTION_STRICT"] = "true"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.migrations import upgrade_database
+
+upgrade_database()
+
+from app.main import app
+from app.database import SessionLocal, engine
+from app.models.category import Category
+from app.models.item import Item
+from app.models.item_media import ItemMedia, FileType, MediaStatus
+from app.models.media_rendition import MediaRendition
+from app.services import search as search_service
+
+
+def ok(response):
+    assert response.status_code < 400, (response.status_code, response.text)
+    return response.json()["data"]
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    ok(client.post("/auth/register", json={"username": "tester", "password": "secret"}))
+    token = ok(client.post("/auth/token", data={"username": "tester", "password": "secret"}))["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def seed_warehouse(client, auth_headers):
+    """Creates a warehouse of `count` items, each with a category and an image with one rendition, and indexes them for search."""
+    def seed(count: int, name: str = "warehouse") -> int:
+        warehouse_id = ok(client.post("/warehouses/", json={"name": name}, headers=auth_headers))["warehouse_id"]
+        db = SessionLocal()
+        try:
+            categories = [Category(name=f"category {n}", warehouse_id=warehouse_id) for n in range(3)]
+            db.add_all(categories)
+            db.flush()
+            items = []
+            for n in range(count):
+                item = Item(name=f"item {n}", location="shelf", quantity=n + 1, warehouse_id=warehouse_id,
+                            category_id=categories[n % len(categories)].category_id)
+                db.add(item)
+                db.flush()
+                items.append(item)
+                media = ItemMedia(item_id=item.item_id, file_url=f"/uploads/{item.item_id}.jpg",
+                                  thumbnail_url=f"/uploads/{item.item_id}_thumb.jpg",
+                                  file_type=FileType.image, status=MediaStatus.ready)
+                db.add(media)
+                db.flush()
+                db.add(MediaRendition(media_id=media.id, size=320, format="webp", width=320, height=240,
+                                      file_url=f"/uploads/{item.item_id}_320.webp", file_size=1000))
+            search_service.index_items(db, items, {category.category_id: category.name for category in categories})
+            db.commit()
+        finally:
+            db.close()
+        return warehouse_id
+    return seed
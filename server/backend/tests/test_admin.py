@@ -0,0 +1,26 @@
+from app.database import SessionLocal
+from app.models.user import User
+from app.routes import auth
+from app.services import user as user_service
+
+from .conftest import count_statements, ok
+
+
+def test_db_pool_stats_from_the_principal_cache(client, auth_headers, monkeypatch):
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == "tester").update({User.is_admin: True})
+        db.commit()
+    finally:
+        db.close()
+    user_service.invalidate_principal("tester")
+    ok(client.get("/auth/users/me", headers=auth_headers)) # Caches the principal
+
+    def no_thread_pool(*args, **kwargs):
+        raise AssertionError("the admin check used the thread pool")
+
+    monkeypatch.setattr(auth, "run_in_threadpool", no_thread_pool)
+    with count_statements() as statements:
+        for path in ("/admin/db-pool", "/admin/auth-cache", "/admin/media-serving", "/admin/compression"):
+            ok(client.get(path, headers=auth_headers))
+    assert statements == []
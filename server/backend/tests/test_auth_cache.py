@@ -0,0 +1,48 @@
+from app.database import SessionLocal
+from app.models.user import User
+from app.services import user as user_service
+from app.utils.cache import TTLCache
+from app.utils.security import get_password_hash
+
+from .conftest import ok
+
+
+def test_set_drops_a_value_loaded_before_an_invalidation():
+    cache = TTLCache(maxsize=2, ttl=60)
+    generation = cache.generation()
+    cache.invalidate("alice") # Password changed while the stale value was being loaded
+    cache.set("alice", "stale", generation)
+    assert cache.get("alice") is None
+    cache.set("alice", "fresh", cache.generation())
+    assert cache.get("alice") == "fresh"
+
+    # Invalidations pushed out of the bounded map still reject older loads
+    generation = cache.generation()
+    for key in ("bob", "carol", "dave"):
+        cache.invalidate(key)
+    cache.set("bob", "stale", generation)
+    assert cache.get("bob") is None
+
+
+def _login(client, password):
+    token = ok(client.post("/auth/token", data={"username": "rotating", "password": password}))["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_password_changed_by_another_process(client):
+    ok(client.post("/auth/register", json={"username": "rotating", "password": "old"}))
+    old_headers = _login(client, "old")
+    ok(client.get("/auth/users/me", headers=old_headers)) # Caches the principal
+
+    # Another worker changes the password: this process's cache is not invalidated
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == "rotating").update({User.password_hash: get_password_hash("new")})
+        db.commit()
+    finally:
+        db.close()
+    assert user_service.principal_cache.get("rotating") is not None
+
+    new_headers = _login(client, "new")
+    ok(client.get("/auth/users/me", headers=new_headers))
+    assert client.get("/auth/users/me", headers=old_headers).status_code == 401
@@ -0,0 +1,140 @@
+import gzip
+import zlib
+
+import anyio
+from starlette.responses import Response
+from starlette.testclient import TestClient
+
+from app.main import app
+from app.utils.compression import CompressionMiddleware, negotiate
+from app.utils.settings import settings
+
+GZIP = {"Accept-Encoding": "gzip"}
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+def test_negotiate_takes_the_highest_q_then_the_server_order():
+    encodings = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br", encodings) == "br"
+    assert negotiate("gzip, deflate, br, zstd", encodings) == "zstd"
+    assert negotiate("gzip;q=1.0, br;q=0.5", encodings) == "gzip"
+    assert negotiate("GZIP ; Q=0.8, br;q=0.3", encodings) == "gzip"
+    assert negotiate("*;q=0.5, zstd;q=0", encodings) == "br"
+    assert negotiate("br;q=0, *", encodings) == "zstd"
+    assert negotiate("identity", encodings) is None
+    assert negotiate("", encodings) is None
+    assert negotiate("gzip;q=0", encodings) is None
+    assert negotiate("gzip;q=high", encodings) is None
+    assert negotiate("deflate, br", ["gzip"]) is None
+
+
+def test_listing_is_gzipped_with_a_weak_etag(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(20, name="compressed listing")
+    path = f"/items/warehouse/{warehouse_id}"
+    identity = client.get(path, headers={**auth_headers, **IDENTITY})
+    assert "content-encoding" not in identity.headers
+    assert len(identity.content) >= settings.compression_minimum_size
+
+    with client.stream("GET", path, headers={**auth_headers, **GZIP}) as compressed:
+        assert compressed.headers["content-encoding"] == "gzip"
+        raw = b"".join(compressed.iter_raw())
+    assert gzip.decompress(raw) == identity.content
+    assert len(raw) < len(identity.content)
+    assert compressed.headers["vary"] == identity.headers["vary"] == "Accept-Encoding"
+    # Listing ETags are weak already, so they are kept as they are
+    assert compressed.headers["etag"] == identity.headers["etag"]
+    assert compressed.headers["etag"].startswith("W/")
+
+    # The weak ETag still revalidates the listing
+    assert client.get(path, headers={**auth_headers, **GZIP, "If-None-Match": compressed.headers["etag"]}).status_code == 304
+
+
+def test_small_response_is_sent_as_it_is(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(1, name="compressed small")
+    response = client.get(f"/categories/warehouse/{warehouse_id}", headers={**auth_headers, **GZIP})
+    assert response.status_code == 200
+    assert len(response.content) < settings.compression_minimum_size
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def _body_messages(path, headers):
+    """The response headers and body messages of one request, as the app sends them."""
+    messages = []
+    requested = False
+    done = anyio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait() # The server listens for a disconnect while it streams
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            done.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "server": ("testserver", 80), "client": ("testclient", 50000), "root_path": "",
+        "path": path.split("?")[0], "raw_path": path.split("?")[0].encode(), "query_string": path.partition("?")[2].encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    anyio.run(app, scope, receive, send)
+    start, *bodies = messages
+    return dict((name.decode(), value.decode()) for name, value in start["headers"]), bodies
+
+
+def test_export_stream_decodes_chunk_by_chunk(client, auth_headers, seed_warehouse, monkeypatch):
+    warehouse_id = seed_warehouse(7, name="compressed export")
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+    path = f"/warehouses/{warehouse_id}/export?format=csv"
+    _, identity = _body_messages(path, {**auth_headers, **IDENTITY})
+    chunks = [message["body"] for message in identity if message["body"]]
+    assert len(chunks) == 5 # Header, then four batches
+
+    headers, compressed = _body_messages(path, {**auth_headers, **GZIP})
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    # Each chunk is flushed: a client can decode it without waiting for the next
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decoded = [decompressor.decompress(message["body"]) for message in compressed]
+    assert [chunk for chunk in decoded if chunk] == chunks
+    assert compressed[-1]["more_body"] is False and decompressor.eof
+
+
+def _middleware_client(media_type, headers=None):
+    async def inner(scope, receive, send):
+        await Response(b"x" * 4096, media_type=media_type, headers=headers)(scope, receive, send)
+    middleware = CompressionMiddleware(
+        inner, encodings=["gzip"], minimum_size=settings.compression_minimum_size,
+        content_types=settings.compression_content_types, levels=settings.compression_levels,
+        route_levels=settings.compression_route_levels, exclude_paths=settings.compression_exclude_paths,
+    )
+    return TestClient(middleware)
+
+
+def test_only_allowed_types_outside_uploads_are_compressed():
+    for media_type in ["application/json", "text/csv", "application/x-ndjson", "text/plain"]:
+        response = _middleware_client(media_type).get("/items", headers=GZIP)
+        assert response.headers["content-encoding"] == "gzip", media_type
+        assert response.content == b"x" * 4096
+    for media_type in ["image/jpeg", "video/mp4", "application/octet-stream"]:
+        response = _middleware_client(media_type).get("/items", headers=GZIP)
+        assert "content-encoding" not in response.headers, media_type
+        assert "vary" not in response.headers
+    response = _middleware_client("text/plain").get("/uploads/notes.txt", headers=GZIP)
+    assert "content-encoding" not in response.headers
+    response = _middleware_client("text/plain", headers={"Cache-Control": "no-transform"}).get("/items", headers=GZIP)
+    assert "content-encoding" not in response.headers
+
+
+def test_etag_is_weakened_only_when_strong():
+    response = _middleware_client("application/json", headers={"ETag": '"v1"'}).get("/items", headers=GZIP)
+    assert response.headers["etag"] == 'W/"v1"'
+    response = _middleware_client("application/json", headers={"ETag": 'W/"v1"'}).get("/items", headers=GZIP)
+    assert response.headers["etag"] == 'W/"v1"'
+    response = _middleware_client("application/json", headers={"ETag": '"v1"'}).get("/items", headers=IDENTITY)
+    assert response.headers["etag"] == '"v1"'
@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.database import SessionLocal
+from app.services import stats as stats_service
+
+from .conftest import ok
+
+pytest.importorskip("aiosqlite")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run by a separate interpreter: the mode is read when the app is imported. Same database,
+# upload directory and strict query inspection (inherited environment), same token.
+ASYNC_CLIENT = """
+import json, sys
+from fastapi.testclient import TestClient
+from app.main import app
+requests, headers = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+with TestClient(app) as client:
+    responses = []
+    for method, path, body in requests:
+        response = client.request(method, path, headers=headers, json=body)
+        responses.append([response.status_code, response.json()])
+print(json.dumps(responses))
+"""
+
+def _run_async(requests, headers):
+    result = subprocess.run(
+        [sys.executable, "-c", ASYNC_CLIENT, json.dumps(requests), json.dumps(headers)],
+        cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_MODE="async"), capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_async_routes_answer_as_the_sync_ones(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(12, name="modes")
+    item_id = ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))[0]["item_id"]
+    reads = [
+        ["GET", f"/items/warehouse/{warehouse_id}", None],
+        ["GET", f"/items/warehouse/{warehouse_id}?limit=5", None],
+        ["GET", f"/items/warehouse/{warehouse_id}?view=summary&limit=5", None],
+        ["GET", f"/items/warehouse/{warehouse_id}/deleted", None],
+        ["GET", "/items/search?query=item 1&limit=3", None],
+        ["GET", f"/items/{item_id}", None],
+        ["GET", "/items/999999", None],
+        ["GET", f"/categories/warehouse/{warehouse_id}", None],
+        ["GET", "/warehouses/", None],
+    ]
+    expected = [[response.status_code, response.json()]
+                for response in (client.request(method, path, headers=auth_headers) for method, path, _ in reads)]
+    assert _run_async(reads, auth_headers) == expected
+
+
+def test_async_writes_keep_the_change_log_stats_and_index(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(2, name="async writes")
+    db = SessionLocal()
+    try:
+        stats_service.rebuild_stats(db, warehouse_id) # The fixture writes items without their stats
+    finally:
+        db.close()
+    category_id = ok(client.get(f"/categories/warehouse/{warehouse_id}", headers=auth_headers))[0]["category_id"]
+    token = ok(client.get(f"/sync/warehouse/{warehouse_id}", headers=auth_headers))["token"]
+
+    (status, created), = _run_async(
+        [["POST", "/items/", {"name": "async lamp", "warehouse_id": warehouse_id, "quantity": 3}]], auth_headers
+    )
+    assert status == 201
+    item_id = created["data"]["item_id"]
+    responses = _run_async([
+        ["PUT", f"/items/{item_id}", {"quantity": 4, "location": "desk", "category_id": category_id}],
+        ["DELETE", f"/items/{item_id}", None],
+        ["POST", f"/items/restore/{item_id}", None],
+        ["POST", "/items/bulk", {"create": [{"name": "async bulb", "warehouse_id": warehouse_id}]}],
+        ["POST", "/categories/", {"name": "async lights", "warehouse_id": warehouse_id}],
+    ], auth_headers)
+    assert [status for status, _ in responses] == [200, 200, 200, 200, 201]
+    (_, updated), _, (_, restored), (_, bulk), (_, category) = responses
+    assert updated["data"]["category"]["category_id"] == category_id
+    assert restored["data"]["deleted_at"] is None
+
+    # Seen by the sync routes: the item, its index entry, the delta and the stats
+    item = ok(client.get(f"/items/{item_id}", headers=auth_headers))
+    assert (item["quantity"], item["location"], item["category_id"]) == (4, "desk", category_id)
+    found = ok(client.get("/items/search", params={"query": "async lamp"}, headers=auth_headers))
+    assert item_id in [row["item_id"] for row in found]
+    delta = ok(client.get(f"/sync/warehouse/{warehouse_id}", params={"since": token}, headers=auth_headers))
+    assert {row["item_id"] for row in delta["items"]} == {item_id, bulk["data"]["created"][0]["item_id"]}
+    assert [row["category_id"] for row in delta["categories"]] == [category["data"]["category_id"]]
+    db = SessionLocal()
+    try:
+        assert stats_service.rebuild_stats(db, warehouse_id)["drifted"] == 0
+    finally:
+        db.close()
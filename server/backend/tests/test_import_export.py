@@ -0,0 +1,80 @@
+import json
+
+from .conftest import ok
+
+
+def _contents(client, auth_headers, warehouse_id):
+    items = ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))
+    return sorted((item["name"], item["location"], item["quantity"], item["category"]["name"]) for item in items)
+
+
+def _import(client, auth_headers, warehouse_id, filename, body):
+    return client.post(f"/warehouses/{warehouse_id}/import", files={"file": (filename, body, "text/plain")},
+                       headers=auth_headers)
+
+
+def test_export_imports_into_another_warehouse(client, auth_headers, seed_warehouse):
+    source_id = seed_warehouse(5, name="export source")
+    expected = _contents(client, auth_headers, source_id)
+    category_names = sorted({category for *_, category in expected})
+    for format in ("csv", "jsonl"):
+        response = client.get(f"/warehouses/{source_id}/export", params={"format": format}, headers=auth_headers)
+        assert response.status_code == 200
+        if format == "jsonl":
+            assert [json.loads(line)["name"] for line in response.text.splitlines()] == [f"item {n}" for n in range(5)]
+
+        target_id = ok(client.post("/warehouses/", json={"name": f"import {format}"}, headers=auth_headers))["warehouse_id"]
+        result = ok(_import(client, auth_headers, target_id, f"export.{format}", response.content))
+        assert (result["imported"], result["failed"], result["errors"]) == (5, 0, [])
+        assert sorted(result["created_categories"]) == category_names
+        assert _contents(client, auth_headers, target_id) == expected
+
+
+def test_bad_rows_are_reported_by_physical_line(client, auth_headers):
+    warehouse_id = ok(client.post("/warehouses/", json={"name": "import lines"}, headers=auth_headers))["warehouse_id"]
+    body = (
+        "name,location,quantity\r\n"
+        "desk,\"study\r\nby the window\",1\r\n" # One row over lines 2 and 3
+        "chair,study,two\r\n"
+        ",study,1\r\n"
+        "lamp,study,3\r\n"
+    )
+    result = ok(_import(client, auth_headers, warehouse_id, "lines.csv", body.encode()))
+    assert (result["imported"], result["failed"]) == (2, 2)
+    assert result["errors"] == [
+        {"line": 4, "detail": "quantity must be an integer"},
+        {"line": 5, "detail": "name is required"},
+    ]
+
+    body = '{"name": "rug", "quantity": 2}\n\n{"name": "vase", "quantity": "many"}\n{"name": \n'
+    result = ok(_import(client, auth_headers, warehouse_id, "lines.jsonl", body.encode()))
+    assert result["imported"] == 1
+    assert [(error["line"], error["detail"]) for error in result["errors"]] == [
+        (3, "quantity must be an integer"),
+        (4, "Invalid JSON: Expecting value"),
+    ]
+
+
+def test_unknown_categories_are_created_once(client, auth_headers):
+    warehouse_id = ok(client.post("/warehouses/", json={"name": "import categories"}, headers=auth_headers))["warehouse_id"]
+    existing_id = ok(client.post("/categories/", json={"name": "tools", "warehouse_id": warehouse_id},
+                                 headers=auth_headers))["category_id"]
+    body = "name,category\r\nhammer,tools\r\nsock,clothes\r\nscarf,clothes\r\nbox,\r\n"
+    result = ok(_import(client, auth_headers, warehouse_id, "categories.csv", body.encode()))
+    assert result["imported"] == 4
+    assert result["created_categories"] == ["clothes"]
+
+    categories = {category["name"]: category["category_id"]
+                  for category in ok(client.get(f"/categories/warehouse/{warehouse_id}", headers=auth_headers))}
+    assert categories.keys() == {"tools", "clothes"} and categories["tools"] == existing_id
+    items = {item["name"]: item["category_id"]
+             for item in ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))}
+    assert items == {"hammer": existing_id, "sock": categories["clothes"], "scarf": categories["clothes"], "box": None}
+
+
+def test_non_utf8_upload_is_rejected(client, auth_headers):
+    warehouse_id = ok(client.post("/warehouses/", json={"name": "import encoding"}, headers=auth_headers))["warehouse_id"]
+    response = _import(client, auth_headers, warehouse_id, "gbk.csv", "name,quantity\r\n椅子,1\r\n".encode("gbk"))
+    assert response.status_code == 400
+    assert response.json()["message"].startswith("Cannot read the file")
+    assert ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers)) == []
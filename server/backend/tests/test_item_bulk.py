@@ -0,0 +1,79 @@
+from app.utils.settings import settings
+
+from .conftest import ok
+
+
+def _login(client, username):
+    ok(client.post("/auth/register", json={"username": username, "password": "secret"}))
+    token = ok(client.post("/auth/token", data={"username": username, "password": "secret"}))["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_mixed_batch_writes_the_valid_rows_and_reports_the_others(client, auth_headers, seed_warehouse):
+    # The caller is a member (the least privileged role) of the shared warehouse and has no
+    # access to the private one
+    shared_id = seed_warehouse(3, name="bulk shared")
+    private_id = seed_warehouse(1, name="bulk private")
+    member_headers = _login(client, "bulk member")
+    ok(client.post(f"/warehouses/{shared_id}/invite", params={"invited_username": "bulk member"}, headers=auth_headers))
+    shared_items = ok(client.get(f"/items/warehouse/{shared_id}", headers=auth_headers))
+    private_item_id = ok(client.get(f"/items/warehouse/{private_id}", headers=auth_headers))[0]["item_id"]
+    shared_category_id = shared_items[0]["category_id"]
+    private_category_id = ok(client.get(f"/categories/warehouse/{private_id}", headers=auth_headers))[0]["category_id"]
+    first, second, third = (item["item_id"] for item in shared_items)
+
+    response = client.post("/items/bulk", headers=member_headers, json={
+        "create": [
+            {"name": "bulk lamp", "warehouse_id": shared_id, "category_id": shared_category_id, "quantity": 2},
+            {"name": "bulk misfiled", "warehouse_id": shared_id, "category_id": private_category_id},
+            {"name": "bulk intruder", "warehouse_id": private_id},
+        ],
+        "update": [
+            {"item_id": first, "quantity": 7, "location": "attic"},
+            {"item_id": 999999, "quantity": 1},
+            {"item_id": second, "category_id": private_category_id},
+            {"item_id": private_item_id, "quantity": 0},
+        ],
+        "delete": [third],
+        "restore": [999999],
+    })
+    result = ok(response)
+
+    assert [row["index"] for row in result["created"]] == [0]
+    assert result["updated"] == [first]
+    assert result["deleted"] == [] and result["restored"] == []
+    assert [(error["operation"], error["index"], error["item_id"], error["detail"]) for error in result["errors"]] == [
+        ("create", 1, None, "Invalid category_id for this warehouse"),
+        ("create", 2, None, "You do not have access to this warehouse."),
+        ("update", 1, 999999, "Item not found"),
+        ("update", 2, second, "Invalid category_id for this warehouse"),
+        ("update", 3, private_item_id, "You do not have access to this item's warehouse."),
+        ("delete", 0, third, "Only owners can delete items in this warehouse."),
+        ("restore", 0, 999999, "Item not found"),
+    ]
+
+    # The valid rows were committed, the others left as they were
+    created = ok(client.get(f"/items/{result['created'][0]['item_id']}", headers=auth_headers))
+    assert (created["name"], created["quantity"], created["category_id"]) == ("bulk lamp", 2, shared_category_id)
+    updated = ok(client.get(f"/items/{first}", headers=auth_headers))
+    assert (updated["quantity"], updated["location"]) == (7, "attic")
+    assert ok(client.get(f"/items/{second}", headers=auth_headers))["category_id"] == shared_items[1]["category_id"]
+    assert ok(client.get(f"/items/{third}", headers=auth_headers))["deleted_at"] is None
+    assert ok(client.get(f"/items/{private_item_id}", headers=auth_headers))["quantity"] == 1
+    names = [item["name"] for item in ok(client.get(f"/items/warehouse/{shared_id}", headers=auth_headers))]
+    assert "bulk misfiled" not in names and len(names) == 4
+
+
+def test_batch_over_the_limit_is_rejected(client, auth_headers, seed_warehouse, monkeypatch):
+    warehouse_id = seed_warehouse(2, name="bulk limit")
+    item_ids = [item["item_id"] for item in ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))]
+    monkeypatch.setattr(settings, "item_bulk_max_operations", 2)
+    response = client.post("/items/bulk", headers=auth_headers, json={
+        "create": [{"name": "one too many", "warehouse_id": warehouse_id}],
+        "delete": item_ids,
+    })
+    assert response.status_code == 413
+    assert response.json()["message"] == "At most 2 operations per batch"
+    # Nothing was applied
+    assert len(ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))) == 2
+    assert ok(client.post("/items/bulk", headers=auth_headers, json={"delete": item_ids}))["deleted"] == item_ids
@@ -0,0 +1,20 @@
+import pytest
+
+from app.utils.settings import settings
+
+from .conftest import count_statements, ok
+
+
+@pytest.mark.parametrize("fast_listings", [False, True])
+@pytest.mark.parametrize("params", [{}, {"limit": 100}, {"view": "summary"}])
+def test_listing_statements_do_not_grow_with_items(client, auth_headers, seed_warehouse, monkeypatch, fast_listings, params):
+    # Categories, media and renditions are loaded in batches: no statement per item
+    monkeypatch.setattr(settings, "fast_listings", fast_listings)
+    counts = {}
+    for size in (5, 50):
+        warehouse_id = seed_warehouse(size, name=f"listing {size}")
+        with count_statements() as statements:
+            items = ok(client.get(f"/items/warehouse/{warehouse_id}", params=params, headers=auth_headers))
+        assert len(items) == size
+        counts[size] = len(statements)
+    assert counts[5] == counts[50], counts
@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.search import get_search_backend
+
+from .conftest import ok
+
+
+@pytest.fixture
+def search_warehouse(client, auth_headers):
+    warehouse_id = ok(client.post("/warehouses/", json={"name": "search"}, headers=auth_headers))["warehouse_id"]
+    # "hammer" weighs more in short contents: the items are not ranked in item_id order
+    names = [f"hammer {'and other tools ' * (n % 4)}{n}" for n in range(12)]
+    for name in names:
+        ok(client.post("/items/", json={"name": name, "warehouse_id": warehouse_id}, headers=auth_headers))
+    return warehouse_id
+
+
+@pytest.mark.parametrize("params", [{}, {"view": "summary"}])
+def test_paginated_search_keeps_the_ranking(client, auth_headers, search_warehouse, params):
+    if get_search_backend().match("hammer") is None:
+        pytest.skip("no full-text index: results are in item_id order")
+    search = {"query": "hammer", **params}
+    ranked = [item["item_id"] for item in ok(client.get("/items/search", params=search, headers=auth_headers))]
+    assert ranked != sorted(ranked)
+
+    paged, cursor = [], None
+    while True:
+        response = client.get("/items/search", params={**search, "limit": 5, "cursor": cursor}, headers=auth_headers)
+        paged += [item["item_id"] for item in ok(response)]
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+    assert paged == ranked
+
+
+def test_search_cursor_of_a_deleted_item(client, auth_headers, search_warehouse):
+    if get_search_backend().match("hammer") is None:
+        pytest.skip("no full-text index")
+    response = client.get("/items/search", params={"query": "hammer", "limit": 3}, headers=auth_headers)
+    cursor = response.json()["next_cursor"]
+    ok(client.delete(f"/items/{cursor}", headers=auth_headers))
+    response = client.get("/items/search", params={"query": "hammer", "limit": 3, "cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,107 @@
+import hashlib
+import io
+import logging
+import os
+import time
+
+from PIL import Image
+
+from app.database import SessionLocal
+from app.models.media_blob import MediaBlob
+from app.services import renditions as rendition_service
+from app.utils.settings import settings
+
+from .conftest import ok
+
+
+def test_renditions_of_an_undecodable_file_are_logged(tmp_path, caplog):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+    with caplog.at_level(logging.WARNING, logger="app.services.renditions"):
+        assert rendition_service.generate_renditions("/uploads/original/broken.jpg", str(path)) == []
+    assert "Error generating renditions for /uploads/original/broken.jpg" in caplog.text
+
+
+def _jpeg(quality: int) -> bytes:
+    # Noise compresses badly: re-saving at the processing quality (80) makes it smaller
+    image = Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def test_compressed_image_gets_a_new_url(client, auth_headers):
+    warehouse_id = ok(client.post("/warehouses/", json={"name": "photos"}, headers=auth_headers))["warehouse_id"]
+    item_id = ok(client.post("/items/", json={"name": "camera", "warehouse_id": warehouse_id}, headers=auth_headers))["item_id"]
+    upload = _jpeg(quality=100)
+    media = ok(client.post(f"/media/upload/{item_id}", files={"file": ("photo.jpg", upload, "image/jpeg")},
+                           headers=auth_headers))
+    original_url = media["file_url"]
+    response = client.get(original_url)
+    assert response.content == upload
+    assert "immutable" in response.headers["cache-control"]
+
+    deadline = time.monotonic() + 30
+    while media["status"] == "pending" and time.monotonic() < deadline:
+        time.sleep(0.1)
+        media = ok(client.get(f"/items/{item_id}", headers=auth_headers))["media"][0]
+    assert media["status"] == "ready"
+    # The upload's URL never serves other bytes: the smaller copy has its own
+    assert media["file_url"] != original_url
+    compressed = client.get(media["file_url"])
+    assert 0 < len(compressed.content) < len(upload)
+    assert client.get(original_url).status_code == 404
+
+
+def _ready_media(client, auth_headers, item_id):
+    deadline = time.monotonic() + 30
+    media = ok(client.get(f"/items/{item_id}", headers=auth_headers))["media"][0]
+    while media["status"] == "pending" and time.monotonic() < deadline:
+        time.sleep(0.1)
+        media = ok(client.get(f"/items/{item_id}", headers=auth_headers))["media"][0]
+    assert media["status"] == "ready"
+    return media
+
+
+def _blob(sha256):
+    db = SessionLocal()
+    try:
+        blob = db.get(MediaBlob, sha256)
+        return blob and (blob.ref_count, blob.file_url)
+    finally:
+        db.close()
+
+
+def test_same_file_on_two_items_is_stored_once(client, auth_headers):
+    warehouse_id = ok(client.post("/warehouses/", json={"name": "dedup"}, headers=auth_headers))["warehouse_id"]
+    item_ids = [
+        ok(client.post("/items/", json={"name": name, "warehouse_id": warehouse_id}, headers=auth_headers))["item_id"]
+        for name in ("left shoe", "right shoe")
+    ]
+    upload = _jpeg(quality=100)
+    sha256 = hashlib.sha256(upload).hexdigest()
+    for item_id in item_ids:
+        ok(client.post(f"/media/upload/{item_id}", files={"file": ("shoe.jpg", upload, "image/jpeg")},
+                       headers=auth_headers))
+    first, second = (_ready_media(client, auth_headers, item_id) for item_id in item_ids)
+
+    ref_count, file_url = _blob(sha256)
+    assert ref_count == 2
+    assert first["file_url"] == second["file_url"] == file_url
+    assert first["thumbnail_url"] == second["thumbnail_url"]
+    assert second["renditions"] and first["renditions"] == second["renditions"]
+    # One stored original (the compressed copy replaced the upload), shared by both media
+    shard = os.path.join(settings.upload_dir, "original", sha256[:2], sha256[2:4])
+    assert [name for name in os.listdir(shard) if name.startswith(sha256)] == [os.path.basename(file_url)]
+
+    ok(client.delete(f"/media/{first['id']}", headers=auth_headers))
+    assert _blob(sha256) == (1, file_url)
+    assert client.get(file_url).status_code == 200
+    assert client.get(second["thumbnail_url"]).status_code == 200
+
+    ok(client.delete(f"/media/{second['id']}", headers=auth_headers))
+    assert _blob(sha256) is None
+    assert client.get(file_url).status_code == 404
+    assert client.get(second["thumbnail_url"]).status_code == 404
+    assert all(client.get(rendition["file_url"]).status_code == 404 for rendition in second["renditions"])
+    assert not [name for name in os.listdir(shard) if name.startswith(sha256)]
@@ -0,0 +1,65 @@
+import argparse
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+
+from app import cli
+from app.database import Base, SessionLocal, engine
+from app.migrations import alembic_config, include_object
+from app.models.item import Item
+from app.utils.query_plans import capture_statements, full_scans
+
+from .conftest import ok
+
+
+def test_models_match_the_migrations():
+    # Autogenerate would emit nothing, in particular no DROP of the search index tables
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_object": include_object})
+        assert compare_metadata(context, Base.metadata) == []
+
+
+def test_search_index_is_created_and_backfilled(tmp_path):
+    other = sa.create_engine(f"sqlite:///{tmp_path / 'upgrade.db'}")
+    config = alembic_config()
+    with other.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "0003")
+        connection.execute(sa.text("INSERT INTO user (username, password_hash, is_admin) VALUES ('u', 'x', 1)"))
+        connection.execute(sa.text("INSERT INTO warehouse (name, created_by_user_id) VALUES ('w', 1)"))
+        connection.execute(sa.text("INSERT INTO category (name, warehouse_id) VALUES ('Tools', 1)"))
+        connection.execute(sa.text(
+            "INSERT INTO item (name, location, quantity, warehouse_id, category_id, deleted_at) VALUES "
+            "('Screwdriver', 'Garage', 1, 1, 1, NULL), ('Hammer', NULL, 1, 1, NULL, '2026-01-01')"
+        ))
+        command.upgrade(config, "head")
+        rows = connection.execute(sa.text("SELECT rowid, content FROM item_search")).all()
+    other.dispose()
+    assert rows == [(1, "screwdriver\ngarage\ntools")]
+
+
+def _seed_plan_rows(seed_warehouse, client, auth_headers):
+    warehouse_id = seed_warehouse(20, name="plans")
+    # A deleted item too, so every query in _request_queries has rows to plan against
+    items = ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))
+    ok(client.delete(f"/items/{items[-1]['item_id']}", headers=auth_headers))
+
+
+def test_check_query_plans_finds_no_full_scans(client, auth_headers, seed_warehouse, capsys):
+    _seed_plan_rows(seed_warehouse, client, auth_headers)
+    cli.check_query_plans(argparse.Namespace()) # SystemExit(1) on a full scan
+    assert " 0 full table scans" in capsys.readouterr().out
+
+
+def test_check_query_plans_reports_a_full_scan(client, auth_headers, seed_warehouse):
+    _seed_plan_rows(seed_warehouse, client, auth_headers)
+    db = SessionLocal()
+    try:
+        with capture_statements(engine) as statements:
+            db.query(Item).filter(Item.name == "item 1").all() # No index on name
+    finally:
+        db.close()
+    scans = full_scans(engine, statements, set(Base.metadata.tables))
+    assert [scan.table for scan in scans] == ["item"]
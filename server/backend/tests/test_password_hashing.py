@@ -0,0 +1,22 @@
+from app.utils import security
+from app.utils.settings import settings
+
+from .conftest import ok
+
+
+def test_saturated_hasher_sheds_logins(client, auth_headers, monkeypatch):
+    # No worker and no queue slot: every hashing job is over the limit
+    monkeypatch.setattr(settings, "password_hash_workers", 0)
+    monkeypatch.setattr(settings, "password_hash_queue_limit", 0)
+
+    for response in (
+        client.post("/auth/token", data={"username": "tester", "password": "secret"}),
+        client.post("/auth/register", json={"username": "shed", "password": "secret"}),
+    ):
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert response.json()["status"] == "error"
+    assert security.password_hash_queue_depth() == 0
+
+    # Routes that need no hashing are unaffected
+    ok(client.get("/auth/users/me", headers=auth_headers))
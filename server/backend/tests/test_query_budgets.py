@@ -0,0 +1,52 @@
+import pytest
+
+from app.utils.query_inspection import QueryInspectionError, QueryInspectionMiddleware, recorded_requests
+from app.utils.settings import settings
+
+from .conftest import ok
+
+
+def test_read_routes_stay_within_their_query_budgets(client, auth_headers, seed_warehouse, monkeypatch):
+    warehouse_id = seed_warehouse(30, name="budgets")
+    items = ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))
+    ok(client.delete(f"/items/{items[-1]['item_id']}", headers=auth_headers))
+    item_id = items[0]["item_id"]
+
+    with recorded_requests() as reports:
+        for fast_listings in (False, True):
+            monkeypatch.setattr(settings, "fast_listings", fast_listings)
+            ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))
+            ok(client.get(f"/items/warehouse/{warehouse_id}", params={"limit": 10}, headers=auth_headers))
+            ok(client.get(f"/items/warehouse/{warehouse_id}/deleted", headers=auth_headers))
+            ok(client.get("/items/search", params={"query": "item"}, headers=auth_headers))
+            cursor = client.get("/items/search", params={"query": "item", "limit": 5}, headers=auth_headers).json()["next_cursor"]
+            assert cursor is not None
+            ok(client.get("/items/search", params={"query": "item", "limit": 5, "cursor": cursor}, headers=auth_headers))
+            ok(client.get("/warehouses/", headers=auth_headers))
+        ok(client.get(f"/items/warehouse/{warehouse_id}", params={"view": "summary"}, headers=auth_headers))
+        ok(client.get(f"/items/{item_id}", headers=auth_headers))
+        ok(client.get(f"/warehouses/{warehouse_id}/stats", headers=auth_headers))
+        ok(client.get(f"/categories/warehouse/{warehouse_id}", headers=auth_headers))
+        ok(client.get(f"/sync/warehouse/{warehouse_id}", headers=auth_headers))
+
+    # Strict mode already failed any request over budget; check each was measured against one
+    assert {report.label for report in reports} == set(settings.query_budgets)
+    for report in reports:
+        assert report.budget == settings.query_budgets[report.label]
+        assert report.count <= report.budget, (report.label, report.count, [shape.fingerprint for shape in report.shapes()])
+        report.check()
+
+
+def test_strict_inspection_fails_a_request_over_budget(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(5, name="over budget")
+    middleware = client.app.middleware_stack
+    while not isinstance(middleware, QueryInspectionMiddleware):
+        middleware = middleware.app
+    label = "GET /items/warehouse/{warehouse_id}"
+    budget = middleware.route_budgets[label]
+    middleware.route_budgets[label] = 1
+    try:
+        with pytest.raises(QueryInspectionError, match="over the budget of 1"):
+            client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers)
+    finally:
+        middleware.route_budgets[label] = budget
@@ -0,0 +1,55 @@
+from app.database import SessionLocal
+from app.services import stats as stats_service
+
+from .conftest import ok
+
+
+def _counts(row):
+    return row["item_count"], row["total_quantity"], row["deleted_count"]
+
+
+def test_stats_follow_every_kind_of_item_change(client, auth_headers):
+    warehouse_id = ok(client.post("/warehouses/", json={"name": "stats"}, headers=auth_headers))["warehouse_id"]
+    tools, garden = (
+        ok(client.post("/categories/", json={"name": name, "warehouse_id": warehouse_id}, headers=auth_headers))["category_id"]
+        for name in ("tools", "garden")
+    )
+
+    def create(**fields):
+        return ok(client.post("/items/", json={"warehouse_id": warehouse_id, **fields}, headers=auth_headers))["item_id"]
+
+    saw = create(name="saw", category_id=tools, location="shelf", quantity=3)
+    drill = create(name="drill", category_id=tools, location="box", quantity=2)
+    glove = create(name="glove", quantity=1)
+    # Category change, location cleared and quantity change in one update
+    ok(client.put(f"/items/{saw}", json={"category_id": garden, "location": None, "quantity": 5}, headers=auth_headers))
+    ok(client.delete(f"/items/{drill}", headers=auth_headers))
+    ok(client.post(f"/items/restore/{drill}", headers=auth_headers))
+    ok(client.delete(f"/items/{glove}", headers=auth_headers))
+    bulk = ok(client.post("/items/bulk", headers=auth_headers, json={
+        "create": [{"name": "hose", "warehouse_id": warehouse_id, "category_id": garden, "location": "box", "quantity": 4}],
+        "update": [{"item_id": drill, "quantity": 6, "location": "shelf"}],
+        "delete": [saw],
+        "restore": [glove],
+    }))
+    assert not bulk["errors"]
+    body = "name,location,quantity,category\r\nhammer,box,2,tools\r\nseeds,,1,seeds\r\n"
+    imported = ok(client.post(f"/warehouses/{warehouse_id}/import", files={"file": ("items.csv", body.encode(), "text/csv")},
+                              headers=auth_headers))
+    assert imported["imported"] == 2
+
+    # Active: drill (tools, shelf, 6), glove (none, none, 1), hose (garden, box, 4),
+    # hammer (tools, box, 2), seeds (seeds, none, 1). Deleted: saw (garden, none)
+    db = SessionLocal()
+    try:
+        assert stats_service.rebuild_stats(db, warehouse_id)["drifted"] == 0
+    finally:
+        db.close()
+    stats = ok(client.get(f"/warehouses/{warehouse_id}/stats", headers=auth_headers))
+    assert _counts(stats) == (5, 14, 1)
+    assert {category["name"]: _counts(category) for category in stats["categories"]} == {
+        "tools": (2, 8, 0), "garden": (1, 4, 1), "seeds": (1, 1, 0), None: (1, 1, 0),
+    }
+    assert [(location["location"], *_counts(location)) for location in stats["locations"]] == [
+        (None, 2, 2, 1), ("box", 2, 6, 0), ("shelf", 1, 6, 0),
+    ]
@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.storage import LocalStorage, StorageBackend
+
+
+class PartialStorage(StorageBackend):
+    name = "partial"
+
+    def size(self, key):
+        return None
+
+
+def test_incomplete_backend_fails_at_construction():
+    with pytest.raises(TypeError, match="abstract"):
+        PartialStorage()
+
+
+def test_local_storage(tmp_path):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    source = tmp_path / "photo.jpg"
+    source.write_bytes(b"jpeg")
+    storage.upload("original/ab/cd/photo.jpg", str(source))
+    assert storage.size("original/ab/cd/photo.jpg") == 4
+    assert list(storage.keys("original/")) == [("original/ab/cd/photo.jpg", 4)]
+    with storage.local_copy("original/ab/cd/photo.jpg") as path:
+        assert open(path, "rb").read() == b"jpeg"
+    assert storage.move("original/ab/cd/photo.jpg", "original/ab/cd/moved.jpg")
+    storage.delete("original/ab/cd/moved.jpg")
+    assert not storage.exists("original/ab/cd/moved.jpg")
@@ -0,0 +1,92 @@
+from app.database import SessionLocal
+from app.models.change_log import ChangeLog, ChangeEntity
+from app.services import sync as sync_service
+from app.services import warehouse as warehouse_service
+
+from .conftest import ok
+
+
+def _sync(client, auth_headers, warehouse_id, since=None):
+    params = {"since": since} if since is not None else {}
+    return client.get(f"/sync/warehouse/{warehouse_id}", params=params, headers=auth_headers)
+
+
+def test_delta_holds_only_the_changed_entities(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(4, name="sync delta")
+    items = ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))
+    updated, soft_deleted, with_media = (item["item_id"] for item in items[:3])
+    media_id = items[2]["media"][0]["id"]
+    category_id = ok(client.post("/categories/", json={"name": "gone", "warehouse_id": warehouse_id},
+                                 headers=auth_headers))["category_id"]
+
+    first = ok(_sync(client, auth_headers, warehouse_id))
+    assert first["full"] is True
+    assert [item["item_id"] for item in first["items"]] == [item["item_id"] for item in sorted(items, key=lambda item: item["item_id"])]
+    assert category_id in [category["category_id"] for category in first["categories"]]
+
+    ok(client.put(f"/items/{updated}", json={"quantity": 42}, headers=auth_headers))
+    ok(client.delete(f"/items/{soft_deleted}", headers=auth_headers))
+    ok(client.delete(f"/media/{media_id}", headers=auth_headers))
+    ok(client.delete(f"/categories/{category_id}", headers=auth_headers))
+
+    delta = ok(_sync(client, auth_headers, warehouse_id, since=first["token"]))
+    assert delta["full"] is False
+    assert delta["token"] != first["token"]
+    # Soft-deleted items are sent with deleted_at, not listed as deleted
+    assert {item["item_id"]: (item["quantity"], item["deleted_at"] is not None) for item in delta["items"]} == {
+        updated: (42, False), soft_deleted: (items[1]["quantity"], True),
+    }
+    assert with_media not in [item["item_id"] for item in delta["items"]]
+    assert delta["categories"] == [] and delta["media"] == []
+    assert delta["deleted"] == {"items": [], "categories": [category_id], "media": [media_id]}
+
+    # Nothing changed since
+    assert ok(_sync(client, auth_headers, warehouse_id, since=delta["token"])) == {
+        "token": delta["token"], "full": False, "items": [], "categories": [], "media": [],
+        "deleted": {"items": [], "categories": [], "media": []},
+    }
+
+
+def test_token_ahead_of_the_server_gets_everything(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(3, name="sync restored")
+    token = ok(_sync(client, auth_headers, warehouse_id))["token"]
+    version = int(token.split(".")[1])
+    # E.g. the database was restored from a backup older than the client's last sync
+    result = ok(_sync(client, auth_headers, warehouse_id, since=sync_service.encode_token(warehouse_id, version + 5)))
+    assert result["full"] is True
+    assert result["token"] == token
+    assert len(result["items"]) == 3
+    assert result["deleted"] == {"items": [], "categories": [], "media": []}
+
+
+def test_malformed_or_foreign_token_is_rejected(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(1, name="sync tokens")
+    other_id = seed_warehouse(1, name="sync other")
+    other_token = ok(_sync(client, auth_headers, other_id))["token"]
+    for token in ["garbage", "1.2.3", f"{warehouse_id}.", f"{warehouse_id}.-1", other_token]:
+        response = _sync(client, auth_headers, warehouse_id, since=token)
+        assert response.status_code == 400, token
+        assert response.json()["message"] == "Invalid sync token"
+
+
+def test_record_changes_inserts_only_the_missing_rows(client, auth_headers, seed_warehouse):
+    warehouse_id = seed_warehouse(3, name="sync change log")
+    item_ids = [item["item_id"] for item in ok(client.get(f"/items/warehouse/{warehouse_id}", headers=auth_headers))]
+    db = SessionLocal()
+    try:
+        # The fixture writes its items without change_log rows: record one, then all three
+        sync_service.record_change(db, warehouse_id, ChangeEntity.item, item_ids[0])
+        db.commit()
+        sync_service.record_changes(db, warehouse_id, [(ChangeEntity.item, item_id) for item_id in item_ids])
+        db.commit()
+        version = warehouse_service.get_version(db, warehouse_id)
+        rows = (
+            db.query(ChangeLog.entity_id, ChangeLog.version)
+            .filter(ChangeLog.entity == ChangeEntity.item, ChangeLog.entity_id.in_(item_ids))
+            .order_by(ChangeLog.entity_id)
+            .all()
+        )
+    finally:
+        db.close()
+    # One row per entity, all at the latest version
+    assert rows == [(item_id, version) for item_id in sorted(item_ids)]
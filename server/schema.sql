@@ -1,3 +1,6 @@
+-- Reference schema (MySQL). The backend creates and upgrades it with migrations:
+--   python -m app.cli migrate   (app/migrations)
+
 -- Create Database
 CREATE DATABASE IF NOT EXISTS `homeinventory`;
 USE `homeinventory`;
@@ -19,6 +22,7 @@ CREATE TABLE `warehouse` (
     `name` VARCHAR(255) NOT NULL,
     `description` TEXT,
     `created_by_user_id` INT NOT NULL,
+    `version` BIGINT NOT NULL DEFAULT 0,
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (`created_by_user_id`) REFERENCES `user`(`user_id`) ON DELETE CASCADE
@@ -33,6 +37,8 @@ CREATE TABLE `user_warehouse` (
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     UNIQUE (`user_id`, `warehouse_id`),
+    INDEX `ix_user_warehouse_user_role` (`user_id`, `warehouse_id`, `role`),
+    INDEX `ix_user_warehouse_warehouse_user` (`warehouse_id`, `user_id`),
     FOREIGN KEY (`user_id`) REFERENCES `user`(`user_id`) ON DELETE CASCADE,
     FOREIGN KEY (`warehouse_id`) REFERENCES `warehouse`(`warehouse_id`) ON DELETE CASCADE
 );
@@ -46,7 +52,7 @@ CREATE TABLE `category` (
     `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     PRIMARY KEY (`category_id`),
     INDEX `ix_category_category_id` (`category_id`),
-    INDEX `ix_category_name` (`name`),
+    INDEX `ix_category_warehouse_name` (`warehouse_id`, `name`),
     FOREIGN KEY (`warehouse_id`) REFERENCES `warehouse` (`warehouse_id`) ON DELETE CASCADE
 );
 
@@ -61,6 +67,8 @@ CREATE TABLE `item` (
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     `deleted_at` DATETIME NULL DEFAULT NULL,
+    INDEX `ix_item_warehouse_deleted_id` (`warehouse_id`, `deleted_at`, `item_id`),
+    INDEX `ix_item_category_deleted` (`category_id`, `deleted_at`),
     FOREIGN KEY (`warehouse_id`) REFERENCES `warehouse`(`warehouse_id`) ON DELETE CASCADE,
     FOREIGN KEY (`category_id`) REFERENCES `category` (`category_id`) ON DELETE SET NULL
 );
@@ -72,7 +80,85 @@ CREATE TABLE `item_media` (
     `file_url` VARCHAR(2048) NOT NULL,
     `thumbnail_url` VARCHAR(2048),
     `file_type` ENUM('image', 'video') NOT NULL,
+    `file_size` BIGINT,
+    `sha256` VARCHAR(64),
+    `status` ENUM('pending', 'ready', 'failed') NOT NULL DEFAULT 'ready',
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX `ix_item_media_item_id` (`item_id`),
+    INDEX `ix_item_media_sha256_status` (`sha256`, `status`),
+    FOREIGN KEY (`item_id`) REFERENCES `item`(`item_id`) ON DELETE CASCADE
+);
+
+-- Table: MediaBlob (one stored file per distinct content, shared by item_media rows with the same sha256)
+CREATE TABLE `media_blob` (
+    `sha256` VARCHAR(64) PRIMARY KEY,
+    `file_url` VARCHAR(2048) NOT NULL,
+    `file_size` BIGINT NOT NULL,
+    `ref_count` INT NOT NULL,
+    `status` ENUM('pending', 'ready', 'failed') NOT NULL,
+    `thumbnail_url` VARCHAR(2048),
+    `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Table: MediaJob (background thumbnail/compression work; finished jobs are deleted)
+CREATE TABLE `media_job` (
+    `id` INT AUTO_INCREMENT PRIMARY KEY,
+    `media_id` INT NOT NULL,
+    `status` ENUM('pending', 'running', 'failed') NOT NULL,
+    `attempts` INT NOT NULL DEFAULT 0,
+    `last_error` VARCHAR(1024),
+    `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX `ix_media_job_status_id` (`status`, `id`),
+    INDEX `ix_media_job_media_id` (`media_id`),
+    FOREIGN KEY (`media_id`) REFERENCES `item_media`(`id`) ON DELETE CASCADE
+);
+
+-- Table: MediaRendition (downscaled image copies per configured size and format)
+CREATE TABLE `media_rendition` (
+    `id` INT AUTO_INCREMENT PRIMARY KEY,
+    `media_id` INT NOT NULL,
+    `size` INT NOT NULL,
+    `format` VARCHAR(8) NOT NULL,
+    `width` INT NOT NULL,
+    `height` INT NOT NULL,
+    `file_url` VARCHAR(2048) NOT NULL,
+    `file_size` BIGINT NOT NULL,
+    UNIQUE KEY `uq_media_rendition` (`media_id`, `size`, `format`),
+    FOREIGN KEY (`media_id`) REFERENCES `item_media`(`id`) ON DELETE CASCADE
+);
+
+-- Table: ItemSearch (full-text index over item name, location and category name; active items only)
+-- Created and backfilled by migration 0004 (`python -m app.cli migrate`); rebuild with `python -m app.cli rebuild-search-index`
+CREATE TABLE `item_search` (
+    `item_id` INT PRIMARY KEY,
+    `content` TEXT NOT NULL,
+    FULLTEXT INDEX `ft_item_search_content` (`content`) WITH PARSER ngram,
     FOREIGN KEY (`item_id`) REFERENCES `item`(`item_id`) ON DELETE CASCADE
-);
\ No newline at end of file
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Table: ChangeLog (warehouse version at which each item, category or media last changed; backs delta sync)
+CREATE TABLE `change_log` (
+    `entity` ENUM('item', 'category', 'media') NOT NULL,
+    `entity_id` INT NOT NULL,
+    `warehouse_id` INT NOT NULL,
+    `version` BIGINT NOT NULL,
+    PRIMARY KEY (`entity`, `entity_id`),
+    INDEX `ix_change_log_warehouse_version` (`warehouse_id`, `version`),
+    FOREIGN KEY (`warehouse_id`) REFERENCES `warehouse`(`warehouse_id`) ON DELETE CASCADE
+);
+
+-- Table: WarehouseStat (item counts per warehouse, category and location; maintained incrementally)
+-- Rebuild with `python -m app.cli rebuild-stats`
+CREATE TABLE `warehouse_stat` (
+    `warehouse_id` INT NOT NULL,
+    `dimension` ENUM('total', 'category', 'location') NOT NULL,
+    `group_key` VARCHAR(255) NOT NULL,
+    `item_count` INT NOT NULL,
+    `total_quantity` BIGINT NOT NULL,
+    `deleted_count` INT NOT NULL,
+    PRIMARY KEY (`warehouse_id`, `dimension`, `group_key`),
+    FOREIGN KEY (`warehouse_id`) REFERENCES `warehouse`(`warehouse_id`) ON DELETE CASCADE
+);
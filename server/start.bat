@@ -1,2 +1,3 @@
 
+python -m app.cli migrate
 uvicorn app.main:app --reload --host 10.0.1.6
\ No newline at end of file